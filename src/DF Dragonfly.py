@@ -743,13 +743,22 @@ class BuildingTypes(object):
     def __init__(self, readDOE_file_path):
         """Class that contains all of the accepted building typologies and contruction years"""
 
-        # load up all of the building characteristcs from the urban weather generator pickle file.
-        if not os.path.exists(readDOE_file_path):
-            raise Exception("readDOE.pkl file: '{}' does not exist.".format(readDOE_file_path))
-        readDOE_file = open(readDOE_file_path, 'rb') # open pickle file in binary form
-        self.refDOE = cPickle.load(readDOE_file)
-        self.refBEM = cPickle.load(readDOE_file)
-        readDOE_file.close()
+        # load up the building characteristcs from the urban weather generator reference library.
+        # the indexed library next to the pickle only reads the typologies that are looked up.
+        doelib_file_path = os.path.splitext(readDOE_file_path)[0] + '.doelib'
+        if os.path.exists(doelib_file_path):
+            from uwg.doelib import load_doelib
+            doelib = load_doelib(doelib_file_path)
+            self.refDOE = doelib.refDOE
+            self.refBEM = doelib.refBEM
+        else:
+            # fall back to the full pickle file.
+            if not os.path.exists(readDOE_file_path):
+                raise Exception("readDOE.pkl file: '{}' does not exist.".format(readDOE_file_path))
+            readDOE_file = open(readDOE_file_path, 'rb') # open pickle file in binary form
+            self.refDOE = cPickle.load(readDOE_file)
+            self.refBEM = cPickle.load(readDOE_file)
+            readDOE_file.close()
 
         # dictionary to go from building programs to numbers understood by the uwg.
         self.bldgtype = {
@@ -0,0 +1,162 @@
+"""Fixtures of the uwg tests: a synthetic rural EPW and uwg objects simulating it."""
+import math
+import random
+
+import pytest
+
+from uwg import uwg
+
+
+EPW_HEADER = [
+    "LOCATION,Testville,ST,USA,TMY3,999999,42.37,-71.02,-5.0,6.0",
+    "DESIGN CONDITIONS,0",
+    "TYPICAL/EXTREME PERIODS,0",
+    "GROUND TEMPERATURES,3,.5,,,," +
+    ",".join("%.2f" % (10+8*math.sin(2*math.pi*(m-4)/12)) for m in range(12)) + ",2,,,," +
+    ",".join("%.2f" % (10+5*math.sin(2*math.pi*(m-5)/12)) for m in range(12)) + ",4,,,," +
+    ",".join("%.2f" % (10+3*math.sin(2*math.pi*(m-6)/12)) for m in range(12)),
+    "HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0",
+    "COMMENTS 1,synthetic",
+    "COMMENTS 2,synthetic",
+    "DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31",
+    ]
+
+MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def write_epw(file_path):
+    """ Write a synthetic year of hourly weather with daily and seasonal cycles """
+    rng = random.Random(1)
+    rows = []
+    h = 0
+    for m in range(12):
+        for d in range(MONTH_DAYS[m]):
+            for hr in range(24):
+                doy = h/24.
+                T = 10-12*math.cos(2*math.pi*doy/365.)+5*math.sin(2*math.pi*(hr-9)/24.)+rng.uniform(-1, 1)
+                RH = 60+20*math.cos(2*math.pi*(hr-4)/24.)
+                Td = T-(100-RH)/5.
+                P = 101325+rng.uniform(-500, 500)
+                sun = max(0., math.sin(math.pi*(hr-6)/12.)) if 6 <= hr <= 18 else 0.
+                season = 0.6+0.4*math.sin(2*math.pi*(doy-80)/365.)
+                direct = 700*sun*season
+                diffuse = 150*sun
+                wind = 3+2*math.sin(2*math.pi*hr/24.)+rng.uniform(0, 1)
+                row = [1999, m+1, d+1, hr+1, 60, "?9?9?9?9E0?9?9?9?9?9?9?9?9?9?9?9?9?9?9?9*9*9?9*9*9",
+                       "%.1f" % T, "%.1f" % Td, "%d" % RH, "%d" % P, 0, 0, "%d" % (300+2*T),
+                       "%d" % (direct*0.7+diffuse), "%d" % direct, "%d" % diffuse, 0, 0, 0, 0,
+                       "%d" % (h % 360), "%.1f" % wind, 5, 5, "9999", "77777", 9, "999999999",
+                       0, "0.1", 0, 88, "0.2", 0, 1]
+                rows.append(",".join(str(x) for x in row))
+                h += 1
+    epw_file = open(file_path, "w")
+    try:
+        epw_file.write("\n".join(EPW_HEADER+rows)+"\n")
+    finally:
+        epw_file.close()
+
+
+@pytest.fixture(scope="session")
+def epw_dir(tmp_path_factory):
+    """ Directory of the synthetic rural EPW test.epw """
+    path = tmp_path_factory.mktemp("epw")
+    write_epw(str(path / "test.epw"))
+    return str(path)
+
+
+def set_parameters(model, nDay, Month, Day):
+    """ Set the parameters of a uwg object, as a .uwg file would """
+    model.Month = Month
+    model.Day = Day
+    model.nDay = nDay
+    model.dtSim = 300.
+    model.dtWeather = 3600.
+    model.autosize = 0
+    model.sensOcc = 100.
+    model.LatFOcc = 0.3
+    model.RadFOcc = 0.2
+    model.RadFEquip = 0.5
+    model.RadFLight = 0.7
+    model.h_ubl1 = 1000.
+    model.h_ubl2 = 80.
+    model.h_ref = 150.
+    model.h_temp = 2.
+    model.h_wind = 10.
+    model.c_circ = 1.2
+    model.c_exch = 1.
+    model.maxDay = 150.
+    model.maxNight = 20.
+    model.windMin = 1.
+    model.h_obs = 0.1
+    model.bldHeight = 10.
+    model.h_mix = 1.
+    model.bldDensity = 0.5
+    model.verToHor = 0.8
+    model.charLength = 1000.
+    model.alb_road = 0.1
+    model.d_road = 0.5
+    model.sensAnth = 20.
+    model.SchTraffic = [[0.2]*7+[0.7]*12+[0.4]*5, [0.2]*7+[0.5]*12+[0.3]*5, [0.2]*7+[0.4]*12+[0.2]*5]
+    bld = [[0., 0., 0.] for i in range(16)]
+    bld[5][1] = 0.4
+    bld[3][2] = 0.3
+    bld[12][0] = 0.2
+    bld[15][1] = 0.1
+    model.bld = bld
+    model.zone = 1.
+    model.vegCover = 0.2
+    model.treeCoverage = 0.1
+    model.vegStart = 4
+    model.vegEnd = 10
+    model.albVeg = 0.25
+    model.rurVegCover = 0.9
+    model.latGrss = 0.4
+    model.latTree = 0.6
+    model.kRoad = 1.
+    model.cRoad = 1600000.
+
+
+class Parameters(object):
+    """ Collects the attributes set by set_parameters """
+    pass
+
+
+@pytest.fixture
+def sweep_params(epw_dir):
+    """
+    Return a function making the base_params of a sweep of the synthetic EPW:
+    sweep_params(nDay=2, Month=7, Day=1, **attributes).
+    """
+    def make(nDay=2, Month=7, Day=1, **attributes):
+        parameters = Parameters()
+        set_parameters(parameters, nDay, Month, Day)
+        params = vars(parameters)
+        params.update(epwFileName="test.epw", epwDir=epw_dir)
+        params.update(attributes)
+        return params
+    return make
+
+
+@pytest.fixture
+def new_uwg(epw_dir, tmp_path):
+    """
+    Return a function making a uwg object of the synthetic EPW, writing to tmp_path:
+    new_uwg(nDay=2, Month=7, Day=1, init=False, **attributes). With init, the object
+    is initialized as run() does before simulate().
+    """
+    count = [0]
+
+    def make(nDay=2, Month=7, Day=1, init=False, **attributes):
+        count[0] += 1
+        model = uwg("test.epw", None, epw_dir, None, str(tmp_path), "test_{}_UWG.epw".format(count[0]))
+        set_parameters(model, nDay, Month, Day)
+        for key, value in attributes.items():
+            setattr(model, key, value)
+        if init:
+            model.read_epw()
+            model.set_input()
+            model.init_BEM_obj()
+            model.init_input_obj()
+            model.hvac_autosize()
+        return model
+    return make
@@ -0,0 +1,162 @@
+"""Tests of the mixing lengths of the rural site model against the original O(nz^2) integration."""
+import math
+import random
+
+import sys
+
+from uwg.RSMDef import RSMDef, BOUGEAULT_TREE_LAYERS, vertical_grid, clear_grid_cache
+
+RSMDef_module = sys.modules["uwg.RSMDef"]
+
+
+def _is_near_zero(num, eps=1e-16):
+    return abs(float(num)) < eps
+
+
+def _dissipation_bougeault_reference(g,nz,z,dz,te,pt):
+    """
+    Mixing lengths (dlu, dld) of RSMDef.DissipationBougeault by the layer by layer
+    integration of the buoyancy of the original model, in O(nz^2)
+    """
+    # Note on translation from UWG_Matlab
+    # list length (i.e nz) != list indexing (i.e dlu[0] in python
+    # wherease in matlab it is
+
+    dlu = [0 for x in range(nz)]
+    dld = [0 for x in range(nz)]
+
+    for iz in range(nz):
+        zup=0.
+        dlu[iz] = z[nz] - z[iz] - dz[iz]/2.
+        zzz=0.
+        zup_inf=0.
+        beta=g/pt[iz]
+
+        for izz in range(iz,nz-1):
+            dzt=(dz[izz+1]+dz[izz])/2.
+            zup=zup-beta*pt[iz]*dzt
+            zup=zup+beta*(pt[izz+1]+pt[izz])*dzt/2.
+            zzz=zzz+dzt
+
+            if (te[iz]<zup) and ((te[iz]>zup_inf) or _is_near_zero(te[iz]-zup_inf)):
+                bbb=(pt[izz+1]-pt[izz])/dzt
+
+                if not _is_near_zero(bbb-0.):
+                    tl=(-beta*(pt[izz]-pt[iz])+ \
+                    math.sqrt( max(0.,(beta*(pt[izz]-pt[iz]))**2.+ \
+                    2.*bbb*beta*(te[iz]-zup_inf))))/bbb/beta
+                else:
+                    tl=(te[iz]-zup_inf)/(beta*(pt[izz]-pt[iz]))
+                dlu[iz]=max(1.,zzz-dzt+tl)
+            zup_inf=zup
+
+        zdo=0.
+        zdo_sup=0.
+        dld[iz]=z[iz]+dz[iz]/2.
+        zzz=0.
+
+        for izz in range(iz,0,-1):
+            dzt=(dz[izz-1]+dz[izz])/2.
+            zdo=zdo+beta*pt[iz]*dzt
+            zdo=zdo-beta*(pt[izz-1]+pt[izz])*dzt/2.
+            zzz=zzz+dzt
+
+            if (te[iz]<zdo) and ((te[iz]>zdo_sup) or _is_near_zero(te[iz]-zdo_sup)):
+                bbb=(pt[izz]-pt[izz-1])/dzt
+
+                if not _is_near_zero(bbb-0.):
+                    tl=(beta*(pt[izz]-pt[iz])+ \
+                        math.sqrt( max(0.,(beta*(pt[izz]-pt[iz]))**2.+ \
+                        2.*bbb*beta*(te[iz]-zdo_sup))))/bbb/beta
+                else:
+                    tl=(te[iz]-zdo_sup)/(beta*(pt[izz]-pt[iz]))
+                dld[iz]=max(1.,zzz-dzt+tl)
+            zdo_sup=zdo
+
+    return dlu,dld
+
+
+def _profiles(rng, nz, lapse):
+    """ Random layer thicknesses, heights, TKE and potential temperature with the given lapse rates """
+    dz = [rng.uniform(2., 200.) for i in range(nz+1)]
+    z = [dz[0]/2.]
+    for i in range(nz):
+        z.append(z[-1]+dz[i])
+    pt = [300.]
+    for i in range(nz-1):
+        pt.append(pt[-1]+lapse())
+    te = [rng.choice([0.01, rng.uniform(0., 5.), rng.uniform(0., 50.)]) for i in range(nz)]
+    return z, dz, te, pt
+
+
+def _non_monotonic(nz, pt):
+    """ Number of layers whose rising or falling buoyancy is not monotonic """
+    count = 0
+    ptm = [(pt[i+1]+pt[i])/2. for i in range(nz-1)]
+    for iz in range(nz):
+        if min(ptm[iz:] or [pt[iz]]) < pt[iz] or max(ptm[:iz] or [pt[iz]]) > pt[iz]:
+            count += 1
+    return count
+
+
+def _check(lapse, seed, trials=300, layers=(2, 40)):
+    rng = random.Random(seed)
+    RSM = RSMDef.__new__(RSMDef)
+    non_monotonic = 0
+    for trial in range(trials):
+        nz = rng.randint(*layers)
+        z, dz, te, pt = _profiles(rng, nz, lambda: lapse(rng))
+        non_monotonic += _non_monotonic(nz, pt)
+
+        dlu, dld = RSM.DissipationBougeault(9.81, nz, z, dz, te, pt)
+        dlu_ref, dld_ref = _dissipation_bougeault_reference(9.81, nz, z, dz, te, pt)
+        for length, ref in zip(dlu + dld, dlu_ref + dld_ref):
+            assert abs(length - ref) <= 1e-9*abs(ref), (trial, length, ref)
+    return non_monotonic
+
+
+def test_dissipation_bougeault_stable():
+    _check(lambda rng: rng.uniform(0., 2.), 1)
+
+
+def test_dissipation_bougeault_unstable():
+    assert _check(lambda rng: -rng.uniform(0., 2.), 2) > 0
+
+
+def test_dissipation_bougeault_non_monotonic():
+    assert _check(lambda rng: rng.gauss(0.2, 1.)*rng.choice([0.1, 1., 3.]), 3) > 0
+
+
+def test_dissipation_bougeault_fine_grid():
+    layers = (BOUGEAULT_TREE_LAYERS, BOUGEAULT_TREE_LAYERS+60)
+    assert _check(lambda rng: rng.gauss(0.2, 1.)*rng.choice([0.1, 1., 3.]), 4, 20, layers) > 0
+    _check(lambda rng: rng.uniform(0., 2.), 5, 5, layers)
+    assert _check(lambda rng: -rng.uniform(0., 2.), 6, 5, layers) > 0
+
+
+class Heights(object):
+    """ Stand-in for the reference heights of a Param object """
+
+    def __init__(self, refHeight):
+        self.tempHeight = 2.
+        self.refHeight = refHeight
+        self.nightBLHeight = 80.
+        self.windHeight = 10.
+        self.dayBLHeight = 1000.
+
+
+def test_vertical_grid_cache(monkeypatch):
+    clear_grid_cache()
+    monkeypatch.setattr(RSMDef_module, "GRID_CACHE_SIZE", 3)
+    z_meso = [2.*i for i in range(200)] + [400. + 20.*i for i in range(40)]
+    grid = vertical_grid(z_meso, Heights(150.))
+    assert vertical_grid(tuple(z_meso), Heights(150.)) is grid
+    assert grid.nzref == 76
+
+    grids = [vertical_grid(z_meso, Heights(100. + i)) for i in range(5)]
+    assert len(RSMDef_module._GRID_CACHE) <= 3
+    assert vertical_grid(z_meso, Heights(104.)) is grids[-1]
+
+    clear_grid_cache()
+    assert vertical_grid(z_meso, Heights(104.)) is not grids[-1]
+    clear_grid_cache()
@@ -0,0 +1,59 @@
+"""Tests of the simulations advancing several uwg objects together."""
+from uwg import simulate_batch, simulate_districts
+
+
+VARIATIONS = [
+    {},
+    {"bldDensity": 0.3, "albRoof": 0.6},
+    {"verToHor": 1.2, "vegCover": 0.4},
+    ]
+
+# Scenarios of a batch can also differ in their rural parameters
+BATCH_VARIATIONS = VARIATIONS + [{"h_obs": 0.5}, {"h_obs": 0.5, "bldDensity": 0.3}]
+
+
+def _separate_runs(new_uwg, variations, **attributes):
+    """ Output series of every variation simulated on its own by run() """
+    series = []
+    for variation in variations:
+        parameters = dict(attributes)
+        parameters.update(variation)
+        model = new_uwg(**parameters)
+        model.run()
+        series.append(model.output.series())
+    return series
+
+
+def test_batch_equals_separate_runs(new_uwg):
+    expected = _separate_runs(new_uwg, BATCH_VARIATIONS)
+    scenarios = [new_uwg(**variation) for variation in BATCH_VARIATIONS]
+    simulate_batch(scenarios)
+    for scenario, series in zip(scenarios, expected):
+        assert scenario.output.series() == series
+
+
+def test_batch_period_mismatch(new_uwg):
+    try:
+        simulate_batch([new_uwg(), new_uwg(nDay=3)])
+    except Exception as e:
+        assert "analysis period" in str(e)
+    else:
+        assert False, "scenarios with different periods must raise"
+
+
+def test_districts_equal_separate_runs(new_uwg):
+    expected = _separate_runs(new_uwg, VARIATIONS)
+    districts = [new_uwg(**variation) for variation in VARIATIONS]
+    simulate_districts(districts)
+    for district, series in zip(districts, expected):
+        assert district.output.series() == series
+
+
+def test_districts_rural_mismatch(new_uwg):
+    districts = [new_uwg(), new_uwg(h_obs=0.5)]
+    try:
+        simulate_districts(districts)
+    except Exception as e:
+        assert "district 1" in str(e)
+    else:
+        assert False, "districts with different rural parameters must raise"
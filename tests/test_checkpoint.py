@@ -0,0 +1,60 @@
+"""Tests of the checkpoint and restart of a simulation."""
+
+
+class Crash(Exception):
+    pass
+
+
+def _crash_at(hour):
+    """ extra_outputs function raising Crash when the simulation records hour """
+    def crash(model):
+        if model.n == hour:
+            raise Crash()
+        return 0.
+    return crash
+
+
+def test_resume_equals_uninterrupted_run(new_uwg, tmp_path):
+    checkpoint_file_path = str(tmp_path / "test.ckpt")
+    expected = new_uwg()
+    expected.run()
+
+    crashed = new_uwg(checkpoint_file_path=checkpoint_file_path, checkpoint_interval=12,
+                      extra_outputs={"crash": _crash_at(30)})
+    try:
+        crashed.run()
+    except Crash:
+        pass
+    else:
+        assert False, "the simulation must crash"
+
+    resumed = new_uwg(extra_outputs={"crash": _crash_at(-1)})
+    resumed.resume_from(checkpoint_file_path)
+    series = resumed.output.series()
+    for name, values in expected.output.series().items():
+        assert series[name] == values
+    assert resumed.rural.layerTemp == expected.rural.layerTemp
+    assert resumed.BEM[1].building.indoorTemp == expected.BEM[1].building.indoorTemp
+
+
+def test_resume_other_period(new_uwg, tmp_path):
+    checkpoint_file_path = str(tmp_path / "test.ckpt")
+    new_uwg(checkpoint_file_path=checkpoint_file_path, checkpoint_interval=24).run()
+    try:
+        new_uwg(nDay=3).resume_from(checkpoint_file_path)
+    except Exception as e:
+        assert "period" in str(e)
+    else:
+        assert False, "a checkpoint of another period must raise"
+
+
+def test_invalid_checkpoint_interval(new_uwg, tmp_path):
+    checkpoint_file_path = str(tmp_path / "test.ckpt")
+    for interval in (0, 0.5, 1.5):
+        model = new_uwg(checkpoint_file_path=checkpoint_file_path, checkpoint_interval=interval)
+        try:
+            model.run()
+        except Exception as e:
+            assert "checkpoint_interval" in str(e)
+        else:
+            assert False, "checkpoint_interval {} must raise".format(interval)
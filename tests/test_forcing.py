@@ -0,0 +1,37 @@
+"""Tests of the per-timestep clock of an analysis period."""
+import math
+import sys
+
+from uwg import SimParam
+from uwg.forcing import timestep_clock, clear_clock_cache
+
+forcing = sys.modules["uwg.forcing"]
+
+
+def test_clock_equals_stepping():
+    clear_clock_cache()
+    simTime = SimParam(300., 3600., 2, 27, 3)
+    weather_index, month, dayType = timestep_clock(simTime)
+    assert simTime.month == 2 and simTime.day == 27
+
+    for it in range(1, simTime.nt):
+        assert month[it] == simTime.month
+        simTime.UpdateDate()
+        assert weather_index[it] == int(math.ceil(it * simTime.dt / 3600.)) - 1
+        day = simTime.julian % 7
+        assert dayType[it] == (3 if day == 0 else 2 if day == 6 else 1)
+
+
+def test_clock_cache(monkeypatch):
+    clear_clock_cache()
+    monkeypatch.setattr(forcing, "CLOCK_CACHE_SIZE", 2)
+    clock = timestep_clock(SimParam(300., 3600., 7, 1, 2))
+    assert timestep_clock(SimParam(300., 3600., 7, 1, 2)) is clock
+
+    clocks = [timestep_clock(SimParam(300., 3600., 7, day, 2)) for day in range(2, 6)]
+    assert len(forcing._CLOCKS) <= 2
+    assert timestep_clock(SimParam(300., 3600., 7, 5, 2)) is clocks[-1]
+
+    clear_clock_cache()
+    assert timestep_clock(SimParam(300., 3600., 7, 5, 2)) is not clocks[-1]
+    clear_clock_cache()
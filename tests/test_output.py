@@ -0,0 +1,124 @@
+"""Tests of the output channels and files of a simulation."""
+from uwg import uwg
+from uwg.output import OUTPUT_CHANNELS, BEM_OUTPUT_CHANNELS, PROFILE_OUTPUT_CHANNELS, \
+    EPW_CHANNELS, select_channels, read_output
+
+# Every output channel
+ALL_CHANNELS = list(OUTPUT_CHANNELS) + list(BEM_OUTPUT_CHANNELS) + list(PROFILE_OUTPUT_CHANNELS)
+
+
+class Model(object):
+    """ Stand-in for a uwg object, with attributes set from dotted paths """
+
+    def set(self, path, value):
+        obj = self
+        names = path.split(".")
+        for name in names[:-1]:
+            if not hasattr(obj, name):
+                setattr(obj, name, Model())
+            obj = getattr(obj, name)
+        setattr(obj, names[-1], value)
+
+
+def test_registries_disjoint():
+    registries = (OUTPUT_CHANNELS, BEM_OUTPUT_CHANNELS, PROFILE_OUTPUT_CHANNELS)
+    names = [name for registry in registries for name in registry]
+    assert len(names) == len(set(names))
+
+
+def test_select_every_channel():
+    bem_number = 2
+    layer_number = 3
+    for name in OUTPUT_CHANNELS:
+        channels = select_channels([name], bem_number, None, layer_number)
+        expected = list(EPW_CHANNELS) + ([name] if name not in EPW_CHANNELS else [])
+        assert [column for column, _ in channels] == expected
+
+    for name, (attribute, _) in BEM_OUTPUT_CHANNELS.items():
+        channels = select_channels([name], bem_number, None, layer_number)
+        assert [column for column, _ in channels] == \
+            list(EPW_CHANNELS) + ["{}_{}".format(name, k) for k in range(bem_number)]
+
+        model = Model()
+        model.BEM = []
+        for k in range(bem_number):
+            bem = Model()
+            bem.set(attribute, 10. + k)
+            model.BEM.append(bem)
+        assert [get(model) for _, get in channels[len(EPW_CHANNELS):]] == [10., 11.]
+
+    for name, (attribute, _) in PROFILE_OUTPUT_CHANNELS.items():
+        channels = select_channels([name], bem_number, None, layer_number)
+        assert [column for column, _ in channels] == \
+            list(EPW_CHANNELS) + ["{}_{}".format(name, iz) for iz in range(layer_number)]
+
+        model = Model()
+        model.set(attribute, [20., 21., 22.])
+        assert [get(model) for _, get in channels[len(EPW_CHANNELS):]] == [20., 21., 22.]
+
+
+def test_select_unknown_channel():
+    try:
+        select_channels(["notAChannel"])
+    except Exception as e:
+        assert "notAChannel" in str(e)
+    else:
+        assert False
+
+
+def test_write_output_without_path():
+    model = uwg("rural.epw")
+    try:
+        model.write_output()
+    except Exception as e:
+        assert "output_file_path" in str(e)
+    else:
+        assert False
+
+
+def test_binary_round_trip(new_uwg, tmp_path):
+    file_path = str(tmp_path / "test.out")
+    model = new_uwg(output_channels=ALL_CHANNELS, output_file_path=file_path)
+    model.run()
+
+    header, store = read_output(file_path)
+    assert header["N"] == model.N == 48
+    assert header["channels"] == model.output.names
+    assert header["metadata"] == {"Month": 7, "Day": 1, "nDay": 2, "epwFileName": "test.epw"}
+    assert store.names == model.output.names
+    for name in model.output.names:
+        assert store[name] == model.output[name]
+
+
+def test_csv_output(new_uwg, tmp_path):
+    file_path = str(tmp_path / "test.csv")
+    model = new_uwg(output_channels=ALL_CHANNELS, output_file_path=file_path)
+    model.run()
+
+    csv_file = open(file_path)
+    try:
+        lines = csv_file.read().splitlines()
+    finally:
+        csv_file.close()
+    assert lines[0].split(",") == ["hour"] + model.output.names
+    assert len(lines) == model.N + 1
+    for n in range(model.N):
+        row = lines[n + 1].split(",")
+        assert int(row[0]) == n
+        assert [float(value) for value in row[1:]] == \
+            [model.output[name][n] for name in model.output.names]
+
+
+def test_read_other_file(tmp_path):
+    file_path = str(tmp_path / "test.csv")
+    csv_file = open(file_path, "w")
+    try:
+        csv_file.write("hour,canTemp\n0,300.\n")
+    finally:
+        csv_file.close()
+    try:
+        read_output(file_path)
+    except Exception as e:
+        assert "not a uwg binary output file" in str(e)
+    else:
+        assert False
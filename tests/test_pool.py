@@ -0,0 +1,25 @@
+"""Tests of the process pool of the sweep and sharded simulations."""
+from uwg import sweep
+from uwg.pool import scenario
+
+
+def test_scenario(sweep_params):
+    model = scenario(sweep_params(bldDensity=0.3))
+    assert model.epwFileName == "test.epw"
+    assert model.bldDensity == 0.3
+
+
+def test_scenario_unknown_parameter(sweep_params):
+    try:
+        scenario(sweep_params(notAParameter=1.))
+    except Exception as e:
+        assert "notAParameter" in str(e)
+    else:
+        assert False
+
+
+def test_pool_equals_serial(sweep_params):
+    variations = [{"bldDensity": 0.3}, {"albRoof": 0.6}, {"verToHor": 1.2}]
+    serial = dict(sweep(sweep_params(), variations, workers=1))
+    parallel = dict(sweep(sweep_params(), variations, workers=2))
+    assert parallel == serial
@@ -0,0 +1,57 @@
+"""Tests of the rural trajectory cache."""
+import os
+
+import pytest
+
+from uwg.rural import clear_rural_cache
+
+
+@pytest.fixture(autouse=True)
+def rural_cache():
+    """ Start and end every test without trajectories in memory """
+    clear_rural_cache()
+    yield
+    clear_rural_cache()
+
+
+def test_replay_equals_run(new_uwg, tmp_path):
+    cache_dir = str(tmp_path / "rural")
+    expected = new_uwg(bldDensity=0.3)
+    expected.run()
+
+    recorded = new_uwg(rural_cache=True, rural_cache_dir=cache_dir)
+    recorded.run()
+    assert not recorded._rural_replay
+    assert len(os.listdir(cache_dir)) == 1
+
+    replayed = new_uwg(bldDensity=0.3, rural_cache=True, rural_cache_dir=cache_dir)
+    replayed.run()
+    assert replayed._rural_replay
+    assert replayed.output.series() == expected.output.series()
+    # The end state of the rural models is restored after a replay
+    assert replayed.rural.layerTemp == expected.rural.layerTemp
+    assert replayed.RSM.tempProf == expected.RSM.tempProf
+
+    # Replay of the trajectory file
+    clear_rural_cache()
+    read = new_uwg(bldDensity=0.3, rural_cache=True, rural_cache_dir=cache_dir)
+    read.run()
+    assert read._rural_replay
+    assert read.output.series() == expected.output.series()
+
+
+def test_other_rural_parameters_record(new_uwg):
+    new_uwg(rural_cache=True).run()
+    model = new_uwg(h_obs=0.5, rural_cache=True)
+    model.run()
+    assert not model._rural_replay
+
+
+def test_rural_profile_channel(new_uwg):
+    model = new_uwg(rural_cache=True, output_channels=["canTemp", "ruralTempProf"])
+    try:
+        model.run()
+    except Exception as e:
+        assert "ruralTempProf" in str(e)
+    else:
+        assert False, "rural profile channels must raise with rural_cache"
@@ -0,0 +1,37 @@
+"""Tests of the solar position table shared by the simulations of a site."""
+import sys
+
+from uwg.solarcalcs import clear_solar_tables, solar_table
+
+solarcalcs = sys.modules["uwg.solarcalcs"]
+
+
+def test_table_shared_across_periods(new_uwg):
+    clear_solar_tables()
+    expected = new_uwg(nDay=2, Day=2)
+    expected.run()
+
+    clear_solar_tables()
+    new_uwg(nDay=2, Day=1, dtSim=600.).run()
+    table = solar_table(expected.RSM.lat, expected.RSM.lon, expected.RSM.GMT)
+    size = len(table)
+    # A new period of the site fills the same table, and reads its positions
+    model = new_uwg(nDay=2, Day=2)
+    model.run()
+    assert model.solar.table is table
+    assert len(table) > size
+    assert model.output.series() == expected.output.series()
+
+
+def test_table_size(new_uwg, monkeypatch):
+    clear_solar_tables()
+    monkeypatch.setattr(solarcalcs, "SOLAR_TABLE_SIZE", 50)
+    expected = new_uwg()
+    expected.run()
+    assert len(expected.solar.table) <= 50
+
+    clear_solar_tables()
+    monkeypatch.setattr(solarcalcs, "SOLAR_TABLE_SIZE", 1000000)
+    model = new_uwg()
+    model.run()
+    assert model.output.series() == expected.output.series()
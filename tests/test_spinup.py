@@ -0,0 +1,55 @@
+"""Tests of the warm start of a simulation from a spin-up."""
+import os
+
+import pytest
+
+from uwg import sweep
+from uwg.rural import clear_rural_cache
+from uwg.spinup import clear_spinup_cache
+
+
+@pytest.fixture(autouse=True)
+def spinup_cache():
+    """ Start and end every test without spin-ups or trajectories in memory """
+    clear_spinup_cache()
+    clear_rural_cache()
+    yield
+    clear_spinup_cache()
+    clear_rural_cache()
+
+
+def test_warm_start_equals_longer_run(new_uwg, tmp_path):
+    cache_dir = str(tmp_path / "spinup")
+    longer = new_uwg(nDay=4, Month=7, Day=1)
+    longer.run()
+    expected = dict((name, values[48:]) for name, values in longer.output.series().items())
+
+    warm = new_uwg(nDay=2, Month=7, Day=3, spinup_days=2, spinup_cache_dir=cache_dir)
+    warm.run()
+    assert warm.spinup_length == 2
+    assert warm.output.series() == expected
+    assert len(os.listdir(cache_dir)) == 1
+
+    # Warm start from the spin-up kept in memory, then from its file
+    cached = new_uwg(nDay=2, Month=7, Day=3, spinup_days=2, spinup_cache_dir=cache_dir)
+    cached.run()
+    assert cached.output.series() == expected
+    clear_spinup_cache()
+    read = new_uwg(nDay=2, Month=7, Day=3, spinup_days=2, spinup_cache_dir=cache_dir)
+    read.run()
+    assert read.output.series() == expected
+
+
+def test_sweep_warm_start(new_uwg, sweep_params, tmp_path):
+    cache_dir = str(tmp_path / "rural")
+    variations = [{"bldDensity": 0.3}, {"bldHeight": 20.}]
+    base_params = sweep_params(Day=3, spinup_days=2, rural_cache=True, rural_cache_dir=cache_dir)
+    results = dict(sweep(base_params, variations, workers=1))
+    # Both scenarios replay the rural trajectory simulated from the warm start
+    assert len(os.listdir(cache_dir)) == 1
+
+    for index, variation in enumerate(variations):
+        model = new_uwg(Day=3, spinup_days=2, **variation)
+        model.run()
+        for name in ("canTemp", "Tdp", "canRHum"):
+            assert results[index][name] == model.output[name].tolist()
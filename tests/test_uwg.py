@@ -0,0 +1,92 @@
+"""Tests of the division of the road and rural elements in layers."""
+from uwg import uwg
+from uwg.uwg import stretchMat
+from uwg.material import Material
+from uwg.element import Element
+
+
+def _element(layers):
+    """ Element of (Material, thickness) layers """
+    materials = [mat for mat, _ in layers]
+    return Element(0.1, 0.95, [t for _, t in layers], materials, 0., 293., True, "road")
+
+
+def _split(newmat, newthickness):
+    """ Consecutive (thermalCond, total thickness) of the materials of a division """
+    totals = []
+    for mat, dz in zip(newmat, newthickness):
+        if totals and totals[-1][0] == mat.thermalCond:
+            totals[-1][1] += dz
+        else:
+            totals.append([mat.thermalCond, dz])
+    return totals
+
+
+ASPHALT = Material(1., 1.6e6, name="asphalt")
+GRAVEL = Material(2., 2.0e6, name="gravel")
+SOIL = Material(0.5, 1.5e6, name="soil")
+
+
+def test_stretch_material_boundaries():
+    element = _element([(ASPHALT, 0.2), (GRAVEL, 0.3), (GRAVEL, 0.1)])
+    newmat, newthickness = stretchMat(element, 0., SOIL, 0.05, 1.3, 0.01)
+    totals = _split(newmat, newthickness)
+    assert [k for k, _ in totals] == [1., 2.]
+    assert abs(totals[0][1]-0.2) < 1e-12 and abs(totals[1][1]-0.4) < 1e-12
+    # Layers get thicker with depth within a material
+    for j in range(1, len(newthickness)-1):
+        if newmat[j].thermalCond == newmat[j+1].thermalCond:
+            assert newthickness[j] >= newthickness[j-1]
+    assert newthickness[0] == 0.05
+
+
+def test_stretch_soil_padding():
+    element = _element([(ASPHALT, 0.2), (GRAVEL, 0.3)])
+    newmat, newthickness = stretchMat(element, 4., SOIL, 0.05, 1.3, 0.01)
+    totals = _split(newmat, newthickness)
+    assert [k for k, _ in totals] == [1., 2., 0.5]
+    assert abs(sum(newthickness)-4.) < 1e-12
+    assert abs(totals[2][1]-3.5) < 1e-12
+    assert len(newthickness) < 20
+
+
+def test_stretch_single_layer():
+    element = _element([(ASPHALT, 0.04)])
+    newmat, newthickness = stretchMat(element, 0., SOIL, 0.05, 1.3, 0.01)
+    assert newthickness == [0.02, 0.02]
+    assert [mat.thermalCond for mat in newmat] == [1., 1.]
+
+
+def test_stretch_skips_thin_layer():
+    a = Material(1., 1.6e6, name="a")
+    b = Material(0.2, 1.0e6, name="b")
+    element = _element([(a, 0.1), (b, 0.005), (b, 0.1)])
+    newmat, newthickness = stretchMat(element, 0., SOIL, 0.05, 1.3, 0.01)
+    totals = _split(newmat, newthickness)
+    assert [k for k, _ in totals] == [1., 0.2]
+    assert abs(totals[0][1]-0.1) < 1e-12 and abs(totals[1][1]-0.1) < 1e-12
+
+
+def test_ground_layers():
+    model = uwg("test.epw")
+    model.depth_soil = [[0.5], [2.], [4.]]
+    model.nSoil = 3
+    element = _element([(ASPHALT, 0.2), (GRAVEL, 0.6)])
+    for growth in (None, 1.3):
+        model.layerGrowth = growth
+        newmat, newthickness, index = model._ground_layers(element)
+        assert index == 1
+        assert abs(sum(newthickness)-2.) < 1e-9
+        assert newmat[-1] is model.SOIL
+
+
+def test_layer_growth_accuracy(new_uwg):
+    # 3m of road padded with soil down to 4m: 81 layers of 5cm or 12 growing layers
+    temps = []
+    for growth in (None, 1.3):
+        model = new_uwg(5, d_road=3., layerGrowth=growth, output_channels=["roadTemp"], init=True)
+        model.simulate()
+        temps.append((model.output["canTemp"], model.output["roadTemp"], len(model.road.layerThickness)))
+    assert temps[0][2] == 81 and temps[1][2] < 15
+    for name in range(2):
+        assert max(abs(a-b) for a, b in zip(temps[0][name], temps[1][name])) < 0.02
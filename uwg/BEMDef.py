@@ -47,3 +47,111 @@ class BEMDef(object):
             self.building.Era,
             self.wall._name
             )
+
+
+class BuildingStock(object):
+    """
+    Struct-of-arrays view of the coefficients of a list of BEMDef objects that don't
+    change during a simulation: one list per coefficient, indexed like the BEMDef list.
+    The BEMDef objects keep the state of each typology (temperatures, demands, ...).
+
+    The coefficients are computed from the building, the schedule ventilation
+    (building.vent) and the urban canyon geometry, so build a new stock if any of
+    them changes (see uwg._init_simulation).
+
+    attributes:
+        frac;           # fraction of the urban floor space of each typology
+        fl_area;        # building floor area in the urban area (m2)
+        densFrac;       # frac x bldDensity
+
+        % Building.BEMCalc (per m^2 of bld footprint, see BEMCalc)
+        nFloor;         # number of floors
+        volVent;        # ventilation volume flow (m3 s-1)
+        volInfil;       # infiltration volume flow (m3 s-1)
+        wallArea;       # wall area (m2)
+        winArea;        # window area (m2)
+        massArea;       # internal mass area (m2)
+        wallConv;       # wall area x wall convection coefficient
+        massConv;       # mass area x mass convection coefficient
+        winCond;        # window area x window U value
+
+        % UCMDef.UCModel (per m^2 of urban area)
+        A_wall;         # wall area
+        A_window;       # window area
+        A_windowU;      # window area x window U value
+        ventCp;         # roof area x ventilation volume x Cp
+        infilCp;        # roof area x infiltration volume x Cp
+        winShade;       # 1 - shgc, solar heat that doesn't go through windows
+        windowFrac;     # frac x verToHor x glazing ratio
+        windowFracU;    # frac x verToHor x glazing ratio x window U value
+        ventFrac;       # frac x bldDensity x Cp
+        volVentInfil;   # ventilation and infiltration volume flow (m3 s-1 m-2 of bld)
+    """
+
+    def __init__(self, BEM, UCM, parameter):
+        Cp_air = parameter.cp
+        zac_in_wall = 3.076         # wall heat convection coefficeint (see Building.BEMCalc)
+        zac_in_mass = 3.076         # mass heat convection coefficeint
+        facArea = UCM.verToHor/UCM.bldDensity       # [m2(facade)/m2(bld)]
+
+        self.size = len(BEM)
+        self.frac = [bem.frac for bem in BEM]
+        self.fl_area = [bem.fl_area for bem in BEM]
+        self.densFrac = [bem.frac*UCM.bldDensity for bem in BEM]
+
+        self.nFloor = []
+        self.volVent = []
+        self.volInfil = []
+        self.wallArea = []
+        self.winArea = []
+        self.massArea = []
+        self.wallConv = []
+        self.massConv = []
+        self.winCond = []
+        self.A_wall = []
+        self.A_window = []
+        self.A_windowU = []
+        self.ventCp = []
+        self.infilCp = []
+        self.winShade = []
+        self.windowFrac = []
+        self.windowFracU = []
+        self.ventFrac = []
+        self.volVentInfil = []
+
+        for bem in BEM:
+            building = bem.building
+            nFloor = max(UCM.bldHeight/float(building.floorHeight),1)   # At least one floor
+            wallArea = facArea*(1.-building.glazingRatio)
+            winArea = facArea*building.glazingRatio
+            massArea = 2*nFloor-1
+            self.nFloor.append(nFloor)
+            self.volVent.append(building.vent * nFloor)
+            self.volInfil.append(building.infil * UCM.bldHeight / 3600.)
+            self.wallArea.append(wallArea)
+            self.winArea.append(winArea)
+            self.massArea.append(massArea)
+            self.wallConv.append(wallArea*zac_in_wall)
+            self.massConv.append(massArea*zac_in_mass)
+            self.winCond.append(winArea*building.uValue)
+
+            R_glazing = building.glazingRatio
+            A_window = R_glazing*UCM.facArea
+            self.A_wall.append((1.-R_glazing)*UCM.facArea)
+            self.A_window.append(A_window)
+            self.A_windowU.append(A_window*building.uValue)
+            self.ventCp.append(UCM.roofArea*building.vent*nFloor*Cp_air)
+            self.infilCp.append(UCM.roofArea*building.infil*UCM.bldHeight/3600.0*Cp_air)
+            self.winShade.append(1.0-building.shgc)
+            self.windowFrac.append(bem.frac*UCM.verToHor*R_glazing)
+            self.windowFracU.append(bem.frac*UCM.verToHor*R_glazing*building.uValue)
+            self.ventFrac.append(bem.frac*UCM.bldDensity*Cp_air)
+            self.volVentInfil.append(building.vent*nFloor + building.infil*UCM.bldHeight/3600.0)
+
+    def __repr__(self):
+        return "BuildingStock: {} typologies".format(self.size)
+
+    def building_coefficients(self, j):
+        """ Coefficients of typology j used by Building.BEMCalc """
+        return (self.nFloor[j], self.volVent[j], self.volInfil[j], self.wallArea[j], self.winArea[j],
+                self.massArea[j], self.wallConv[j], self.massConv[j], self.winCond[j])
@@ -9,8 +9,203 @@ import os
 import math
 from pprint import pprint
 
+from .tridiag import solve, invert
+
 ppr = pprint
 
+# Maximum number of z_meso.txt files and of vertical grids kept, the caches are emptied
+# when they are full
+GRID_CACHE_SIZE = 64
+
+# Heights of the z_meso.txt files read so far, by path
+_Z_MESO_CACHE = {}
+# Vertical grids by heights and reference heights, see vertical_grid
+_GRID_CACHE = {}
+
+
+def vertical_grid(z_meso, parameter):
+    """
+    Return the VerticalGrid of the z_meso heights (m) and the reference heights of
+    parameter (Param), built once per process and shared by every RSMDef.
+    """
+    key = (tuple(z_meso), parameter.tempHeight, parameter.refHeight,
+           parameter.nightBLHeight, parameter.windHeight, parameter.dayBLHeight)
+    grid = _GRID_CACHE.get(key)
+    if grid is None:
+        if len(_GRID_CACHE) >= GRID_CACHE_SIZE:
+            _GRID_CACHE.clear()
+        grid = _GRID_CACHE[key] = VerticalGrid(*key)
+    return grid
+
+
+def clear_grid_cache():
+    """ Free the memory of the z_meso heights and vertical grids kept in this process """
+    _Z_MESO_CACHE.clear()
+    _GRID_CACHE.clear()
+
+
+class VerticalGrid(object):
+    """
+    Vertical grid of the rural site model and the layers of its reference heights.
+    Grids are shared between RSMDef objects (see vertical_grid), don't modify them.
+
+    properties
+        z_meso;        % heights of the layer boundaries (m)
+        z;             % vertical height (m)
+        dz;            % vertical discretization (m)
+        nz0;           % layer number at zmt (m)
+        nzref;         % layer number at zref (m)
+        nzfor;         % layer number at zfor (m)
+        nz10;          % layer number at zmu (m)
+        nzi;           % layer number at zi_d (m)
+    """
+
+    def __init__(self,z_meso,tempHeight,refHeight,nightBLHeight,windHeight,dayBLHeight):
+        self.z_meso = tuple(z_meso)
+        # Midht btwn each distance interval, distance betweeen each interval
+        self.z = tuple(0.5 * (z_meso[zi] + z_meso[zi+1]) for zi in range(len(z_meso)-1))
+        self.dz = tuple(z_meso[zi+1] - z_meso[zi] for zi in range(len(z_meso)-1))
+
+        # first layer with a height >= each reference height
+        self.nz0 = self._layer(tempHeight)          # reference height for weather station
+        self.nzref = self._layer(refHeight)         # reference inversion height
+        self.nzfor = self._layer(nightBLHeight)     # nighttime boundary layer height
+        self.nz10 = self._layer(windHeight)         # wind height
+        self.nzi = self._layer(dayBLHeight)         # daytime boundary layer height
+
+    def __repr__(self):
+        return "VerticalGrid: {} layers up to {}m, nzref = {}".format(
+            len(self.z), self.z_meso[-1], self.nzref)
+
+    def _layer(self,height):
+        """ Layer number (index + 1) of the first z >= height, None if the grid is lower """
+        for iz in range(len(self.z)):
+            if abs(self.z[iz] - height) < 1e-16 or self.z[iz] > height:
+                return iz+1
+        return None
+
+
+# Number of layers from which the non-monotonic mixing lengths are searched for with a
+# _BuoyancyTree rather than by scanning the layers, which is faster on coarser grids
+BOUGEAULT_TREE_LAYERS = 100
+
+
+def _hull(A, B, points, upper):
+    """ Upper (or lower) convex hull of the points (B[j], A[j]) of a list of increasing j """
+    hull = []
+    for j in points:
+        while len(hull) > 1:
+            i, k = hull[-2], hull[-1]
+            cross = (B[k]-B[i])*(A[j]-A[i])-(A[k]-A[i])*(B[j]-B[i])
+            if (cross >= 0.) if upper else (cross <= 0.):
+                hull.pop()
+            else:
+                break
+        hull.append(j)
+    return hull
+
+
+class _BuoyancyTree(object):
+    """
+    Segment tree of the upper and lower convex hulls of the points (B[j], A[j]) of
+    RSMDef.DissipationBougeault, to find the first or last layer j of a range with
+    A[j]-p*B[j] above (or not above) a threshold t in O(log nz).
+
+    The maximum (minimum) of A-p*B over the hull of a node is found by moving a pointer
+    along the hull, which only moves one way if the queries come by increasing p, so
+    the hulls are built in O(nz log nz) and walked in O(nz log nz) for nz queries.
+    """
+
+    def __init__(self, A, B):
+        self.A = A
+        self.B = B
+        size = 1
+        while size < len(A):
+            size *= 2
+        self.size = size
+        self.upper = [None for x in range(2*size)]
+        self.lower = [None for x in range(2*size)]
+        for j in range(len(A)):
+            self.upper[size+j] = self.lower[size+j] = [j]
+        for node in range(size-1, 0, -1):
+            left, right = 2*node, 2*node+1
+            if self.upper[right] is None:
+                self.upper[node] = self.upper[left]
+                self.lower[node] = self.lower[left]
+            elif self.upper[left] is not None:
+                self.upper[node] = _hull(A, B, self.upper[left]+self.upper[right], True)
+                self.lower[node] = _hull(A, B, self.lower[left]+self.lower[right], False)
+        # pointers to the maximum of the upper hulls and the minimum of the lower hulls
+        self.up = [len(hull)-1 if hull else 0 for hull in self.upper]
+        self.lo = [0 for x in range(2*size)]
+
+    def _extreme(self, node, p, above):
+        """ Maximum (above) or minimum of A-p*B over the layers of a node """
+        A = self.A
+        B = self.B
+        if above:
+            hull = self.upper[node]
+            k = self.up[node]
+            v = A[hull[k]]-p*B[hull[k]]
+            while k > 0:
+                w = A[hull[k-1]]-p*B[hull[k-1]]
+                if w < v:
+                    break
+                k -= 1
+                v = w
+            self.up[node] = k
+        else:
+            hull = self.lower[node]
+            k = self.lo[node]
+            v = A[hull[k]]-p*B[hull[k]]
+            last = len(hull)-1
+            while k < last:
+                w = A[hull[k+1]]-p*B[hull[k+1]]
+                if w > v:
+                    break
+                k += 1
+                v = w
+            self.lo[node] = k
+        return v
+
+    def find(self, lo, hi, p, t, above, last):
+        """
+        Return the last (or first) layer j, lo <= j <= hi, with A[j]-p*B[j] > t if above
+        else A[j]-p*B[j] <= t, or -1. p must not decrease from one call to the next.
+        """
+        size = self.size
+        # nodes covering [lo, hi], from left to right
+        left = []
+        right = []
+        l, r = lo+size, hi+size+1
+        while l < r:
+            if l & 1:
+                left.append(l)
+                l += 1
+            if r & 1:
+                r -= 1
+                right.append(r)
+            l //= 2
+            r //= 2
+        nodes = left+right[::-1]
+        if last:
+            nodes.reverse()
+
+        for node in nodes:
+            v = self._extreme(node, p, above)
+            if (v > t) if above else (v <= t):
+                # descend to the last (first) layer of the node
+                while node < size:
+                    first, second = (2*node+1, 2*node) if last else (2*node, 2*node+1)
+                    if self.upper[first] is not None:
+                        v = self._extreme(first, p, above)
+                        if (v > t) if above else (v <= t):
+                            node = first
+                            continue
+                    node = second
+                return node-size
+        return -1
+
 
 class RSMDef(object):
     """
@@ -46,8 +241,12 @@ class RSMDef(object):
 
     def __init__(self,lat,lon,GMT,height,T_init,P_init,parameter,z_meso_path):
 
-        # defines self.z_meso property
-        self.load_z_meso(z_meso_path)
+        # defines self.z_meso property, z_meso_path is a directory with a z_meso.txt
+        # file or a list of the heights of the grid (m)
+        if isinstance(z_meso_path, (list, tuple)):
+            self.z_meso = tuple(float(z_) for z_ in z_meso_path)
+        else:
+            self.load_z_meso(z_meso_path)
 
         self.lat = lat                  # latitude (deg)
         self.lon = lon                  # longitude (deg)
@@ -56,51 +255,15 @@ class RSMDef(object):
         self.z0r = 0.1 * height         # rural roughness length (m)
         self.disp = 0.5 * height        # rural displacement lenght (m)
 
-        # vertical grid at the rural site
-        self.z  = [0 for x in range(len(self.z_meso)-1)] # Midht btwn each distance interval
-        self.dz = [0 for x in range(len(self.z_meso)-1)] # Distance betweeen each interval
-
-        for zi in range(len(self.z_meso)-1):
-            self.z[zi] = 0.5 * (self.z_meso[zi] + self.z_meso[zi+1])
-            self.dz[zi] = self.z_meso[zi+1] - self.z_meso[zi]
-
-        # Define initial booleans
-        ll = True
-        mm = True
-        nn = True
-        oo = True
-        pp = True
-
-        # Define self.nz0, self.nzref, self.nzfor, self.nz10, self.nzi
-        for iz in range(len(self.z_meso)-1):
-            # self.nz0: self.z index >= reference height for weather station
-            eq_th = self.is_near_zero(self.z[iz] - parameter.tempHeight)
-            if (eq_th == True or self.z[iz] > parameter.tempHeight) and ll==True:
-                self.nz0 = iz+1   # layer number at zmt (m)
-                ll = False
-
-            # self.nzref: self.z index >= reference inversion height
-            eq_rh = self.is_near_zero(self.z[iz] - parameter.refHeight)
-            if (eq_rh == True or self.z[iz] > parameter.refHeight) and mm==True:
-              self.nzref = iz+1   # layer number at zref (m)
-              mm = False
-
-            # self.nzfor: self.z index >= nighttime boundary layer height
-            eq_nh = self.is_near_zero(self.z[iz] - parameter.nightBLHeight)
-            if (eq_nh == True or self.z[iz] > parameter.nightBLHeight) and nn==True:
-              self.nzfor = iz+1   # layer number at zfor (m)
-              nn = False
-
-            # self.nz10: self.z index >= wind height
-            eq_wh = self.is_near_zero(self.z[iz] - parameter.windHeight)
-            if (eq_wh == True or self.z[iz] > parameter.windHeight) and oo==True:
-              self.nz10 = iz+1    # layer number at zmu (m)
-              oo = False
-
-            eq_dh = self.is_near_zero(self.z[iz] - parameter.dayBLHeight)
-            if (eq_dh == True or self.z[iz] > parameter.dayBLHeight) and pp==True:
-              self.nzi = iz+1     # layer number at zi_d (m)
-              pp = False
+        # vertical grid at the rural site, shared by every RSMDef with the same grid and heights
+        grid = vertical_grid(self.z_meso, parameter)
+        self.z = grid.z                 # Midht btwn each distance interval
+        self.dz = grid.dz               # Distance betweeen each interval
+        self.nz0 = grid.nz0             # layer number at zmt (m)
+        self.nzref = grid.nzref         # layer number at zref (m)
+        self.nzfor = grid.nzfor         # layer number at zfor (m)
+        self.nz10 = grid.nz10           # layer number at zmu (m)
+        self.nzi = grid.nzi             # layer number at zi_d (m)
 
         # Define temperature, pressure and density vertical profiles
         self.tempProf = [T_init for x in range(self.nzref)]
@@ -127,6 +290,11 @@ class RSMDef(object):
         self.densityProfS[self.nzref] = self.densityProfC[self.nzref-1]
         self.windProf = [1 for x in range(self.nzref)]
 
+        # Preallocated tridiagonal coefficients of the diffusion equation
+        self._diffusion_buf = None
+        # Column integrals of the profiles, computed once per VDM step
+        self._integrals = None
+
     def __repr__(self):
         return "RSM: obstacle ht = {}m, surface roughness length = {}m, displacement length = {}m".format(
             self.height,
@@ -138,21 +306,28 @@ class RSMDef(object):
         return abs(float(num)) < eps
 
     def load_z_meso(self,z_meso_path):
-        """ Open the z_meso.txt file and return heights as list """
+        """ Open the z_meso.txt file and return heights as tuple, read once per process """
 
-        self.z_meso = []
-        z_meso_file_path = os.path.join(z_meso_path, self.Z_MESO_FILE_NAME)
+        z_meso_file_path = os.path.abspath(os.path.join(z_meso_path, self.Z_MESO_FILE_NAME))
+        self.z_meso = _Z_MESO_CACHE.get(z_meso_file_path)
+        if self.z_meso is not None:
+            return self.z_meso
 
         # Check if exists
         if not os.path.exists(z_meso_file_path):
-            raise Exception("z_meso.txt file: '{}' does not exist.".format(uwg_param_file))
+            raise Exception("z_meso.txt file: '{}' does not exist.".format(z_meso_file_path))
 
+        z_meso = []
         f = open(z_meso_file_path,'r')
         for txtline in f:
             z_ = float("".join(txtline.split())) # Strip all white spaces and change to float
-            self.z_meso.append(z_)
+            z_meso.append(z_)
         f.close()
 
+        if len(_Z_MESO_CACHE) >= GRID_CACHE_SIZE:
+            _Z_MESO_CACHE.clear()
+        self.z_meso = _Z_MESO_CACHE[z_meso_file_path] = tuple(z_meso)
+        return self.z_meso
 
     # Ref: The uwg (2012), Eq. (4)
     def VDM(self,forc,rural,parameter,simTime):
@@ -209,11 +384,56 @@ class RSMDef(object):
             self.ublPres = self.ublPres + \
                 self.presProf[iz]*self.dz[iz]/(self.z[self.nzref-1]+self.dz[self.nzref-1]/2.)
 
+        # The profiles changed, integrate them again when needed
+        self._integrals = None
+
+    @property
+    def refDens(self):
+        """ Average air density up to the reference height (nzref layers) (kg m-3) """
+        return self._column_integrals()[0]
+
+    @property
+    def forDens(self):
+        """ Average air density of the nighttime forcing layers (nzfor layers) (kg m-3) """
+        return self._column_integrals()[1]
+
+    @property
+    def intAdv1(self):
+        """ Integral of wind speed times potential temperature over the forcing layers (K m2 s-1) """
+        return self._column_integrals()[2]
+
+    @property
+    def intAdv2(self):
+        """ Integral of wind speed over the forcing layers (m2 s-1) """
+        return self._column_integrals()[3]
+
+    def _column_integrals(self):
+        """
+        Return (refDens, forDens, intAdv1, intAdv2), the column integrals of the profiles
+        used by urbflux and the UBL model, computed once after every VDM step. The sums are
+        exactly rounded (math.fsum) to keep the low order values that UBL.advHeat needs.
+        """
+        if self._integrals is None:
+            nzref = self.nzref
+            nzfor = self.nzfor
+            dz = self.dz
+            densityProfC = self.densityProfC
+            windProf = self.windProf
+            tempProf = self.tempProf
+            refHeight = self.z[nzref-1] + dz[nzref-1]/2.
+            forHeight = self.z[nzfor-1] + dz[nzfor-1]/2.
+            self._integrals = (
+                math.fsum([densityProfC[iz]*dz[iz]/refHeight for iz in range(nzref)]),
+                math.fsum([densityProfC[iz]*dz[iz]/forHeight for iz in range(nzfor)]),
+                math.fsum([windProf[iz]*tempProf[iz]*dz[iz] for iz in range(nzfor)]),
+                math.fsum([windProf[iz]*dz[iz] for iz in range(nzfor)]))
+        return self._integrals
+
     def DiffusionEquation(self,nz,dt,co,da,daz,cd,dz):
 
         cddz = [0 for i in range(nz+2)]
-        a = [[0 for j in range(3)] for i in range(nz)]
-        c = [0 for i in range(nz)]
+        # lower, main, and upper diagonals and RHS, preallocated across timesteps
+        a0, a1, a2, c = self._diffusion_buffers(nz)
 
         #--------------------------------------------------------------------------
         cddz[0] = daz[0]*cd[0]/dz[0]
@@ -221,27 +441,34 @@ class RSMDef(object):
             cddz[iz] = 2.*daz[iz]*cd[iz]/(dz[iz]+dz[iz-1])
         cddz[nz] = daz[nz]*cd[nz]/dz[nz]
         #--------------------------------------------------------------------------
-        a[0][0] = 0.
-        a[0][1] = 1.
-        a[0][2] = 0.
+        a0[0] = 0.
+        a1[0] = 1.
+        a2[0] = 0.
         c[0] = co[0]
 
         for iz in range(1,nz-1):
             dzv = dz[iz]
-            a[iz][0]=-cddz[iz]*dt/dzv/da[iz]
-            a[iz][1]=1+dt*(cddz[iz]+cddz[iz+1])/dzv/da[iz]
-            a[iz][2]=-cddz[iz+1]*dt/dzv/da[iz]
+            a0[iz]=-cddz[iz]*dt/dzv/da[iz]
+            a1[iz]=1+dt*(cddz[iz]+cddz[iz+1])/dzv/da[iz]
+            a2[iz]=-cddz[iz+1]*dt/dzv/da[iz]
             c[iz]=co[iz]
 
-        a[nz-1][0]=-1.
-        a[nz-1][1]=1.
-        a[nz-1][2]=0.
+        a0[nz-1]=-1.
+        a1[nz-1]=1.
+        a2[nz-1]=0.
         c[nz-1]=0.
 
         #--------------------------------------------------------------------------
-        co = self.invert(nz,a,c)
+        co = solve(nz,a0,a1,a2,c)
         return co
 
+    def _diffusion_buffers(self,nz):
+        """ Return the preallocated diagonals and RHS of the diffusion equation """
+        buf = self._diffusion_buf
+        if buf is None or len(buf[0]) != nz:
+            buf = self._diffusion_buf = ([0.] * nz, [0.] * nz, [0.] * nz, [0.] * nz)
+        return buf
+
     def DiffusionCoefficient(self,rho,z,dz,z0,disp,tempRur,heatRur,nz,uref,th,parameter):
         # Initialization
         Kt = [0 for x in range(nz+1)]
@@ -285,60 +512,148 @@ class RSMDef(object):
         return Kt, ustar
 
     def DissipationBougeault(self,g,nz,z,dz,te,pt):
-        # Note on translation from UWG_Matlab
-        # list length (i.e nz) != list indexing (i.e dlu[0] in python
-        # wherease in matlab it is
-
-        dlu = [0 for x in range(nz)]
-        dld = [0 for x in range(nz)]
-
+        """
+        Upward (dlu) and downward (dld) mixing lengths of Bougeault and Lacarrere (1989):
+        the distance a parcel with the TKE te[iz] travels up or down from layer iz
+        before its energy is used up by the buoyancy of the potential temperature profile.
+
+        The buoyancy between the centers of layers iz and j is
+            beta*((A[j]-A[iz]) - pt[iz]*(B[j]-B[iz]))
+        with A and B the prefix sums of pt*dzt and dzt between layer centers, so each
+        length is found without integrating the profile again for every layer. When the
+        buoyancy is monotonic above (below) iz, the crossing of te[iz] is bisected.
+        Otherwise the last crossing in the direction of travel is searched for, as in the
+        layer by layer integration of the original model: by scanning the layers in
+        O(nz) per length on grids of less than BOUGEAULT_TREE_LAYERS layers, where it is
+        faster, else with a _BuoyancyTree in O(log nz) per length. The layers are then
+        taken by increasing pt, as the _BuoyancyTree queries need.
+        """
+        dlu = [0. for x in range(nz)]
+        dld = [0. for x in range(nz)]
+
+        # prefix sums of pt*dzt (A) and dzt (B) and mid-layer potential temperature
+        A = [0. for x in range(nz)]
+        B = [0. for x in range(nz)]
+        ptm = [0. for x in range(nz-1)]
+        for iz in range(nz-1):
+            dzt=(dz[iz+1]+dz[iz])/2.
+            ptm[iz]=(pt[iz+1]+pt[iz])/2.
+            A[iz+1]=A[iz]+ptm[iz]*dzt
+            B[iz+1]=B[iz]+dzt
+
+        # min of ptm above and max of ptm below each layer. The buoyancy of a parcel rising
+        # from iz is monotonic when pt[iz] <= ptm_min[iz], of a falling one when pt[iz] >= ptm_max[iz]
+        ptm_min = [0. for x in range(nz)]
+        ptm_max = [0. for x in range(nz)]
+        cur = float("inf")
+        for iz in range(nz-2,-1,-1):
+            cur = min(cur,ptm[iz])
+            ptm_min[iz] = cur
+        cur = float("-inf")
         for iz in range(nz):
-            zup=0.
-            dlu[iz] = z[nz] - z[iz] - dz[iz]/2.
-            zzz=0.
-            zup_inf=0.
-            beta=g/pt[iz]
-
-            for izz in range(iz,nz-1):
+            ptm_max[iz] = cur
+            if iz < nz-1:
+                cur = max(cur,ptm[iz])
+
+        top = nz-1
+        if nz >= BOUGEAULT_TREE_LAYERS:
+            tree = _BuoyancyTree(A, B)
+            layers = sorted(range(nz), key=pt.__getitem__)
+        else:
+            tree = None
+            layers = range(nz)
+        for iz in layers:
+            ptz = pt[iz]
+            tez = te[iz]
+            beta = g/ptz
+
+            # Upward length: the parcel stops at the layer izz where the buoyancy
+            # integrated from iz to the center of layer j=izz+1 exceeds te[iz]
+            # A[j]-ptz*B[j] > tlim  <=>  buoyancy(iz to j) > te[iz]
+            fiz = A[iz]-ptz*B[iz]
+            tlim = tez/beta+fiz
+            izz = -1
+            if iz < top:
+                if ptm_min[iz] >= ptz:
+                    if A[top]-ptz*B[top] > tlim:
+                        j0, j1 = iz+1, top
+                        while j0 < j1:
+                            j = (j0+j1)//2
+                            if A[j]-ptz*B[j] > tlim:
+                                j1 = j
+                            else:
+                                j0 = j+1
+                        izz = j0-1
+                elif tree is not None:
+                    # last layer above tlim, then the last one not above it below
+                    j = tree.find(iz+1, top, ptz, tlim, True, True)
+                    if j >= 0:
+                        izz = tree.find(iz, j-1, ptz, tlim, False, True)
+                else:
+                    for j in range(top,iz,-1):
+                        if A[j]-ptz*B[j] > tlim:
+                            zup_inf = beta*(A[j-1]-ptz*B[j-1]-fiz)
+                            if (tez>zup_inf) or self.is_near_zero(tez-zup_inf):
+                                izz = j-1
+                                break
+
+            if izz >= 0:
+                zup_inf = beta*(A[izz]-ptz*B[izz]-fiz) if izz > iz else 0.
                 dzt=(dz[izz+1]+dz[izz])/2.
-                zup=zup-beta*pt[iz]*dzt
-                zup=zup+beta*(pt[izz+1]+pt[izz])*dzt/2.
-                zzz=zzz+dzt
-
-                if (te[iz]<zup) and ((te[iz]>zup_inf) or self.is_near_zero(te[iz]-zup_inf)):
-                    bbb=(pt[izz+1]-pt[izz])/dzt
-
-                    if not self.is_near_zero(bbb-0.):
-                        tl=(-beta*(pt[izz]-pt[iz])+ \
-                        math.sqrt( max(0.,(beta*(pt[izz]-pt[iz]))**2.+ \
-                        2.*bbb*beta*(te[iz]-zup_inf))))/bbb/beta
-                    else:
-                        tl=(te[iz]-zup_inf)/(beta*(pt[izz]-pt[iz]))
-                    dlu[iz]=max(1.,zzz-dzt+tl)
-                zup_inf=zup
-
-            zdo=0.
-            zdo_sup=0.
-            dld[iz]=z[iz]+dz[iz]/2.
-            zzz=0.
-
-            for izz in range(iz,0,-1):
+                bbb=(pt[izz+1]-pt[izz])/dzt
+
+                if not self.is_near_zero(bbb-0.):
+                    tl=(-beta*(pt[izz]-ptz)+ \
+                    math.sqrt( max(0.,(beta*(pt[izz]-ptz))**2.+ \
+                    2.*bbb*beta*(tez-zup_inf))))/bbb/beta
+                else:
+                    tl=(tez-zup_inf)/(beta*(pt[izz]-ptz))
+                dlu[iz]=max(1.,B[izz]-B[iz]+tl)
+            else:
+                dlu[iz] = z[nz] - z[iz] - dz[iz]/2.
+
+            # Downward length: the parcel stops at the layer izz where the buoyancy
+            # integrated from iz down to the center of layer j=izz-1 exceeds te[iz]
+            # with the same A[j]-ptz*B[j] > tlim test
+            izz = -1
+            if iz > 0:
+                if ptm_max[iz] <= ptz:
+                    if A[0]-ptz*B[0] > tlim:
+                        j0, j1 = 0, iz-1
+                        while j0 < j1:
+                            j = (j0+j1+1)//2
+                            if A[j]-ptz*B[j] > tlim:
+                                j0 = j
+                            else:
+                                j1 = j-1
+                        izz = j0+1
+                elif tree is not None:
+                    # first layer above tlim, then the first one not above it above
+                    j = tree.find(0, iz-1, ptz, tlim, True, False)
+                    if j >= 0:
+                        izz = tree.find(j+1, iz, ptz, tlim, False, False)
+                else:
+                    for j in range(iz):
+                        if A[j]-ptz*B[j] > tlim:
+                            zdo_sup = beta*(A[j+1]-ptz*B[j+1]-fiz)
+                            if (tez>zdo_sup) or self.is_near_zero(tez-zdo_sup):
+                                izz = j+1
+                                break
+
+            if izz >= 0:
+                zdo_sup = beta*(A[izz]-ptz*B[izz]-fiz) if izz < iz else 0.
                 dzt=(dz[izz-1]+dz[izz])/2.
-                zdo=zdo+beta*pt[iz]*dzt
-                zdo=zdo-beta*(pt[izz-1]+pt[izz])*dzt/2.
-                zzz=zzz+dzt
-
-                if (te[iz]<zdo) and ((te[iz]>zdo_sup) or self.is_near_zero(te[iz]-zdo_sup)):
-                    bbb=(pt[izz]-pt[izz-1])/dzt
-
-                    if not self.is_near_zero(bbb-0.):
-                        tl=(beta*(pt[izz]-pt[iz])+ \
-                            math.sqrt( max(0.,(beta*(pt[izz]-pt[iz]))**2.+ \
-                            2.*bbb*beta*(te[iz]-zdo_sup))))/bbb/beta
-                    else:
-                        tl=(te[iz]-zdo_sup)/(beta*(pt[izz]-pt[iz]))
-                    dld[iz]=max(1.,zzz-dzt+tl)
-                zdo_sup=zdo
+                bbb=(pt[izz]-pt[izz-1])/dzt
+
+                if not self.is_near_zero(bbb-0.):
+                    tl=(beta*(pt[izz]-ptz)+ \
+                        math.sqrt( max(0.,(beta*(pt[izz]-ptz))**2.+ \
+                        2.*bbb*beta*(tez-zdo_sup))))/bbb/beta
+                else:
+                    tl=(tez-zdo_sup)/(beta*(pt[izz]-ptz))
+                dld[iz]=max(1.,B[iz]-B[izz]+tl)
+            else:
+                dld[iz]=z[iz]+dz[iz]/2.
 
         return dlu,dld
 
@@ -362,26 +677,6 @@ class RSMDef(object):
         """
         Inversion and resolution of a tridiagonal matrix
                  A X = C
-        Input:
-         nz number of layers
-         a(*,1) lower diagonal (Ai,i-1)
-         a(*,2) principal diagonal (Ai,i)
-         a(*,3) upper diagonal (Ai,i+1)
-         c
-        Output
-         x     results
+        Kept for compatibility, see tridiag.invert.
         """
-
-        X = [0 for i in range(nz)]
-
-        for i in reversed(range(nz-1)):
-            C[i] = C[i] - A[i][2] * C[i+1]/A[i+1][1]
-            A[i][1] = A[i][1] - A[i][2] * A[i+1][0]/A[i+1][1]
-
-        for i in  range(1,nz,1):
-            C[i] = C[i] - A[i][0] * C[i-1]/A[i-1][1]
-
-        for i in range(nz):
-            X[i] = C[i]/A[i][1]
-
-        return X
+        return invert(nz,A,C)
@@ -66,14 +66,8 @@ class UBLDef(object):
         g = parameter.g                             # Gravity
         v_wind = max(forc.wind,parameter.windMin)   # wind velocity
 
-        # Air density
-        refDens = 0.
-        for iz in range(RSM.nzref):
-            refDens = refDens + RSM.densityProfC[iz] * RSM.dz[iz] / (RSM.z[RSM.nzref-1] + RSM.dz[RSM.nzref-1]/2.)
-
-        forDens = 0.
-        for iz in range(RSM.nzfor):
-            forDens = forDens + RSM.densityProfC[iz] * RSM.dz[iz] / (RSM.z[RSM.nzfor-1] + RSM.dz[RSM.nzfor-1]/2.)
+        # Air density, integrated once per timestep by the RSM
+        refDens = RSM.refDens
 
         # ---------------------------------------------------------------------
         # Day
@@ -89,7 +83,7 @@ class UBLDef(object):
                 or (sunlight > nightlimit) and (time > noon) or (self.sensHeat > 150.0)
         if is_day:
             # Circulation velocity per Bueno 'the uwg', eq 8
-            self.logger.debug("{} Day ubl calcs".format(__name__))
+            self.logger.debug("%s Day ubl calcs", __name__)
             h_UBL = self.dayBLHeight            # Day boundary layer height
             eqTemp = RSM.tempProf[RSM.nzref-1]
             eqWind = RSM.windProf[RSM.nzref-1]
@@ -112,36 +106,26 @@ class UBLDef(object):
         # Night
         # ---------------------------------------------------------------------
         else:
-            self.logger.debug("{} Night ubl calcs".format(__name__))
+            self.logger.debug("%s Night ubl calcs", __name__)
             h_UBL = self.nightBLHeight      # Night boundary layer height
             Csurf = UCM.Q_ubl*simTime.dt/(h_UBL*refDens*Cp)
             self.ublTemp, self.ublTempdx = self.NightForc(self.ublTempdx,simTime.dt, \
                 h_UBL,self.paralLength,self.charLength,RSM,Csurf)
 
-        self.logger.debug("ublTemp = {}".format(self.ublTemp))
+        self.logger.debug("ublTemp = %s", self.ublTemp)
 
     def NightForc(self,ublTempdx,dt,h_UBL,paralLength,charLength,RSM,Csurf):
         # Night forcing (RSM.nzfor = number of layers of forcing)
         # Average potential temperature & wind speed of the profile
-        intAdv1 = 0.
-        for iz in range(RSM.nzfor):
-            intAdv1 = intAdv1 + RSM.windProf[iz] * RSM.tempProf[iz] * RSM.dz[iz]
-
-        advCoef1 = 1.4*dt/paralLength/h_UBL*intAdv1
-
-        intAdv2 = 0
-        for iz in range(RSM.nzfor):
-            intAdv2 = intAdv2 + RSM.windProf[iz]*RSM.dz[iz]
-
-        advCoef2 = 1.4*dt/paralLength/h_UBL*intAdv2
-
-        ublTempdx[0] = (Csurf + advCoef1 + ublTempdx[0])/(1 + advCoef2)
-        ublTemp = ublTempdx[0]
+        advCoef1 = 1.4*dt/paralLength/h_UBL*RSM.intAdv1
+        advCoef2 = 1.4*dt/paralLength/h_UBL*RSM.intAdv2
 
+        # March the UBL temperature downwind, segment by segment
+        eqTemp = ublTempdx[0] = (Csurf + advCoef1 + ublTempdx[0])/(1 + advCoef2)
+        ublTemp = eqTemp
         for i in range(1,int(charLength)//int(paralLength)):
-            eqTemp = ublTempdx[i-1]
-            ublTempdx[i] = (Csurf + advCoef2*eqTemp + ublTempdx[i])/(1 + advCoef2)
-            ublTemp = ublTemp + ublTempdx[i]
+            eqTemp = ublTempdx[i] = (Csurf + advCoef2*eqTemp + ublTempdx[i])/(1 + advCoef2)
+            ublTemp = ublTemp + eqTemp
 
         # ublTemp/charLength*paralLength;
         ublTemp = ublTemp/float(charLength)*float(paralLength)
@@ -6,7 +6,8 @@ except NameError:
     pass
 
 from math import sqrt, pow
-import copy
+
+from .BEMDef import BuildingStock
 
 
 class UCMDef(object):
@@ -61,7 +62,7 @@ class UCMDef(object):
         treeSensHeat;  % sensible heat from trees (W m-2)
         sensHeat;      % urban sensible heat (W m-2)
         latHeat;       % urban latent heat (W m-2)
-        windProf;      % urban wind profile
+        windProf;      % urban wind profile at the RSM layer heights (m s-1)
         Q_roof;        % sensible heat flux from building roof (convective)
         Q_wall;        % sensible heat flux from building wall (convective)
         Q_window;      % sensible heat flux from building window (via U-factor)
@@ -133,7 +134,7 @@ class UCMDef(object):
         self.sensHeat = 0.0                                         # urban sensible heat [W m-2]
         # Variables set in urbflux()
         self.latHeat = None                                         # urban latent heat [W m-2]
-        self.windProf = []                                          # wind profile
+        self.windProf = []                                          # wind profile, sized by urbflux
         self.canRHum = None
         self.Tdp = None
 
@@ -148,8 +149,9 @@ class UCMDef(object):
             self.roofArea
             )
 
-    def UCModel(self,BEM,T_ubl,forc,parameter):
+    def UCModel(self,BEM,T_ubl,forc,parameter,stock=None):
         # Calculate the urban canyon temperature per The uwg (2012) Eq. 10
+        # stock: BEMDef.BuildingStock of BEM, built here if not given
         dens = forc.pres/(1000*0.287042*self.canTemp*(1.+1.607858*self.canHum))     # air density
         dens_ubl = forc.pres/(1000*0.287042*T_ubl*(1.+1.607858*forc.hum))           # air density
         Cp_air = parameter.cp
@@ -177,36 +179,42 @@ class UCMDef(object):
         Q = (self.roofArea+self.roadArea)*(self.sensAnthrop + self.treeSensHeat*self.treeCoverage)
 
         # Building energy output to canyon, in terms of absolute (total) values
-        for j in range(len(BEM)):
+        if stock is None:
+            stock = BuildingStock(BEM, self, parameter)
+        frac = stock.frac
+        A_wall = stock.A_wall
+        A_window = stock.A_window
+        A_windowU = stock.A_windowU
+        ventCp = stock.ventCp
+        infilCp = stock.infilCp
+        winShade = stock.winShade
+        densFrac = stock.densFrac
+        for j in range(stock.size):
             # Re-naming variable for readability
             building = BEM[j].building
             wall = BEM[j].wall
             T_indoor = building.indoorTemp
             T_wall = wall.layerTemp[0]
-            R_glazing = building.glazingRatio
-            A_wall = (1.-R_glazing)*self.facArea
-            A_window = R_glazing*self.facArea
-            U_window = building.uValue
-
-            H1 = H1 + BEM[j].frac*(                 # fraction of the urban floor space of this typology
-                T_indoor*A_window*U_window +        # window U
-                T_wall*A_wall*h_conv +              # Wall conv
-                T_indoor*self.roofArea*BEM[j].building.vent*BEM[j].building.nFloor*Cp_air*dens +            # Vent
-                T_indoor*self.roofArea*BEM[j].building.infil*self.bldHeight/3600.0*Cp_air*dens)             # Infil
-
-            H2 = H2 + BEM[j].frac*(
-                A_window*U_window +
-                A_wall*h_conv +
-                self.roofArea*BEM[j].building.vent*BEM[j].building.nFloor*Cp_air*dens +                     # Vent
-                self.roofArea*BEM[j].building.infil*self.bldHeight/3600.0*Cp_air*dens)                      # Infil
-
-            Q = Q + BEM[j].frac*(
-                self.roofArea*building.sensWaste*self.h_mix +           # HVAC waste heat
-                A_window*BEM[j].wall.solRec*(1.0-BEM[j].building.shgc))   # heat that didn't make it to inside
-
-            self.wallTemp = self.wallTemp + BEM[j].frac*T_wall
-            self.roofTemp = self.roofTemp + BEM[j].frac*BEM[j].roof.layerTemp[0]
-            self.Q_ubl = self.Q_ubl + BEM[j].frac*self.bldDensity*(BEM[j].roof.sens + BEM[j].building.sensWaste*(1.-self.h_mix)) # Changed by Jiachen Mao in March 2017
+
+            H1 = H1 + frac[j]*(                     # fraction of the urban floor space of this typology
+                T_indoor*A_window[j]*building.uValue +                                          # window U
+                T_wall*A_wall[j]*h_conv +                                                       # Wall conv
+                T_indoor*self.roofArea*building.vent*building.nFloor*Cp_air*dens +              # Vent
+                T_indoor*self.roofArea*building.infil*self.bldHeight/3600.0*Cp_air*dens)        # Infil
+
+            H2 = H2 + frac[j]*(
+                A_windowU[j] +
+                A_wall[j]*h_conv +
+                ventCp[j]*dens +                    # Vent
+                infilCp[j]*dens)                    # Infil
+
+            Q = Q + frac[j]*(
+                self.roofArea*building.sensWaste*self.h_mix +   # HVAC waste heat
+                A_window[j]*wall.solRec*winShade[j])            # heat that didn't make it to inside
+
+            self.wallTemp = self.wallTemp + frac[j]*T_wall
+            self.roofTemp = self.roofTemp + frac[j]*BEM[j].roof.layerTemp[0]
+            self.Q_ubl = self.Q_ubl + densFrac[j]*(BEM[j].roof.sens + building.sensWaste*(1.-self.h_mix)) # Changed by Jiachen Mao in March 2017
 
         # Solve for canyon temperature
         self.canTemp = (H1 + Q)/H2
@@ -218,24 +226,26 @@ class UCMDef(object):
         self.Q_traffic = self.sensAnthrop
 
         # Building energy output to canyon, per m^2 of urban area
-        T_can = copy.copy(self.canTemp)
-        for j in range(len(BEM)):
-            V_vent = BEM[j].building.vent*BEM[j].building.nFloor  # ventilation volume per m^2 of building
-            V_infil = BEM[j].building.infil*self.bldHeight/3600.0
-            T_indoor = BEM[j].building.indoorTemp
-            U_window = BEM[j].building.uValue                     # Added by Jiachen Mao in March 2017
-            R_glazing = BEM[j].building.glazingRatio              # Changed by Jiachen Mao in March 2017
+        T_can = self.canTemp
+        windowFrac = stock.windowFrac
+        windowFracU = stock.windowFracU
+        ventFrac = stock.ventFrac
+        volVentInfil = stock.volVentInfil
+        fl_area = stock.fl_area
+        for j in range(stock.size):
+            building = BEM[j].building
+            T_indoor = building.indoorTemp
 
-            self.Q_window = self.Q_window + BEM[j].frac*self.verToHor*R_glazing*U_window*(T_indoor-T_can)
-            self.Q_window = self.Q_window + BEM[j].frac*self.verToHor*R_glazing*BEM[j].wall.solRec*(1.-BEM[j].building.shgc)
-            self.Q_vent = self.Q_vent + BEM[j].frac*self.bldDensity*Cp_air*dens*(V_vent + V_infil)*(T_indoor-T_can)
-            self.Q_hvac = self.Q_hvac + BEM[j].frac*self.bldDensity*BEM[j].building.sensWaste*self.h_mix
+            self.Q_window = self.Q_window + windowFracU[j]*(T_indoor-T_can)                     # Added by Jiachen Mao in March 2017
+            self.Q_window = self.Q_window + windowFrac[j]*BEM[j].wall.solRec*winShade[j]
+            self.Q_vent = self.Q_vent + ventFrac[j]*dens*volVentInfil[j]*(T_indoor-T_can)
+            self.Q_hvac = self.Q_hvac + densFrac[j]*building.sensWaste*self.h_mix
 
-            self.Q_roof = self.Q_roof + BEM[j].frac*self.bldDensity*BEM[j].roof.sens
+            self.Q_roof = self.Q_roof + densFrac[j]*BEM[j].roof.sens
 
             # Total Electrical & Gas power in MW
-            self.ElecTotal = self.ElecTotal + BEM[j].fl_area*BEM[j].building.ElecTotal/1.e6
-            self.GasTotal = self.GasTotal + BEM[j].fl_area*BEM[j].building.GasTotal/1.e6
+            self.ElecTotal = self.ElecTotal + fl_area[j]*building.ElecTotal/1.e6
+            self.GasTotal = self.GasTotal + fl_area[j]*building.GasTotal/1.e6
 
         # Sensible Heat
         # N.B In the current uwg code, latent heat from evapotranspiration, stagnant water,
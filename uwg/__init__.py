@@ -4,6 +4,7 @@ __version__ = '5.2.1'
 
 from .simparam import SimParam
 from .weather import Weather
+from .epw import EPW
 from .building import Building
 from .material import Material
 from .element import Element
@@ -17,11 +18,17 @@ from .RSMDef import RSMDef
 from .solarcalcs import SolarCalcs
 
 from .readDOE import readDOE
+from .doelib import DOELibrary, load_doelib
 from .infracalcs import infracalcs
 from .urbflux import urbflux
+from .output import OutputStore, read_output
+from .rural import RuralTrajectory, simulate_rural
 
 from .uwg import uwg
 from .uwg import procMat
+from .batch import simulate_batch, simulate_districts
+from .sweep import sweep
+from .shard import simulate_sharded
 
 
 __all__ = [
@@ -39,5 +46,15 @@ __all__ = [
     "UCMDef",
     "urbflux",
     "weather",
+    "epw",
     "RSMDef",
+    "batch",
+    "doelib",
+    "sweep",
+    "output",
+    "rural",
+    "checkpoint",
+    "spinup",
+    "shard",
+    "pool",
     ]
@@ -0,0 +1,169 @@
+"""Lockstep simulation of several uwg scenarios or urban districts that share a rural EPW."""
+from __future__ import division, print_function
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+
+from .solarcalcs import SolarCalcs
+from .rural import rural_key, RURAL_PROFILE_CHANNELS, RURAL_CHANNEL_MSG
+
+
+BATCH_EMPTY_MSG = "A batch needs at least one uwg object."
+BATCH_EPW_MISMATCH_MSG = "All uwg objects in a batch must morph the same rural EPW file. " \
+    "Got '{}' and '{}'."
+BATCH_PERIOD_MISMATCH_MSG = "All uwg objects in a batch must share the same analysis period " \
+    "and timesteps (Month, Day, nDay, dtSim, dtWeather). Got {} and {}."
+DISTRICT_RURAL_MISMATCH_MSG = "All districts must share the same rural site: district {} has " \
+    "different rural parameters (h_obs, rurVegCover, kRoad, cRoad, d_road, z_meso, ...) than district 0."
+
+
+def _period(u):
+    return (int(u.Month), int(u.Day), int(u.nDay), float(u.dtSim), float(u.dtWeather))
+
+
+def _init_scenarios(scenarios):
+    """ Read the shared rural EPW, initialize every scenario as uwg.run() would and
+    make them share the simulation clock of the first one """
+    if len(scenarios) == 0:
+        raise Exception(BATCH_EMPTY_MSG)
+
+    # Read the rural EPW once and hand the parsed data to every scenario
+    lead = scenarios[0]
+    lead.read_epw()
+    for u in scenarios[1:]:
+        u.climateDataPath = os.path.join(u.epwDir, u.epwFileName)
+        if os.path.abspath(u.climateDataPath) != os.path.abspath(lead.climateDataPath):
+            raise Exception(BATCH_EPW_MISMATCH_MSG.format(lead.climateDataPath, u.climateDataPath))
+        u.read_epw(lead._epw)
+
+    for u in scenarios:
+        u.set_input()
+        if _period(u) != _period(lead):
+            raise Exception(BATCH_PERIOD_MISMATCH_MSG.format(_period(lead), _period(u)))
+        u.init_BEM_obj()
+        u.init_input_obj()
+        u.hvac_autosize()
+
+    # One clock drives every scenario
+    simTime = lead.simTime
+    for u in scenarios[1:]:
+        u.simTime = simTime
+    for u in scenarios:
+        u._init_simulation()
+
+
+def _share_rural(lead, u):
+    """ Make a simulation read the forcing and rural models advanced by lead, which
+    has the same rural_key and comes before it in the lockstep loop """
+    if lead._rural_replay:
+        # The rural profiles of a replay are only updated at the reference height
+        for name in u.output_channels or ():
+            if name in RURAL_PROFILE_CHANNELS:
+                raise Exception(RURAL_CHANNEL_MSG.format(name))
+    u.forcIP = lead.forcIP
+    u.forc = lead.forc
+    u.RSM = lead.RSM
+    u.rural = lead.rural
+    u.solar = SolarCalcs(u.UCM, u.BEM, u.simTime, u.RSM, u.forc, u.geoParam, None)
+    u._rural_trajectory = None
+    u._rural_replay = False
+    u._shared_rural = True
+
+
+def _lockstep(scenarios):
+    """ Advance scenarios that share one simulation clock over the analysis period """
+    simTime = scenarios[0].simTime
+    try:
+        for it in range(1, simTime.nt, 1):
+            for u in scenarios:
+                if not u._shared_rural:
+                    u._update_ground_temp(it)
+            simTime.UpdateDate()
+            for u in scenarios:
+                u._simulate_timestep(it)
+    finally:
+        for u in scenarios:
+            u._end_simulation()
+
+
+def simulate_batch(scenarios):
+    """Simulate several uwg objects in lockstep and write one morphed EPW per scenario.
+
+    All scenarios must morph the same rural EPW over the same analysis period and
+    timesteps, but can differ in any urban parameter (bldDensity, verToHor, albRoof,
+    vegCover, bld, ...). Each scenario is initialized exactly as uwg.run() would do.
+    The scenarios are then advanced together, one timestep at a time, behind a single
+    shared simulation clock. Scenarios with the same rural model (see rural.rural_key)
+    share one forcing, rural road and rural site model (RSM) pipeline, advanced by the
+    first of them as in simulate_districts, so the others only pay for the urban
+    physics. Results are identical to calling run() on each scenario separately.
+
+    args:
+        scenarios: List of uwg objects. Inputs can come from a .uwg file or be
+            set as object attributes, exactly as for uwg.run().
+    returns:
+        newClimateFiles: List with the path to the morphed EPW of each scenario.
+    """
+    _init_scenarios(scenarios)
+
+    # Scenarios read the forcing and rural models of the first scenario with their rural key
+    leads = {}
+    for u in scenarios:
+        lead = leads.setdefault(rural_key(u), u)
+        if lead is not u:
+            _share_rural(lead, u)
+
+    lead = scenarios[0]
+    print('\nSimulating {} scenarios for {} days from {}/{}.\n'.format(
+        len(scenarios), int(lead.nDay), int(lead.Month), int(lead.Day)))
+    _lockstep(scenarios)
+
+    for u in scenarios:
+        u.write_epw()
+
+    return [u.newPathName for u in scenarios]
+
+
+def simulate_districts(districts):
+    """Simulate several urban districts of one city against one rural site and write
+    one morphed EPW per district.
+
+    The districts must morph the same rural EPW over the same analysis period and
+    timesteps, with the same rural parameters (h_obs, rurVegCover, road construction,
+    boundary layer heights, z_meso, ...), but can differ in any urban parameter
+    (bld, bldDensity, bldHeight, verToHor, ...). One forcing, rural road and rural
+    site model (RSM) pipeline, advanced by the first district, drives the urban
+    canyon, boundary layer and building models of every district in the same
+    timestep loop: the other districts skip the forcing, ground temperature, rural
+    solar gains, rural road and RSM updates, so their per-step cost is only the urban
+    physics. Results are identical to calling run() on each district separately.
+
+    args:
+        districts: List of uwg objects. Inputs can come from a .uwg file or be
+            set as object attributes, exactly as for uwg.run().
+    returns:
+        newClimateFiles: List with the path to the morphed EPW of each district.
+    """
+    _init_scenarios(districts)
+
+    # Every district reads the forcing and rural models of the first one
+    lead = districts[0]
+    key = rural_key(lead)
+    for i in range(1, len(districts)):
+        u = districts[i]
+        if rural_key(u) != key:
+            raise Exception(DISTRICT_RURAL_MISMATCH_MSG.format(i))
+        _share_rural(lead, u)
+
+    print('\nSimulating {} districts for {} days from {}/{}.\n'.format(
+        len(districts), int(lead.nDay), int(lead.Month), int(lead.Day)))
+    _lockstep(districts)
+
+    for u in districts:
+        u.write_epw()
+
+    return [u.newPathName for u in districts]
@@ -1,6 +1,6 @@
 from __future__ import division, print_function
 
-from .psychrometrics import psychrometrics, moist_air_density
+from .psychrometrics import relative_humidity, moist_air_density
 import logging
 from math import isnan
 import sys
@@ -115,6 +115,11 @@ class Building(object):
             # Logger will be disabled by default unless explicitly called in tests
             self.logger = logging.getLogger(__name__)
 
+    def __setstate__(self, state):
+        # Pickled loggers don't load across Python versions (i.e. readDOE.pkl), get a new one
+        state["logger"] = logging.getLogger(__name__)
+        self.__dict__.update(state)
+
     def __repr__(self):
         return "BuildingType: {a}, Era: {b}, Zone: {c}".format(
             a=self.Type,
@@ -125,13 +130,36 @@ class Building(object):
     def is_near_zero(self,val,tol=1e-14):
         return abs(float(val)) < tol
 
-    def BEMCalc(self,UCM,BEM,forc,parameter,simTime):
+    def BEMCalc(self,UCM,BEM,forc,parameter,simTime,coef=None):
+        """
+        Update the indoor temperature, humidity and the HVAC demand of the building.
+        coef is the tuple of the static coefficients of the building returned by
+        BEMDef.BuildingStock.building_coefficients, computed here if not given.
+        """
+
+        self.logger.debug("Logging at %s %s", __name__, self)
+
+        # Indoor convection heat transfer coefficients
+        zac_in_wall = 3.076                             # wall heat convection coefficeint
+        zac_in_mass = 3.076                             # mass heat convection coefficeint
 
-        self.logger.debug("Logging at {} {}".format(__name__, self.__repr__()))
+        if coef is None:
+            nFloor = max(UCM.bldHeight/float(self.floorHeight),1)   # At least one floor
+            # Normalize areas to building foot print [m^2/m^2(bld)]
+            facArea = UCM.verToHor/UCM.bldDensity           # [m2(facade)/m2(bld)]
+            wallArea = facArea*(1.-self.glazingRatio)       # [m2(wall)/m2(bld)]
+            winArea = facArea*self.glazingRatio             # [m2(window)/m2(bld)]
+            massArea = 2*nFloor-1                           # ceiling/floor (top & bottom)
+            coef = (nFloor,
+                self.vent * nFloor,                         # total vent volumetric flow [m3 s-1]
+                self.infil * UCM.bldHeight / 3600.,         # Change of units AC/H -> [m3 s-1]
+                wallArea, winArea, massArea,
+                wallArea*zac_in_wall, massArea*zac_in_mass, winArea*self.uValue)
+        nFloor, volVent, volInfil, wallArea, winArea, massArea, wallConv, massConv, winCond = coef
 
         # Building Energy Model
         self.ElecTotal = 0.0                            # total electricity consumption - (W/m^2) of floor
-        self.nFloor = max(UCM.bldHeight/float(self.floorHeight),1)   # At least one floor
+        self.nFloor = nFloor                            # At least one floor
         self.Qheat = 0.0                                # total sensible heat added
         self.sensCoolDemand = 0.0                       # building sensible cooling demand (W m-2)
         self.sensHeatDemand = 0.0                       # building sensible heating demand (W m-2)
@@ -143,8 +171,6 @@ class Building(object):
         Qdehum = 0.0
         dens =  moist_air_density(forc.pres,self.indoorTemp,self.indoorHum)# [kgv/ m-3] Moist air density given dry bulb temperature, humidity ratio, and pressure
         evapEff = 1.                                    # evaporation efficiency in the condenser
-        volVent = self.vent * self.nFloor               # total vent volumetric flow [m3 s-1]
-        volInfil = self.infil * UCM.bldHeight / 3600.   # Change of units AC/H -> [m3 s-1]
         T_wall = BEM.wall.layerTemp[-1]                 # Inner layer
         volSWH = BEM.SWH * self.nFloor/3600.            # Change of units l/hr per m^2 -> [L/s]
         T_ceil = BEM.roof.layerTemp[-1]                 # Inner layer
@@ -152,31 +178,23 @@ class Building(object):
         T_indoor = self.indoorTemp                      # Indoor temp (initial)
         T_can = UCM.canTemp                             # Canyon temperature
 
-        # Normalize areas to building foot print [m^2/m^2(bld)]
-        facArea = UCM.verToHor/UCM.bldDensity           # [m2(facade)/m2(bld)]
-        wallArea = facArea*(1.-self.glazingRatio)       # [m2(wall)/m2(bld)]
-        winArea = facArea*self.glazingRatio             # [m2(window)/m2(bld)]
-        massArea = 2*self.nFloor-1                      # ceiling/floor (top & bottom)
-
         # Set temperature set points according to night/day setpoints in building schedule & simTime hr
         isEqualNightStart = self.is_near_zero((simTime.secDay/3600.) - parameter.nightSetStart)
         if simTime.secDay/3600. < parameter.nightSetEnd or (simTime.secDay/3600. > parameter.nightSetStart or isEqualNightStart):
-            self.logger.debug("{} Night setpoints @{}".format(__name__,simTime.secDay/3600.))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("%s Night setpoints @%s", __name__, simTime.secDay/3600.)
 
             T_cool = self.coolSetpointNight
             T_heat = self.heatSetpointNight
             self.intHeat = self.intHeatNight * self.nFloor
         else:
-            self.logger.debug("{} Day setpoints @{}".format(__name__,simTime.secDay/3600.))
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("%s Day setpoints @%s", __name__, simTime.secDay/3600.)
 
             T_cool = self.coolSetpointDay
             T_heat = self.heatSetpointDay
             self.intHeat = self.intHeatDay*self.nFloor
 
-        # Indoor convection heat transfer coefficients
-        zac_in_wall = 3.076                             # wall heat convection coefficeint
-        zac_in_mass = 3.076                             # mass heat convection coefficeint
-
         # Check that T_ceil and T_indoor within reasonable bounds
         converge_hi = 100.0 + 273.15
         converge_lo = -50.0 + 273.15
@@ -217,9 +235,9 @@ class Building(object):
 
         # Heat/Cooling load (W/m^2 of bld footprint), if any
         self.sensCoolDemand = max(
-            wallArea*zac_in_wall*(T_wall - T_cool) +            # wall load
-            massArea*zac_in_mass*(T_mass-T_cool) +              # mass load
-            winArea*self.uValue*(T_can-T_cool) +                # window load due to temp delta
+            wallConv*(T_wall - T_cool) +                        # wall load
+            massConv*(T_mass-T_cool) +                          # mass load
+            winCond*(T_can-T_cool) +                            # window load due to temp delta
             zac_in_ceil *(T_ceil-T_cool) +                      # ceiling load
             self.intHeat +                                      # internal load
             volInfil*dens*parameter.cp*(T_can-T_cool) +         # infiltration load (volInfil = m3 s-1)
@@ -228,9 +246,9 @@ class Building(object):
             0.)
 
         self.sensHeatDemand = max(
-            -(wallArea*zac_in_wall*(T_wall-T_heat) +            # wall load
-            massArea*zac_in_mass*(T_mass-T_heat) +              # mass load
-            winArea*self.uValue*(T_can-T_heat) +                # window load due to temp delta
+            -(wallConv*(T_wall-T_heat) +                        # wall load
+            massConv*(T_mass-T_heat) +                          # mass load
+            winCond*(T_can-T_heat) +                            # window load due to temp delta
             zac_in_ceil*(T_ceil-T_heat) +                       # ceiling load
             self.intHeat +                                      # internal load
             volInfil*dens*parameter.cp*(T_can-T_heat) +         # infiltration load (volInfil = m3 s-1)
@@ -299,10 +317,10 @@ class Building(object):
             T_can*volInfil * dens * parameter.cp +
             T_can*volVent * dens * parameter.cp)
 
-        H2 = (wallArea*zac_in_wall +
-            massArea*zac_in_mass +
+        H2 = (wallConv +
+            massConv +
             zac_in_ceil +
-            winArea*self.uValue +
+            winCond +
             volInfil * dens * parameter.cp +
             volVent * dens * parameter.cp)
 
@@ -314,8 +332,7 @@ class Building(object):
             (QLintload + QLinfil + QLvent - Qdehum)
 
         # Calculate relative humidity (Pw/Pws*100) using pressurce, indoor temperature, humidity
-        _Tdb, _w, _phi, _h, _Tdp, _v = psychrometrics(self.indoorTemp, self.indoorHum, forc.pres)
-        self.indoorRhum = _phi
+        self.indoorRhum = relative_humidity(self.indoorTemp, self.indoorHum, forc.pres)
 
         # These are used for element calculation (per m^2 of element area)
         self.fluxWall = zac_in_wall * (T_indoor - T_wall)
@@ -0,0 +1,165 @@
+"""Versioned snapshots of the state of a simulation, to checkpoint and resume it.
+
+A snapshot holds the numeric state of every model of a simulation after a
+timestep (Element layer temperatures and fluxes, BEM and building indoor
+states, UCM, UBL and RSM scalars and profiles, forcing, SimParam clock) and the
+hourly output recorded so far. Static inputs, object references, caches and
+loggers are not stored: they are rebuilt by initializing the uwg object from
+its inputs, as uwg.resume_from does, before the snapshot is restored. The file
+is one line of JSON header followed by the zlib-compressed JSON state:
+
+    {"version": 1, "it": 8640, "n": 720, "period": [7, 1, 31, 300.0, 3600.0], ...}\\n
+    <state>
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+import json
+import zlib
+
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_FILE_MSG = "'{}' is not a uwg checkpoint file."
+CHECKPOINT_MISMATCH_MSG = "Checkpoint '{}' was written for {} = {}, this simulation has {}."
+CHECKPOINT_INTERVAL_MSG = "checkpoint_interval must be a whole number of hours of at least 1, got {}."
+
+# Simulation counters of the uwg object
+_COUNTERS = ("n", "dayType", "ceil_time_step")
+
+
+def _is_state(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return True
+    if isinstance(value, list):
+        for x in value:
+            if not _is_state(x):
+                return False
+        return True
+    return False
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [_copy(x) for x in value]
+    return value
+
+
+def _model_objects(model):
+    """ (name, object) of the urban and rural models """
+    objects = [("UCM", model.UCM), ("road", model.UCM.road), ("UBL", model.UBL),
+               ("RSM", model.RSM), ("rural", model.rural)]
+    for i in range(len(model.BEM)):
+        bem = model.BEM[i]
+        objects.append(("BEM{}".format(i), bem))
+        for key in ("building", "mass", "wall", "roof"):
+            objects.append(("BEM{}.{}".format(i, key), getattr(bem, key)))
+    return objects
+
+
+def _objects(model):
+    """ (name, object) of every model holding simulation state """
+    return [("simTime", model.simTime), ("forc", model.forc), ("solar", model.solar)] + \
+        _model_objects(model)
+
+
+def _set_state(objects, state):
+    for name, obj in objects:
+        for key, value in state[name].items():
+            setattr(obj, key, _copy(value))
+
+
+def _period(model):
+    return [int(model.Month), int(model.Day), int(model.nDay), float(model.dtSim), float(model.dtWeather)]
+
+
+def _header(model, it):
+    return {"version": CHECKPOINT_VERSION, "it": it, "n": model.n, "period": _period(model),
+            "epwFileName": model.epwFileName, "BEM": len(model.BEM), "channels": model.output.names}
+
+
+def snapshot(model, it):
+    """
+    Return the (header, state) of a uwg object after simulation timestep it.
+    Public attributes of the models that are numbers, None or lists of them are
+    stored; private attributes (caches, buffers) are rebuilt when needed.
+    """
+    state = {}
+    for name, obj in _objects(model):
+        state[name] = dict((key, _copy(value)) for key, value in obj.__dict__.items()
+                           if not key.startswith("_") and _is_state(value))
+    state["uwg"] = dict((key, getattr(model, key)) for key in _COUNTERS)
+    state["output"] = dict((name, model.output[name][:model.n].tolist()) for name in model.output.names)
+    return _header(model, it), state
+
+
+def restore(model, header, state, file_path=None):
+    """
+    Set the state of an initialized uwg object (see uwg._init_simulation) to a
+    snapshot and return the timestep it was taken after.
+    """
+    expected = _header(model, header["it"])
+    for key in ("period", "epwFileName", "BEM", "channels"):
+        if header[key] != expected[key]:
+            raise Exception(CHECKPOINT_MISMATCH_MSG.format(file_path, key, header[key], expected[key]))
+
+    _set_state(_objects(model), state)
+    model.RSM._integrals = None
+
+    for key, value in state["uwg"].items():
+        setattr(model, key, value)
+    for name, values in state["output"].items():
+        column = model.output[name]
+        for n in range(len(values)):
+            column[n] = values[n]
+    return header["it"]
+
+
+def restore_models(model, state):
+    """
+    Set the state of the urban and rural models of an initialized uwg object (see
+    uwg.init_input_obj) to a snapshot of another simulation with the same inputs,
+    i.e. a spin-up. The clock, forcing and output of the simulation are kept.
+    """
+    _set_state(_model_objects(model), state)
+    model.RSM._integrals = None
+
+
+def write_checkpoint(file_path, model, it, metadata=None):
+    """ Write the snapshot of a uwg object after timestep it, see read_checkpoint """
+    header, state = snapshot(model, it)
+    if metadata:
+        header["metadata"] = metadata
+    record = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"), 1)
+
+    # Replace the previous checkpoint only once the new one is complete
+    tmp_path = "{}.tmp".format(file_path)
+    checkpoint_file = open(tmp_path, "wb")
+    try:
+        checkpoint_file.write(json.dumps(header).encode("utf-8") + b"\n")
+        checkpoint_file.write(record)
+    finally:
+        checkpoint_file.close()
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    os.rename(tmp_path, file_path)
+
+
+def read_checkpoint(file_path):
+    """ Return the (header, state) of a file written by write_checkpoint """
+    checkpoint_file = open(file_path, "rb")
+    try:
+        try:
+            header = json.loads(checkpoint_file.readline().decode("utf-8"))
+            state = json.loads(zlib.decompress(checkpoint_file.read()).decode("utf-8"))
+        except (ValueError, zlib.error):
+            raise Exception(CHECKPOINT_FILE_MSG.format(file_path))
+    finally:
+        checkpoint_file.close()
+    if header.get("version") != CHECKPOINT_VERSION:
+        raise Exception(CHECKPOINT_FILE_MSG.format(file_path))
+    return header, state
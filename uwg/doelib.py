@@ -0,0 +1,260 @@
+"""Indexed DOE reference library with per-cell random access.
+
+The library stores the same [16 types, 3 eras, 16 climate zones] matrices as
+readDOE.pkl (refDOE, refBEM, Schedule), but every (type, era, zone) cell is
+an independent record that can be read and materialized on its own. The file is
+one line of JSON index followed by the zlib-compressed JSON records of each cell:
+
+    {"version": 1, "shape": [16, 3, 16], "offsets": [...]}\\n
+    <cell 0,0,0><cell 0,0,1>...<cell 15,2,15>
+
+Offsets are relative to the end of the index line, with one extra entry
+marking the end of the last record.
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+import json
+import zlib
+
+from .building import Building
+from .element import Element
+from .BEMDef import BEMDef
+from .schdef import SchDef
+
+
+DIR_CURR = os.path.abspath(os.path.dirname(__file__))
+DOELIB_PATH = os.path.join(DIR_CURR, "refdata", "readDOE.doelib")
+DOELIB_VERSION = 1
+DOELIB_SHAPE = (16, 3, 16)
+
+DOELIB_MISSING_MSG = "DOE library file: '{}' does not exist."
+DOELIB_VERSION_MSG = "DOE library file: '{}' has version {}, expected {}."
+TEMPLATE_READONLY_MSG = "DOE library templates are read-only, use instance() to get a modifiable {}."
+
+# Attributes that are rebuilt on load rather than stored
+_TRANSIENT = ("logger", "_conduction_coef", "_za")
+# Element layer vectors are stored under their public names
+_LAYERS = ("_layerThickness", "_layerThermalCond", "_layerVolHeat")
+
+_LIBRARY_CACHE = {}
+
+
+def _getstate(obj):
+    state = {}
+    for key, value in obj.__dict__.items():
+        if key in _TRANSIENT:
+            continue
+        if key in _LAYERS:
+            key = key[1:]
+        state[key] = value
+    return state
+
+
+def _setstate(cls, state):
+    obj = cls.__new__(cls)
+    if hasattr(cls, "__setstate__"):
+        obj.__setstate__(state)
+    else:
+        obj.__dict__.update(state)
+    return obj
+
+
+def write_doelib(refDOE, refBEM, Schedule, file_path=DOELIB_PATH):
+    """ Write the DOE reference matrices (as returned by readDOE) to an indexed library file. """
+    records = []
+    for i in range(DOELIB_SHAPE[0]):
+        for j in range(DOELIB_SHAPE[1]):
+            for k in range(DOELIB_SHAPE[2]):
+                bem = refBEM[i][j][k]
+                bem_state = _getstate(bem)
+                for key in ("building", "mass", "wall", "roof"):
+                    bem_state[key] = _getstate(getattr(bem, key))
+                cell = {
+                    "refDOE": _getstate(refDOE[i][j][k]),
+                    "refBEM": bem_state,
+                    "Schedule": _getstate(Schedule[i][j][k])
+                    }
+                text = json.dumps(cell, sort_keys=True, separators=(",", ":"))
+                records.append(zlib.compress(text.encode("utf-8"), 9))
+
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    index = {"version": DOELIB_VERSION, "shape": list(DOELIB_SHAPE), "offsets": offsets}
+
+    doelib_file = open(file_path, "wb")
+    try:
+        doelib_file.write(json.dumps(index, separators=(",", ":")).encode("utf-8") + b"\n")
+        for record in records:
+            doelib_file.write(record)
+    finally:
+        doelib_file.close()
+
+
+def load_doelib(file_path=DOELIB_PATH):
+    """ Return the DOELibrary of file_path, opened once per process and cached. """
+    key = os.path.abspath(file_path)
+    lib = _LIBRARY_CACHE.get(key)
+    if lib is None:
+        lib = _LIBRARY_CACHE[key] = DOELibrary(file_path)
+    return lib
+
+
+def store_doelib(lib):
+    """ Keep an opened DOELibrary for load_doelib, i.e. one handed to a worker process """
+    _LIBRARY_CACHE[os.path.abspath(lib.file_path)] = lib
+
+
+class DOELibrary(object):
+    """
+    Indexed DOE reference library. Only the index is read when opening the file,
+    each (type, era, zone) cell is read and materialized the first time it is requested.
+
+    The materialized objects are read-only templates shared by every simulation that
+    uses the library. bem and schedule return per-run instances of the templates:
+    shallow copies that share the template values (layer vectors, 3x24 schedules, ...)
+    and hold their own attributes, so a simulation can set frac, albedo, layerTemp,
+    indoorTemp, etc. without affecting the library or other runs. Replace list
+    attributes of an instance rather than modifying them in place.
+
+    refDOE, refBEM and Schedule are views of the templates with the nested list
+    indexing of readDOE.pkl (i.e. refBEM[i][j][k]).
+
+    properties
+        file_path   % path of the library file
+        shape       % (16, 3, 16) types, eras and climate zones
+    """
+
+    def __init__(self, file_path=DOELIB_PATH):
+        if not os.path.exists(file_path):
+            raise Exception(DOELIB_MISSING_MSG.format(file_path))
+
+        doelib_file = open(file_path, "rb")
+        try:
+            index = json.loads(doelib_file.readline().decode("utf-8"))
+            self._start = doelib_file.tell()
+        finally:
+            doelib_file.close()
+
+        if index["version"] != DOELIB_VERSION:
+            raise Exception(DOELIB_VERSION_MSG.format(file_path, index["version"], DOELIB_VERSION))
+
+        self.file_path = file_path
+        self.shape = tuple(index["shape"])
+        self._offsets = index["offsets"]
+        self._cells = {}                    # templates of the cells read so far
+
+    def __repr__(self):
+        return "DOELibrary: {}, {} of {} cells loaded".format(
+            self.file_path, len(self._cells), len(self._offsets) - 1)
+
+    def _cell(self, i, j, k):
+        n = (i * self.shape[1] + j) * self.shape[2] + k
+        cell = self._cells.get(n)
+        if cell is None:
+            start, end = self._offsets[n], self._offsets[n + 1]
+            doelib_file = open(self.file_path, "rb")
+            try:
+                doelib_file.seek(self._start + start)
+                record = doelib_file.read(end - start)
+            finally:
+                doelib_file.close()
+            state = json.loads(zlib.decompress(record).decode("utf-8"))
+
+            bem_state = state["refBEM"]
+            bem_state["building"] = _setstate(BuildingTemplate, bem_state["building"])
+            for key in ("mass", "wall", "roof"):
+                bem_state[key] = _setstate(ElementTemplate, bem_state[key])
+            cell = self._cells[n] = {
+                "refDOE": _setstate(BuildingTemplate, state["refDOE"]),
+                "refBEM": _setstate(BEMDefTemplate, bem_state),
+                "Schedule": _setstate(SchDefTemplate, state["Schedule"])
+                }
+        return cell
+
+    def bem(self, i, j, k):
+        """ New BEMDef instance of building type i, built era j and climate zone k """
+        return self._cell(i, j, k)["refBEM"].instance()
+
+    def schedule(self, i, j, k):
+        """ New SchDef instance of building type i, built era j and climate zone k """
+        return self._cell(i, j, k)["Schedule"].instance()
+
+    def building(self, i, j, k):
+        """ New reference Building (refDOE) instance of building type i, built era j and climate zone k """
+        return self._cell(i, j, k)["refDOE"].instance()
+
+    @property
+    def refDOE(self):
+        return _LazyGrid(self, "refDOE")
+
+    @property
+    def refBEM(self):
+        return _LazyGrid(self, "refBEM")
+
+    @property
+    def Schedule(self):
+        return _LazyGrid(self, "Schedule")
+
+
+class _LazyGrid(object):
+    """ Nested list look-alike of the templates of one of the library matrices """
+
+    def __init__(self, lib, name, index=()):
+        self._lib = lib
+        self._name = name
+        self._index = index
+
+    def __len__(self):
+        return self._lib.shape[len(self._index)]
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError("DOE library index out of range")
+        index = self._index + (n,)
+        if len(index) < len(self._lib.shape):
+            return _LazyGrid(self._lib, self._name, index)
+        return self._lib._cell(*index)[self._name]
+
+
+class _Template(object):
+    """ Read-only template of a reference object, see DOELibrary """
+
+    _base = None    # class of the per-run instances
+
+    def __setattr__(self, name, value):
+        raise AttributeError(TEMPLATE_READONLY_MSG.format(self._base.__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError(TEMPLATE_READONLY_MSG.format(self._base.__name__))
+
+    def instance(self):
+        """ Return a new mutable instance sharing the template values """
+        state = {}
+        for key, value in self.__dict__.items():
+            state[key] = value.instance() if isinstance(value, _Template) else value
+        return _setstate(self._base, state)
+
+
+class BuildingTemplate(_Template, Building):
+    _base = Building
+
+
+class ElementTemplate(_Template, Element):
+    _base = Element
+
+
+class BEMDefTemplate(_Template, BEMDef):
+    _base = BEMDef
+
+
+class SchDefTemplate(_Template, SchDef):
+    _base = SchDef
@@ -7,6 +7,8 @@ except NameError:
 
 import math
 
+from .tridiag import solve, invert
+
 
 class Element(object):
     """
@@ -51,13 +53,9 @@ class Element(object):
             self.albedo = alb                                       # outer surface albedo
             self.emissivity = emis                                  # outer surface emissivity
             self.layerThickness = thicknessLst                      # vector of layer thicnesses (m)
-            self.layerThermalCond = [0. for i in materialLst]       # vector of layer thermal conductivity (W m-1 K-1)
-            self.layerVolHeat = [0. for i in materialLst]           # vector of layer volumetric heat (J m-3 K-1)
-
             # Create list of layer k and (Cp*density) from materialLst properties
-            for i in range(len(materialLst)):
-              self.layerThermalCond[i] = materialLst[i].thermalCond
-              self.layerVolHeat[i] = materialLst[i].volHeat
+            self.layerThermalCond = [m.thermalCond for m in materialLst]  # vector of layer thermal conductivity (W m-1 K-1)
+            self.layerVolHeat = [m.volHeat for m in materialLst]          # vector of layer volumetric heat (J m-3 K-1)
 
             self.vegCoverage = vegCoverage                          # surface vegetation coverage
             self.layerTemp = [T_init] * len(thicknessLst)           # vector of layer temperatures (K)
@@ -75,6 +73,48 @@ class Element(object):
             self.T_int = None                                        # internal surface temperature
             self.flux = None                                         # external surface heat flux
 
+            # Preallocated main diagonal and RHS of the conduction system
+            self._za = None
+
+    def __setstate__(self, state):
+        # Elements pickled before the layer vectors became properties (i.e. readDOE.pkl)
+        # store them under their public names
+        for key in ("layerThickness", "layerThermalCond", "layerVolHeat"):
+            if key in state:
+                state["_" + key] = state.pop(key)
+        state["_conduction_coef"] = {}
+        state.setdefault("_za", None)
+        self.__dict__.update(state)
+
+    # The layer vectors are properties so that replacing one of them drops the cached
+    # conduction coefficients. Assign a new list rather than mutating one in place.
+    @property
+    def layerThickness(self):
+        return self._layerThickness
+
+    @layerThickness.setter
+    def layerThickness(self, value):
+        self._layerThickness = value
+        self._conduction_coef = {}
+
+    @property
+    def layerThermalCond(self):
+        return self._layerThermalCond
+
+    @layerThermalCond.setter
+    def layerThermalCond(self, value):
+        self._layerThermalCond = value
+        self._conduction_coef = {}
+
+    @property
+    def layerVolHeat(self):
+        return self._layerVolHeat
+
+    @layerVolHeat.setter
+    def layerVolHeat(self, value):
+        self._layerVolHeat = value
+        self._conduction_coef = {}
+
     def __repr__(self):
         # Returns some representative wall properties
         s1 = "Element: {a}\n\tlayerNum={b}, totaldepth={c}\n\t".format(
@@ -97,6 +137,14 @@ class Element(object):
     def SurfFlux(self,forc,parameter,simTime,humRef,tempRef,windRef,boundCond,intFlux):
         """ Calculate net heat flux, and update element layer temperatures
         """
+        self.SurfHeatFlux(forc,parameter,simTime,humRef,tempRef,windRef)
+        self.SetLayerTemp(self.Conduction(simTime.dt, self.flux, boundCond, forc.deepTemp, intFlux))
+
+    def SurfHeatFlux(self,forc,parameter,simTime,humRef,tempRef,windRef):
+        """ Calculate net heat flux (self.flux) at the outer surface without
+        updating the layer temperatures. Pass the result to ConductionSystem
+        to solve the layers, alone or batched with other elements.
+        """
 
         # Calculated per unit area (m^2)
         dens = forc.pres/(1000*0.287042*tempRef*(1.+1.607858*humRef)) # air density (kgd m-3)
@@ -140,9 +188,11 @@ class Element(object):
             self.sens = self.aeroCond*(self.layerTemp[0]-tempRef)
             self.flux = -self.sens + self.solAbs + self.infra - self.lat # (W m-2)
 
-        self.layerTemp = self.Conduction(simTime.dt, self.flux, boundCond, forc.deepTemp, intFlux)
-        self.T_ext = self.layerTemp[0]
-        self.T_int = self.layerTemp[-1]
+    def SetLayerTemp(self, layerTemp):
+        """ Set new layer temperatures and the corresponding surface temperatures """
+        self.layerTemp = layerTemp
+        self.T_ext = layerTemp[0]
+        self.T_int = layerTemp[-1]
 
     def Conduction(self, dt, flx1, bc, temp2, flx2):
         """
@@ -152,39 +202,88 @@ class Element(object):
             bc    : boundary condition parameter (1 or 2)
             temp2 : deep soil temperature (ave of air temperature)
             flx2  : surface flux (sum of absorbed, emitted, etc.)
+        returns:
+            vector of new layer temperatures (K)
+        """
+        return solve(*self.ConductionSystem(dt, flx1, bc, temp2, flx2))
 
-        key prop:
-            za = [[ x00, x01, x02 ... x0w ]
-                  [ x10, x11, x12 ... x1w ]
-                            ...
-                  [ xh0, xh1, xh2 ... xhw ]]
-
-            where h = matrix row index    = element layer number
-                  w = matrix column index = 3
+    def ConductionSystem(self, dt, flx1, bc, temp2, flx2):
+        """
+        Fill the tridiagonal system of the heat conduction through the element layers.
+        arg:
+            flx1  : net heat flux on surface
+            bc    : boundary condition parameter (1 or 2)
+            temp2 : deep soil temperature (ave of air temperature)
+            flx2  : surface flux (sum of absorbed, emitted, etc.)
 
+        returns:
+            (num, za0, za1, za2, zy) where num is the element layer number,
+            za0, za1, za2 are the lower, main and upper diagonals and zy is the RHS.
+            The off-diagonals are cached per timestep and boundary condition and must not
+            be modified. The main diagonal and RHS are preallocated on the element and
+            overwritten on every call, so solve the system (tridiag.solve or
+            tridiag.solve_batch) before the next one.
         """
         t = self.layerTemp          # vector of layer temperatures (K)
+        fexp = 0.5                  # explicit coefficient
+        num = len(t)                # number of layers
+
+        if self.is_near_zero(bc-1.): # heat flux
+            bc = 1
+        elif self.is_near_zero(bc-2.): # deep-temperature
+            bc = 2
+        else:
+            raise Exception(self.CONDUCTION_INPUT_MSG)
+
+        coef = self._conduction_coef.get((dt, bc))
+        if coef is None:
+            coef = self._conduction_coefficients(dt, bc)
+        hcp_dt, tcp, za0, za1_const, za2 = coef
+
+        # Main diagonal (overwritten by the solver) and RHS
+        za1, zy = self._conduction_buffers(num)
+        za1[:] = za1_const
+
+        #--------------------------------------------------------------------------
+        # Define the first row of the RHS column vector
+        zy[0] = hcp_dt[0]*t[0] - fexp*tcp[1]*(t[0]-t[1]) + flx1
+
+        #--------------------------------------------------------------------------
+        # Define other rows
+        for j in range(1,num-1):
+          zy[j] = hcp_dt[j] * t[j] + fexp * \
+            (tcp[j]*t[j-1] - tcp[j]*t[j] - tcp[j+1]*t[j] + tcp[j+1]*t[j+1])
+
+        #--------------------------------------------------------------------------
+        # Boundary conditions
+        if bc == 1: # heat flux
+            zy[num-1] = hcp_dt[num-1]*t[num-1] + fexp*tcp[num-1]*(t[num-2]-t[num-1]) + flx2
+        else: # deep-temperature
+            zy[num-1] = temp2
+
+        return num, za0, za1, za2, zy
+
+    def _conduction_coefficients(self, dt, bc):
+        """
+        Compute and cache the parts of the conduction system that only depend on the
+        layer properties, the timestep and the boundary condition.
+
+        returns:
+            (hcp_dt, tcp, za0, za1, za2) where hcp_dt is the layer heat capacity per
+            timestep (J/m2Ks), tcp the mean conductivity between layers (W/mK) and
+            za0, za1, za2 the lower, main and upper diagonals.
+        """
         hc = self.layerVolHeat      # vector of layer volumetric heat (J m-3 K-1)
         tc = self.layerThermalCond  # vector of layer thermal conductivities (W m-1 K-1)
         d = self.layerThickness     # vector of layer thicknesses (m)
 
-        # flx1                      : net heat flux on surface
-        # bc                        : boundary condition parameter (1 or 2)
-        # temp2                     : deep soil temperature (avg of air temperature)
-        # flx2                      : surface flux (sum of absorbed, emitted, etc.)
-
         fimp = 0.5                  # implicit coefficient
-        fexp = 0.5                  # explicit coefficient
-        num = len(t)                # number of layers
+        num = len(d)                # number of layers
 
         # Mean thermal conductivity over distance between 2 layers (W/mK)
         tcp = [0 for x in range(num)]
         # Thermal capacity times layer depth (J/m2K)
         hcp = [0 for x in range(num)]
-        # lower, main, and upper diagonals
-        za = [[0 for y in range(3)] for x in range(num)]
-        # RHS
-        zy = [0 for x in range(num)]
 
         #--------------------------------------------------------------------------
         # Define the column vectors for heat capactiy and conductivity
@@ -192,43 +291,40 @@ class Element(object):
         for j in range(1,num):
             tcp[j] = 2. / (d[j-1] / tc[j-1] + d[j] / tc[j])
             hcp[j] = hc[j] * d[j]
+        hcp_dt = [x/dt for x in hcp]
 
         #--------------------------------------------------------------------------
-        # Define the first row of za matrix, and RHS column vector
-        za[0][0] = 0.
-        za[0][1] = hcp[0]/dt + fimp*tcp[1]
-        za[0][2] = -fimp*tcp[1]
-        zy[0] = hcp[0]/dt*t[0] - fexp*tcp[1]*(t[0]-t[1]) + flx1
+        # Define the first row of za matrix
+        za0 = [0.] * num
+        za1 = [0.] * num
+        za2 = [0.] * num
+        za1[0] = hcp_dt[0] + fimp*tcp[1]
+        za2[0] = -fimp*tcp[1]
 
         #--------------------------------------------------------------------------
         # Define other rows
         for j in range(1,num-1):
-          za[j][0] = fimp*(-tcp[j])
-          za[j][1] = hcp[j]/dt + fimp*(tcp[j]+tcp[j+1])
-          za[j][2] = fimp*(-tcp[j+1])
-          zy[j] = hcp[j]/dt * t[j] + fexp * \
-            (tcp[j]*t[j-1] - tcp[j]*t[j] - tcp[j+1]*t[j] + tcp[j+1]*t[j+1])
+          za0[j] = fimp*(-tcp[j])
+          za1[j] = hcp_dt[j] + fimp*(tcp[j]+tcp[j+1])
+          za2[j] = fimp*(-tcp[j+1])
 
         #--------------------------------------------------------------------------
         # Boundary conditions
-        if self.is_near_zero(bc-1.): # heat flux
-            za[num-1][0] = fimp * (-tcp[num-1])
-            za[num-1][1] = hcp[num-1]/dt + fimp*tcp[num-1]
-            za[num-1][2] = 0.
-            zy[num-1] = hcp[num-1]/dt*t[num-1] + fexp*tcp[num-1]*(t[num-2]-t[num-1]) + flx2
-        elif self.is_near_zero(bc-2.): # deep-temperature
-            za[num-1][0] = 0.
-            za[num-1][1] = 1.
-            za[num-1][2] = 0.
-            zy[num-1] = temp2
-        else:
-            raise Exception(self.CONDUCTION_INPUT_MSG)
-
-        #--------------------------------------------------------------------------
-
-        zx = self.invert(num,za,zy)
-        #t(:) = zx(:);
-        return zx # return zx as 1d vector of templayers
+        if bc == 1: # heat flux
+            za0[num-1] = fimp * (-tcp[num-1])
+            za1[num-1] = hcp_dt[num-1] + fimp*tcp[num-1]
+        else: # deep-temperature
+            za1[num-1] = 1.
+
+        coef = self._conduction_coef[(dt, bc)] = (hcp_dt, tcp, za0, za1, za2)
+        return coef
+
+    def _conduction_buffers(self, num):
+        """ Return the preallocated main diagonal and RHS, resized if the layer number changed """
+        za = self._za
+        if za is None or len(za[0]) != num:
+            za = self._za = ([0.] * num, [0.] * num)
+        return za
 
     def qsat(self,temp,pres,parameter):
         """
@@ -258,26 +354,6 @@ class Element(object):
         """
         Inversion and resolution of a tridiagonal matrix
                  A X = C
-        Input:
-         nz number of layers
-         a(*,1) lower diagonal (Ai,i-1)
-         a(*,2) principal diagonal (Ai,i)
-         a(*,3) upper diagonal (Ai,i+1)
-         c
-        Output
-         x     results
+        Kept for compatibility, see tridiag.invert.
         """
-
-        X = [0 for i in range(nz)]
-
-        for i in reversed(range(nz-1)):
-            C[i] = C[i] - A[i][2] * C[i+1]/A[i+1][1]
-            A[i][1] = A[i][1] - A[i][2] * A[i+1][0]/A[i+1][1]
-
-        for i in  range(1,nz,1):
-            C[i] = C[i] - A[i][0] * C[i-1]/A[i-1][1]
-
-        for i in range(nz):
-            X[i] = C[i]/A[i][1]
-
-        return X
+        return invert(nz,A,C)
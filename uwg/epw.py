@@ -0,0 +1,93 @@
+"""Single-pass reader and patching writer for EPW weather files."""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+import sys
+from csv import reader as csv_reader
+
+from .utilities import str2fl
+
+
+class EPW(object):
+    """
+    EPW
+    Parse an epw file once and share it between the header/soil parsing (uwg.read_epw),
+    the Weather object and the morphed file writer (uwg.write_epw).
+    http://bigladdersoftware.com/epx/docs/8-2/auxiliary-programs/epw-csv-format-inout.html
+
+    properties
+        file_path   % path of the parsed epw file
+        header      % list of the 8 header rows split in fields
+        rows        % list of timestep rows split in fields
+        location    % location name
+    """
+
+    FILE_MISSING_MSG = "File name: '{}' does not exist."
+    HEADER_LENGTH = 8
+
+    def __init__(self, file_path):
+        if not os.path.exists(file_path):
+            raise Exception(self.FILE_MISSING_MSG.format(file_path))
+
+        if sys.version_info[0] >= 3:
+            epw_file = open(file_path, "r", errors='ignore')
+        else:
+            epw_file = open(file_path, "r")
+        try:
+            lines = epw_file.read().splitlines()
+        finally:
+            epw_file.close()
+
+        self.file_path = file_path
+        self._lines = lines                         # raw rows, written back untouched
+        fields = [r for r in csv_reader(lines, delimiter=",")]
+        self.header = fields[:self.HEADER_LENGTH]
+        self.rows = fields[self.HEADER_LENGTH:]
+        self._columns = {}                          # typed columns, parsed on first use
+
+    def __repr__(self):
+        return "EPW: {}, {} timesteps".format(self.location, len(self.rows))
+
+    @property
+    def location(self):
+        return self.header[0][1]
+
+    def column(self, index):
+        """ Return the timestep values of a column converted with utilities.str2fl.
+        The conversion is done once per column and cached.
+        """
+        col = self._columns.get(index)
+        if col is None:
+            col = self._columns[index] = str2fl([r[index] for r in self.rows])
+        return col
+
+    def write(self, file_path, columns, start=0):
+        """ Write a copy of the epw file with some columns replaced.
+        args:
+            file_path : path of the new epw file
+            columns   : dictionary of column index to list of formatted values
+            start     : index of the timestep row that receives the first value
+        All other fields and rows are written exactly as they were read.
+        """
+        offset = self.HEADER_LENGTH + start
+        lines = list(self._lines)
+        patches = sorted(columns.items())
+        count = min(len(values) for _, values in patches) if patches else 0
+
+        for i in range(count):
+            row = list(self.rows[start + i])
+            for index, values in patches:
+                row[index] = values[i]
+            lines[offset + i] = ",".join(row)
+
+        epw_file = open(file_path, "w")
+        try:
+            epw_file.write("\n".join(lines))
+            epw_file.write("\n")
+        finally:
+            epw_file.close()
@@ -1,5 +1,19 @@
 from __future__ import division
 
+try:
+    range = xrange
+except NameError:
+    pass
+
+import copy
+import math
+
+# Maximum number of clocks kept, the cache is emptied when it is full
+CLOCK_CACHE_SIZE = 16
+
+# Per-timestep clock of the analysis periods already stepped through
+_CLOCKS = {}
+
 
 class Forcing (object):
     """
@@ -59,3 +73,49 @@ class Forcing (object):
             a=int(self.deepTemp) if self.deepTemp else None,
             b=int(self.waterTemp) if self.waterTemp else None
             )
+
+
+def timestep_clock(simTime):
+    """
+    Step a copy of a new SimParam through the analysis period and return, for every
+    timestep it (1 to nt-1), the lists:
+        weather_index   # index of the weather data (forcIP lists) used at it
+        month           # month before the clock advances to it (ground temperatures)
+        dayType         # day type after the clock advances to it: 3=Sun, 2=Sat, 1=Weekday
+    The lists are cached per analysis period and timesteps (at most CLOCK_CACHE_SIZE
+    of them), don't modify them.
+    """
+    key = (simTime.month, simTime.day, simTime.days, simTime.dt, simTime.timePrint)
+    clock = _CLOCKS.get(key)
+    if clock is not None:
+        return clock
+
+    simTime = copy.copy(simTime)
+    ph = simTime.dt/3600.                       # dt (simulation time step) in hours
+    weather_index = [0] * simTime.nt
+    month = [0] * simTime.nt
+    dayType = [0] * simTime.nt
+
+    for it in range(1, simTime.nt, 1):
+        month[it] = simTime.month
+        simTime.UpdateDate()
+        # simulation time increment raised to weather time step
+        # minus one to be consistent with forcIP list index
+        weather_index[it] = int(math.ceil(it * ph))-1
+        # Assign day type (1 = weekday, 2 = sat, 3 = sun/other)
+        if simTime.is_near_zero(simTime.julian % 7):
+            dayType[it] = 3                                     # Sunday
+        elif simTime.is_near_zero(simTime.julian % 7 - 6.):
+            dayType[it] = 2                                     # Saturday
+        else:
+            dayType[it] = 1                                     # Weekday
+
+    if len(_CLOCKS) >= CLOCK_CACHE_SIZE:
+        _CLOCKS.clear()
+    clock = _CLOCKS[key] = (weather_index, month, dayType)
+    return clock
+
+
+def clear_clock_cache():
+    """ Free the memory of the clocks kept in this process """
+    _CLOCKS.clear()
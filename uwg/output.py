@@ -0,0 +1,222 @@
+"""Preallocated hourly output of a uwg simulation and its export to disk.
+
+The channels written to the morphed EPW (EPW_CHANNELS) are always recorded. Any
+other channel of OUTPUT_CHANNELS or BEM_OUTPUT_CHANNELS is only sampled when it is
+selected with uwg.output_channels, i.e.
+
+    model.output_channels = ["Q_hvac", "Q_ubl", "ElecTotal", "indoorTemp"]
+    model.output_file_path = "results.csv"      # or a binary file, see write_binary
+
+BEM channels are recorded for every BEMDef of the simulation as <name>_<BEM index>,
+i.e. ElecTotal_0, ElecTotal_1. Profile channels are recorded for every layer of the
+rural site model as <name>_<layer index>, i.e. windProf_0, windProf_1.
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import sys
+import json
+from array import array
+from operator import attrgetter
+
+
+OUTPUT_CHANNEL_MSG = "'{}' is not an output channel. Recorded channels are: {}."
+OUTPUT_SELECT_MSG = "'{}' is not an output channel. Available channels are: {}."
+OUTPUT_FILE_MSG = "'{}' is not a uwg binary output file."
+OUTPUT_PATH_MSG = "No output file path for the simulation of '{}', set output_file_path or pass file_path."
+OUTPUT_VERSION = 1
+
+# Channels that can be selected: name -> (function of the uwg object, description)
+OUTPUT_CHANNELS = {
+    "canTemp": (attrgetter("UCM.canTemp"), "canyon air temperature (K)"),
+    "Tdp": (attrgetter("UCM.Tdp"), "canyon dew point temperature (C)"),
+    "canRHum": (attrgetter("UCM.canRHum"), "canyon relative humidity (%)"),
+    "canHum": (attrgetter("UCM.canHum"), "canyon specific humidity (kgv kga-1)"),
+    "canWind": (attrgetter("UCM.canWind"), "canyon wind speed (m s-1)"),
+    "roadTemp": (attrgetter("UCM.roadTemp"), "average road temperature (K)"),
+    "wallTemp": (attrgetter("UCM.wallTemp"), "average wall temperature (K)"),
+    "roofTemp": (attrgetter("UCM.roofTemp"), "average roof temperature (K)"),
+    "sensHeat": (attrgetter("UCM.sensHeat"), "urban sensible heat flux (W m-2)"),
+    "Q_wall": (attrgetter("UCM.Q_wall"), "sensible heat from walls (W m-2)"),
+    "Q_window": (attrgetter("UCM.Q_window"), "sensible heat from windows (W m-2)"),
+    "Q_road": (attrgetter("UCM.Q_road"), "sensible heat from road (W m-2)"),
+    "Q_roof": (attrgetter("UCM.Q_roof"), "sensible heat from roofs (W m-2)"),
+    "Q_vent": (attrgetter("UCM.Q_vent"), "sensible heat from ventilation and infiltration (W m-2)"),
+    "Q_hvac": (attrgetter("UCM.Q_hvac"), "sensible waste heat from HVAC (W m-2)"),
+    "Q_traffic": (attrgetter("UCM.Q_traffic"), "sensible heat from traffic (W m-2)"),
+    "Q_ubl": (attrgetter("UCM.Q_ubl"), "sensible heat to the urban boundary layer (W m-2)"),
+    "ElecTotalUrban": (attrgetter("UCM.ElecTotal"), "total electricity consumption of the urban area (MW)"),
+    "GasTotalUrban": (attrgetter("UCM.GasTotal"), "total gas consumption of the urban area (MW)"),
+    "ublTemp": (attrgetter("UBL.ublTemp"), "urban boundary layer temperature (K)"),
+    "ruralTemp": (attrgetter("forc.temp"), "rural air temperature (K)"),
+    "wind": (attrgetter("forc.wind"), "rural wind speed (m s-1)"),
+    }
+
+# Channels recorded for every BEMDef: name -> (attribute of the BEMDef, description)
+BEM_OUTPUT_CHANNELS = {
+    "ElecTotal": ("building.ElecTotal", "total electricity consumption (W m-2 of floor)"),
+    "GasTotal": ("building.GasTotal", "total gas consumption (W m-2 of floor)"),
+    "coolConsump": ("building.coolConsump", "cooling energy consumption (W m-2)"),
+    "heatConsump": ("building.heatConsump", "heating energy consumption (W m-2)"),
+    "sensWaste": ("building.sensWaste", "sensible waste heat (W m-2)"),
+    "indoorTemp": ("building.indoorTemp", "indoor air temperature (K)"),
+    "indoorRhum": ("building.indoorRhum", "indoor relative humidity (%)"),
+    "wallTempExt": ("wall.T_ext", "external wall surface temperature (K)"),
+    "roofTempExt": ("roof.T_ext", "external roof surface temperature (K)"),
+    }
+
+# Channels recorded for every RSM layer: name -> (list attribute of the uwg object, description)
+PROFILE_OUTPUT_CHANNELS = {
+    "windProf": ("UCM.windProf", "urban wind profile at the RSM layer heights (m s-1)"),
+    "ruralWindProf": ("RSM.windProf", "rural wind profile (m s-1)"),
+    "ruralTempProf": ("RSM.tempProf", "rural potential temperature profile (K)"),
+    }
+
+# Channels written to the morphed EPW, recorded for every simulation
+EPW_CHANNELS = ("canTemp", "Tdp", "canRHum", "wind")
+
+
+def _bem_channel(k, attribute):
+    get = attrgetter(attribute)
+    return lambda uwg: get(uwg.BEM[k])
+
+
+def _profile_channel(iz, attribute):
+    get = attrgetter(attribute)
+    return lambda uwg: get(uwg)[iz]
+
+
+def select_channels(names=None, bem_number=0, extra=None, layer_number=0):
+    """
+    Return the (name, function of the uwg object) pairs of the channels to record.
+    args:
+        names        : list of OUTPUT_CHANNELS, BEM_OUTPUT_CHANNELS and
+                       PROFILE_OUTPUT_CHANNELS names, added to EPW_CHANNELS
+        bem_number   : number of BEMDef objects of the simulation
+        extra        : dictionary of additional channel name to function of the uwg object
+        layer_number : number of RSM layers of the profiles (RSM.nzref)
+    """
+    channels = [(name, OUTPUT_CHANNELS[name][0]) for name in EPW_CHANNELS]
+    for name in names or ():
+        if name in EPW_CHANNELS:
+            continue
+        if name in OUTPUT_CHANNELS:
+            channels.append((name, OUTPUT_CHANNELS[name][0]))
+        elif name in BEM_OUTPUT_CHANNELS:
+            for k in range(bem_number):
+                channels.append(("{}_{}".format(name, k), _bem_channel(k, BEM_OUTPUT_CHANNELS[name][0])))
+        elif name in PROFILE_OUTPUT_CHANNELS:
+            for iz in range(layer_number):
+                channels.append(("{}_{}".format(name, iz), _profile_channel(iz, PROFILE_OUTPUT_CHANNELS[name][0])))
+        else:
+            available = sorted(set(OUTPUT_CHANNELS) | set(BEM_OUTPUT_CHANNELS) | set(PROFILE_OUTPUT_CHANNELS))
+            raise Exception(OUTPUT_SELECT_MSG.format(name, ", ".join(available)))
+    if extra:
+        channels.extend(sorted(extra.items()))
+    return channels
+
+
+class OutputStore(object):
+    """
+    Hourly output of a simulation, stored as one preallocated array of floats per
+    channel and written in place at every reporting step.
+
+    properties
+        N       % number of hours
+        names   % list of channel names
+    """
+
+    def __init__(self, N, channels):
+        self.N = N
+        self._channels = list(channels)
+        self.names = [name for name, _ in self._channels]
+        self._data = dict((name, array("d", [0.]) * N) for name in self.names)
+
+    def __repr__(self):
+        return "OutputStore: {} hours, channels = {}".format(self.N, ", ".join(self.names))
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __getitem__(self, name):
+        """ Array of the hourly values of a channel """
+        try:
+            return self._data[name]
+        except KeyError:
+            raise KeyError(OUTPUT_CHANNEL_MSG.format(name, ", ".join(self.names)))
+
+    def record(self, n, uwg):
+        """ Store the current value of every channel at hour n """
+        for name, get in self._channels:
+            self._data[name][n] = get(uwg)
+
+    def series(self):
+        """ Dictionary of channel name to list of hourly values """
+        return dict((name, self._data[name].tolist()) for name in self.names)
+
+    def write_csv(self, file_path):
+        """ Write one row per hour and one column per channel """
+        columns = [self._data[name] for name in self.names]
+        lines = [",".join(["hour"] + self.names)]
+        for n in range(self.N):
+            lines.append(",".join([str(n)] + [repr(col[n]) for col in columns]))
+
+        csv_file = open(file_path, "w")
+        try:
+            csv_file.write("\n".join(lines))
+            csv_file.write("\n")
+        finally:
+            csv_file.close()
+
+    def write_binary(self, file_path, metadata=None):
+        """
+        Write a columnar binary file: one line of JSON header followed by the
+        little-endian float64 values of each channel, one channel after the other.
+        Read it back with read_output.
+        """
+        header = {"version": OUTPUT_VERSION, "N": self.N, "channels": self.names}
+        if metadata:
+            header["metadata"] = metadata
+
+        bin_file = open(file_path, "wb")
+        try:
+            bin_file.write(json.dumps(header).encode("utf-8") + b"\n")
+            for name in self.names:
+                col = self._data[name]
+                if sys.byteorder == "big":
+                    col = array("d", col)
+                    col.byteswap()
+                bin_file.write(col.tobytes() if hasattr(col, "tobytes") else col.tostring())
+        finally:
+            bin_file.close()
+
+
+def read_output(file_path):
+    """ Return the header dictionary and the OutputStore of a file written by write_binary """
+    bin_file = open(file_path, "rb")
+    try:
+        try:
+            header = json.loads(bin_file.readline().decode("utf-8"))
+        except ValueError:
+            raise Exception(OUTPUT_FILE_MSG.format(file_path))
+        if header.get("version") != OUTPUT_VERSION:
+            raise Exception(OUTPUT_FILE_MSG.format(file_path))
+
+        store = OutputStore(header["N"], [(name, None) for name in header["channels"]])
+        for name in store.names:
+            col = array("d")
+            raw = bin_file.read(8 * store.N)
+            if hasattr(col, "frombytes"):
+                col.frombytes(raw)
+            else:
+                col.fromstring(raw)
+            if sys.byteorder == "big":
+                col.byteswap()
+            store._data[name] = col
+    finally:
+        bin_file.close()
+    return header, store
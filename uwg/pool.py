@@ -0,0 +1,95 @@
+"""Process pool shared by the parametric sweep and the sharded simulation.
+
+The calling process parses the rural EPW and opens the DOE library once, and
+hands them to the worker processes with the rural trajectories when the pool
+starts (see init_worker). Without multiprocessing (i.e. IronPython) or with a
+single worker, the tasks run one after the other in the calling process.
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None  # i.e. IronPython, run the tasks serially
+
+from .uwg import uwg
+from .doelib import store_doelib
+from .rural import store_trajectory
+
+
+SCENARIO_PARAM_MSG = "'{}' is not a uwg parameter."
+
+# uwg.__init__ arguments, every other parameter is set as a uwg attribute
+INIT_ARGS = ("epwFileName", "uwgParamFileName", "epwDir", "uwgParamDir",
+             "destinationDir", "destinationFileName")
+
+# Parsed rural EPW shared by the simulations of a worker process
+_WORKER = {"epw": None}
+
+
+def scenario(params):
+    """ Create a uwg object from a dictionary of parameters """
+    kwargs = dict((key, params[key]) for key in INIT_ARGS if key in params)
+    u = uwg(**kwargs)
+    for key, value in params.items():
+        if key in INIT_ARGS:
+            continue
+        if not hasattr(u, key):
+            raise Exception(SCENARIO_PARAM_MSG.format(key))
+        setattr(u, key, value)
+    return u
+
+
+def init_worker(epw, doelib, trajectories):
+    """ Hand the parent's parsed EPW, DOE library and rural trajectories to a worker process """
+    _WORKER["epw"] = epw
+    if doelib is not None:
+        store_doelib(doelib)
+    for trajectory in trajectories.values():
+        store_trajectory(trajectory)
+
+
+def init_scenario(params):
+    """ Create a uwg object from a dictionary of parameters in a worker process and
+    initialize it as uwg.run() does, from the EPW handed by init_worker """
+    u = scenario(params)
+    u.read_epw(_WORKER["epw"])
+    u.set_input()
+    u.init_BEM_obj()
+    u.init_input_obj()
+    u.hvac_autosize()
+    return u
+
+
+def imap_unordered(function, tasks, workers, initargs):
+    """
+    Yield function(task) for every task, in completion order, from a pool of worker
+    processes started with init_worker(*initargs). workers defaults to the number of CPUs.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count() if multiprocessing is not None else 1
+    workers = min(workers, len(tasks))
+
+    if multiprocessing is None or workers <= 1:
+        init_worker(*initargs)
+        for task in tasks:
+            yield function(task)
+        return
+
+    pool = multiprocessing.Pool(workers, init_worker, initargs)
+    finished = False
+    try:
+        for result in pool.imap_unordered(function, tasks):
+            yield result
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
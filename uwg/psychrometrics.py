@@ -1,5 +1,10 @@
 from __future__ import division
 
+try:
+    range = xrange
+except NameError:
+    pass
+
 from math import log, pow, exp
 
 
@@ -86,6 +91,27 @@ def HumFromRHumTemp(RH,T,P):
     W = 0.62198*PW/(P-PW)    # 4. Specific humidity
     return W
 
+def relative_humidity(Tdb_in, w_in, P):
+    """
+    Relative humidity phi [Pw/Pws*100] of psychrometrics, without the other outputs.
+    Tdb_in = [K] dry bulb temperature, w_in = [kgv/kgda] Humidity Ratio, P = [P] Pressure
+    """
+    Pw = (w_in*(P/1000.))/(0.621945 + w_in)         # partial pressure of water vapor
+    return Pw/saturation_pressure(Tdb_in - 273.15)*100.0
+
+def dew_point(w_in, P):
+    """
+    Dew point temperature Tdp [C] of psychrometrics, without the other outputs.
+    w_in = [kgv/kgda] Humidity Ratio, P = [P] Pressure
+    """
+    _pw = (w_in*(P/1000.))/(0.621945 + w_in)        # water vapor partial pressure in kPa
+    alpha = log(_pw)
+    return 6.54 + 14.526*alpha + pow(alpha,2)*0.7389 + pow(alpha,3)*0.09486 + pow(_pw,0.1984)*0.4569  # valid for Tdp between 0 C and 93 C
+
+def HumFromRHumTemp_array(RH, T, P):
+    """ List of HumFromRHumTemp of lists of RH [%], T [C] and P [Pa], i.e. weather file columns """
+    return [HumFromRHumTemp(RH[i], T[i], P[i]) for i in range(len(T))]
+
 """
 function psat = psat(temp,parameter)
     gamw  = (parameter.cl - parameter.cpv) / parameter.rv;
@@ -19,6 +19,7 @@ from .element import Element
 from .BEMDef import BEMDef
 from .schdef import SchDef
 from .utilities import read_csv, str2fl
+from .doelib import write_doelib
 
 # For debugging only
 #import pprint
@@ -76,7 +77,7 @@ ZONETYPE = [
     ]
 
 
-def readDOE(serialize_output=True):
+def readDOE(serialize_output=True, doelib_output=False):
     """
     Read csv files of DOE buildings
     Sheet 1 = BuildingSummary
@@ -110,6 +111,10 @@ def readDOE(serialize_output=True):
             ...
             CLIMATE_ZONE_16]
 
+    args:
+        serialize_output: Pickle the matrices to refdata/readDOE.pkl.
+        doelib_output: Write the matrices to the indexed library refdata/readDOE.doelib
+            (see doelib.py), which uwg loads cell by cell instead of the pickle.
     """
 
     #Nested, nested lists of Building, SchDef, BEMDef objects
@@ -371,16 +376,19 @@ def readDOE(serialize_output=True):
 
         pickle_readDOE.close()
 
+    if doelib_output:
+        write_doelib(refDOE, refBEM, Schedule)
+
     return refDOE, refBEM, Schedule
 
 if __name__ == "__main__":
 
     # Set to True only if you want create new .pkls of DOE refs
     # Use --serialize switch to serialize the readDOE data
-    if len(sys.argv)> 1 and sys.argv[1]=="--serialize":
-        refDOE, refBEM, Schedule = readDOE(True)
-    else:
-        refDOE, refBEM, Schedule = readDOE(False)
+    # Use --doelib switch to write the indexed DOE library
+    serialize = "--serialize" in sys.argv[1:]
+    doelib = "--doelib" in sys.argv[1:]
+    refDOE, refBEM, Schedule = readDOE(serialize, doelib)
 
 
 # Material ref from E+
@@ -0,0 +1,267 @@
+"""Rural model trajectory, recorded once and replayed by urban scenarios.
+
+The rural side of a simulation (the rural road heat fluxes and layers, and the
+vertical diffusion model RSMDef.VDM) only depends on the rural EPW, the rural site
+parameters (h_obs, rurVegCover, road construction, boundary layer heights, z_meso,
+...) and the analysis period, never on the urban morphology. With uwg.rural_cache
+set, the per-timestep values of the rural model read by the urban models are
+recorded the first time a (EPW, rural parameters, period) is simulated and replayed
+by every following simulation with the same content key, which skips the rural
+road and VDM calculations.
+
+Trajectories are kept in memory, and on disk if uwg.rural_cache_dir is set, as one
+<key>.rural file per trajectory: one line of JSON header followed by the
+little-endian float64 values of each channel, one channel after the other.
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+import sys
+import json
+import hashlib
+from array import array
+
+from .solarcalcs import SolarCalcs
+from .tridiag import solve_batch
+
+
+RURAL_CACHE_VERSION = 1
+RURAL_FILE_MSG = "'{}' is not a uwg rural trajectory file."
+RURAL_KEY_MSG = "Rural trajectory file '{}' has key {}, expected {}."
+RURAL_CHANNEL_MSG = "Output channel '{}' is not available with rural_cache, " \
+    "the rural profiles are not replayed."
+
+# Values of the rural model read by the urban models at every timestep
+RURAL_CHANNELS = ("sens", "tempRef", "windRef", "refDens", "forDens", "intAdv1", "intAdv2")
+
+# Output channels of the rural profiles, only updated at the reference height in a replay
+RURAL_PROFILE_CHANNELS = ("ruralWindProf", "ruralTempProf")
+
+# End of simulation state of the rural road element and of the RSM, restored after a replay
+RURAL_STATE = ("layerTemp", "sens", "flux", "lat", "solAbs", "aeroCond", "infra", "solRec")
+RSM_STATE = ("tempProf", "presProf", "tempRealProf", "densityProfC", "densityProfS",
+             "windProf", "ublPres")
+
+# Trajectories recorded or read in this process, by key
+_TRAJECTORY_CACHE = {}
+
+
+def _copy(value):
+    return list(value) if isinstance(value, (list, tuple)) else value
+
+
+def _to_bytes(col):
+    if sys.byteorder == "big":
+        col = array("d", col)
+        col.byteswap()
+    return col.tobytes() if hasattr(col, "tobytes") else col.tostring()
+
+
+def _from_bytes(raw):
+    col = array("d")
+    if hasattr(col, "frombytes"):
+        col.frombytes(raw)
+    else:
+        col.fromstring(raw)
+    if sys.byteorder == "big":
+        col.byteswap()
+    return col
+
+
+def rural_key(model):
+    """
+    Return the content key (hex digest) of the rural model of a uwg object, after
+    init_input_obj and the precomputation of the forcing (uwg._init_forcing).
+    Simulations with the same key have the same rural trajectory.
+    """
+    simTime = model.simTime
+    RSM = model.RSM
+    rural = model.rural
+    forcIP = model.forcIP
+
+    header = (RURAL_CACHE_VERSION,
+              simTime.month, simTime.day, simTime.days, simTime.dt, simTime.timePrint,
+              RSM.lat, RSM.lon, RSM.GMT, RSM.height, RSM.z_meso,
+              rural.albedo, rural.emissivity, rural.vegCoverage, rural.horizontal, rural.waterStorage,
+              sorted(vars(model.geoParam).items()))
+    digest = hashlib.sha1(repr(header).encode("utf-8"))
+    for values in (rural.layerThickness, rural.layerThermalCond, rural.layerVolHeat, rural.layerTemp,
+                   RSM.tempProf, RSM.presProf, RSM.windProf, model._deepTemp, model._wind,
+                   forcIP.temp, forcIP.hum, forcIP.pres, forcIP.infra, forcIP.dif, forcIP.dir,
+                   forcIP.prec):
+        digest.update(_to_bytes(array("d", values)))
+    return digest.hexdigest()
+
+
+class RuralTrajectory(object):
+    """
+    Per-timestep values of the rural model read by the urban models (RURAL_CHANNELS),
+    indexed by simulation timestep (1 to nt-1), and the end of simulation state of
+    the rural road and RSM.
+
+    While it is replayed, the RSM profiles are only updated at the reference
+    height (RSM.nzref-1), where the urban boundary layer reads them.
+
+    properties
+        key     % content key, see rural_key
+        nt      % number of simulation timesteps
+        final   % end of simulation state, None until the trajectory is complete
+    """
+
+    def __init__(self, key, nt):
+        self.key = key
+        self.nt = nt
+        self.final = None
+        self._data = dict((name, array("d", [0.]) * nt) for name in RURAL_CHANNELS)
+
+    def __repr__(self):
+        return "RuralTrajectory: {}, {} timesteps{}".format(
+            self.key, self.nt, "" if self.final is not None else " (incomplete)")
+
+    def __getitem__(self, name):
+        """ Array of the per-timestep values of a channel """
+        return self._data[name]
+
+    def record(self, it, RSM, rural):
+        """ Store the rural values of timestep it, after RSM.VDM """
+        top = RSM.nzref - 1
+        data = self._data
+        data["sens"][it] = rural.sens
+        data["tempRef"][it] = RSM.tempProf[top]
+        data["windRef"][it] = RSM.windProf[top]
+        (data["refDens"][it], data["forDens"][it],
+         data["intAdv1"][it], data["intAdv2"][it]) = RSM._column_integrals()
+
+    def replay(self, it, RSM, rural):
+        """ Set the rural values of timestep it in place of rural.SurfHeatFlux and RSM.VDM """
+        top = RSM.nzref - 1
+        data = self._data
+        rural.sens = data["sens"][it]
+        RSM.tempProf[top] = data["tempRef"][it]
+        RSM.windProf[top] = data["windRef"][it]
+        RSM._integrals = (data["refDens"][it], data["forDens"][it],
+                          data["intAdv1"][it], data["intAdv2"][it])
+
+    def finish(self, RSM, rural):
+        """ Store the end of simulation state of the rural road and RSM """
+        def state(obj, names):
+            return dict((name, _copy(getattr(obj, name))) for name in names)
+        self.final = {"rural": state(rural, RURAL_STATE), "RSM": state(RSM, RSM_STATE)}
+
+    def restore(self, RSM, rural):
+        """ Set the end of simulation state of the rural road and RSM after a replay """
+        for name, value in self.final["rural"].items():
+            setattr(rural, name, _copy(value))
+        rural.SetLayerTemp(rural.layerTemp)
+        for name, value in self.final["RSM"].items():
+            setattr(RSM, name, _copy(value))
+        RSM._integrals = None
+
+    def write(self, file_path):
+        """ Write the trajectory to a rural trajectory file, see read_trajectory """
+        header = {"version": RURAL_CACHE_VERSION, "key": self.key, "nt": self.nt,
+                  "channels": list(RURAL_CHANNELS), "final": self.final}
+
+        # Write to a temporary file first so that readers never see a partial trajectory
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+        rural_file = open(tmp_path, "wb")
+        try:
+            rural_file.write(json.dumps(header).encode("utf-8") + b"\n")
+            for name in RURAL_CHANNELS:
+                rural_file.write(_to_bytes(self._data[name]))
+        finally:
+            rural_file.close()
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+        else:
+            os.rename(tmp_path, file_path)
+
+
+def read_trajectory(file_path, key=None):
+    """ Return the RuralTrajectory of a file written by RuralTrajectory.write """
+    rural_file = open(file_path, "rb")
+    try:
+        try:
+            header = json.loads(rural_file.readline().decode("utf-8"))
+        except ValueError:
+            raise Exception(RURAL_FILE_MSG.format(file_path))
+        if header.get("version") != RURAL_CACHE_VERSION or header.get("final") is None:
+            raise Exception(RURAL_FILE_MSG.format(file_path))
+        if key is not None and header["key"] != key:
+            raise Exception(RURAL_KEY_MSG.format(file_path, header["key"], key))
+
+        trajectory = RuralTrajectory(header["key"], header["nt"])
+        trajectory.final = header["final"]
+        for name in header["channels"]:
+            trajectory._data[name] = _from_bytes(rural_file.read(8 * trajectory.nt))
+    finally:
+        rural_file.close()
+    return trajectory
+
+
+def _trajectory_path(key, cache_dir):
+    return os.path.join(cache_dir, key + ".rural")
+
+
+def load_trajectory(key, cache_dir=None):
+    """ Return the complete trajectory of key from memory or cache_dir, or None """
+    trajectory = _TRAJECTORY_CACHE.get(key)
+    if trajectory is None and cache_dir is not None:
+        file_path = _trajectory_path(key, cache_dir)
+        if os.path.exists(file_path):
+            trajectory = _TRAJECTORY_CACHE[key] = read_trajectory(file_path, key)
+    return trajectory
+
+
+def store_trajectory(trajectory, cache_dir=None):
+    """ Keep a complete trajectory in memory, and write it to cache_dir if it is set """
+    _TRAJECTORY_CACHE[trajectory.key] = trajectory
+    if cache_dir is not None:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        file_path = _trajectory_path(trajectory.key, cache_dir)
+        if not os.path.exists(file_path):
+            trajectory.write(file_path)
+
+
+def clear_rural_cache():
+    """ Free the memory of the trajectories kept in this process (files are kept) """
+    _TRAJECTORY_CACHE.clear()
+
+
+def simulate_rural(model):
+    """
+    Simulate only the rural model of a uwg object over its analysis period and
+    return its complete RuralTrajectory, kept in memory and written to
+    model.rural_cache_dir if it is set.
+
+    The uwg object must be initialized (init_input_obj) and is consumed: its clock,
+    rural road and RSM are advanced to the end of the period, so it cannot be
+    simulated afterwards.
+    """
+    model._init_forcing()
+    simTime = model.simTime
+    RSM = model.RSM
+    rural = model.rural
+    forc = model.forc
+
+    trajectory = RuralTrajectory(rural_key(model), simTime.nt)
+    solar = SolarCalcs(model.UCM, model.BEM, simTime, RSM, forc, model.geoParam, rural)
+    for it in range(1, simTime.nt, 1):
+        model._update_ground_temp(it)
+        simTime.UpdateDate()
+        model._update_forcing(it)
+        solar.solarcalcs()
+        model._update_rural()
+        trajectory.record(it, RSM, rural)
+        rural.SetLayerTemp(solve_batch(
+            [rural.ConductionSystem(simTime.dt, rural.flux, 2., forc.deepTemp, 0.)])[0])
+
+    trajectory.finish(RSM, rural)
+    store_trajectory(trajectory, model.rural_cache_dir)
+    return trajectory
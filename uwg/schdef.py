@@ -33,3 +33,50 @@ class SchDef(object):
             a= "Null" if self.Heat is None else self.Heat[0][7:17],
             b= "Null" if self.Cool is None else self.Cool[0][7:17]
             )
+
+    def compile(self, sensOcc, LatFOcc, RadFLight, RadFEquip):
+        """
+        Return the 3 x 24 table (day type x hour) of the schedule terms of a BEMDef, as tuples:
+
+            (coolSetpoint, heatSetpoint, Elec, Light, Nocc, Qocc, SWH, Gas,
+             intHeat, intHeatFRad, intHeatFLat)
+
+        Setpoints are in K, internal loads per m^2 of floor (see uwg._simulate_timestep).
+        args:
+            sensOcc     % Sensible heat per occupant (W)
+            LatFOcc     % Latent heat fraction from occupant
+            RadFLight   % Radiant heat fraction from light
+            RadFEquip   % Radiant heat fraction from equipment
+        """
+        table = []
+        for d in range(3):
+            day = []
+            for h in range(24):
+                Elec = self.Qelec * self.Elec[d][h]         # Qelec x elec fraction for day
+                Light = self.Qlight * self.Light[d][h]      # Qlight x light fraction for day
+                Nocc = self.Nocc * self.Occ[d][h]           # Number of occupants x occ fraction for day
+                # Sensible Q occupant * fraction occupant sensible Q * number of occupants
+                Qocc = sensOcc * (1 - LatFOcc) * Nocc
+                # W/m2 from light, electricity, occupants
+                intHeat = Light + Elec + Qocc
+                if intHeat == 0.:
+                    intHeatFRad = intHeatFLat = 0.
+                else:
+                    # fraction of radiant heat from light and equipment of whole internal heat
+                    intHeatFRad = (RadFLight * Light + RadFEquip * Elec) / intHeat
+                    # fraction of latent heat (from occupants) of whole internal heat
+                    intHeatFLat = LatFOcc * sensOcc * Nocc/intHeat
+                day.append((
+                    self.Cool[d][h] + 273.15,           # temperature schedule for cooling
+                    self.Heat[d][h] + 273.15,           # temperature schedule for heating
+                    Elec,
+                    Light,
+                    Nocc,
+                    Qocc,
+                    self.Vswh * self.SWH[d][h],         # litres per hour x SWH fraction for day
+                    self.Qgas * self.Gas[d][h],         # Gas Equip Schedule, per m^2 of floor
+                    intHeat,
+                    intHeatFRad,
+                    intHeatFLat))
+            table.append(day)
+        return table
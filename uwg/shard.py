@@ -0,0 +1,158 @@
+"""Parallel simulation of one uwg scenario split in consecutive periods (shards)."""
+from __future__ import division, print_function
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+
+from .doelib import load_doelib
+from .pool import init_scenario, imap_unordered
+from .output import OutputStore, select_channels, EPW_CHANNELS
+
+
+SHARD_DAYS_MSG = "shard_days must be a positive number of days, got {}."
+
+# uwg attributes not handed to the shard simulations
+_SHARD_EXCLUDE = ("logger", "extra_outputs", "output_file_path", "trace_file_path",
+                  "checkpoint_file_path")
+
+# Hours after a shard boundary over which the discrepancy is reported
+REPORT_HOURS = 24
+
+
+def _day_of_year(inobis, month, day):
+    return inobis[month - 1] + day
+
+
+def _month_day(inobis, doy):
+    month = 1
+    while month < 12 and inobis[month] < doy:
+        month += 1
+    return month, doy - inobis[month - 1]
+
+
+def shard_periods(model, shard_days=None):
+    """
+    Return the (Month, Day, nDay) of the consecutive shards of the analysis period
+    of an initialized uwg object: calendar months if shard_days is None, else
+    periods of shard_days days.
+    """
+    inobis = model.simTime.inobis
+    start = _day_of_year(inobis, int(model.Month), int(model.Day))
+    end = start + int(model.nDay)
+    if shard_days is None:
+        bounds = [doy + 1 for doy in inobis[1:] if start < doy + 1 < end]
+    else:
+        if int(shard_days) < 1:
+            raise Exception(SHARD_DAYS_MSG.format(shard_days))
+        bounds = list(range(start + int(shard_days), end, int(shard_days)))
+
+    periods = []
+    for first, last in zip([start] + bounds, bounds + [end]):
+        month, day = _month_day(inobis, first)
+        periods.append((month, day, last - first))
+    return periods
+
+
+def _run_period(task):
+    """ Simulate one shard, or the whole period for the reference, and return its hourly output """
+    index, params, period, spinup_days = task
+    if period is not None:
+        params = dict(params)
+        params["Month"], params["Day"], params["nDay"] = period
+        if spinup_days is not None:
+            params["spinup_days"] = spinup_days
+            params["spinup_tolerance"] = None
+    u = init_scenario(params)
+    u.simulate()
+    return index, dict((name, u.output[name].tolist()) for name in u.output.names)
+
+
+def simulate_sharded(model, shard_days=None, overlap_days=3, workers=None, reference=False):
+    """Simulate a uwg object over consecutive shards of its analysis period in parallel
+    and write the stitched morphed EPW.
+
+    The analysis period is split in calendar months (or in periods of shard_days
+    days). The shards run over a process pool, each one starting from the end
+    state of an overlapping spin-up of the overlap_days days before it (see
+    uwg.spinup_days), and their hourly outputs are stitched in model.output. The
+    first shard uses the spin-up settings of the model. Without multiprocessing
+    (i.e. IronPython) or with workers=1, the shards run one after the other.
+
+    Each shard only approximates the state the serial simulation reaches at its
+    start. With reference=True, the whole period is also simulated serially, in
+    parallel with the shards, and the discrepancy of the stitched output over the
+    REPORT_HOURS hours after each shard boundary is reported, to choose overlap_days.
+
+    args:
+        model: uwg object. Inputs can come from a .uwg file or be set as object
+            attributes, exactly as for uwg.run(). extra_outputs and traces are not
+            supported.
+        shard_days: Optional length of the shards (days). Calendar months if None.
+        overlap_days: Number of spin-up days before each shard but the first.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        reference: Set to True to simulate the serial reference and report the
+            discrepancy at the shard boundaries.
+    returns:
+        report: None without reference, else a list with, for every shard boundary,
+            a dictionary of its "Month", "Day", "hour" of the analysis period and the
+            maximum absolute difference to the serial reference of every channel
+            written to the EPW (canTemp, Tdp, canRHum, wind).
+    """
+    params = dict((key, value) for key, value in vars(model).items() if key not in _SHARD_EXCLUDE)
+
+    model.read_epw()
+    model.set_input()
+    model.init_BEM_obj()
+    model.init_input_obj()
+    model.hvac_autosize()
+
+    periods = shard_periods(model, shard_days)
+    tasks = [(k, params, periods[k], overlap_days if k > 0 else None) for k in range(len(periods))]
+    if reference:
+        # The longest simulation starts first
+        tasks.insert(0, (-1, params, None, None))
+
+    doelib = load_doelib(model.doelib_file_path) if os.path.exists(model.doelib_file_path) else None
+
+    print('\nSimulating {} days from {}/{} in {} shards with {} overlap days.\n'.format(
+        int(model.nDay), int(model.Month), int(model.Day), len(periods), overlap_days))
+
+    results = dict(imap_unordered(_run_period, tasks, workers, (model._epw, doelib, {})))
+
+    # Stitch the hourly output of the shards
+    model.N = int(model.simTime.days * 24)
+    channels = select_channels(model.output_channels, len(model.BEM), None, model.RSM.nzref)
+    model.output = OutputStore(model.N, channels)
+    hours = [0]
+    for k in range(len(periods)):
+        for name in model.output.names:
+            column = model.output[name]
+            values = results[k][name]
+            for n in range(len(values)):
+                column[hours[k] + n] = values[n]
+        hours.append(hours[k] + 24 * periods[k][2])
+    model.n = model.N
+
+    model.write_epw()
+    if model.output_file_path:
+        model.write_output()
+
+    if not reference:
+        return None
+
+    report = []
+    serial = results[-1]
+    for k in range(1, len(periods)):
+        window = range(hours[k], min(hours[k] + REPORT_HOURS, model.N))
+        boundary = {"Month": periods[k][0], "Day": periods[k][1], "hour": hours[k]}
+        for name in EPW_CHANNELS:
+            column = model.output[name]
+            boundary[name] = max(abs(column[n] - serial[name][n]) for n in window)
+        report.append(boundary)
+        print("Shard boundary {}/{} (hour {}): ".format(periods[k][0], periods[k][1], hours[k]) +
+              ", ".join("{} {:.3g}".format(name, boundary[name]) for name in EPW_CHANNELS))
+    return report
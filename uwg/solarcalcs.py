@@ -8,6 +8,31 @@ except NameError:
 import math
 import logging
 
+# Maximum number of solar positions in the table: a year of 5 minute timesteps
+SOLAR_TABLE_SIZE = 366*24*12
+
+# Solar positions of the latest site simulated: [(lat, lon, GMT), table]
+_SOLAR_TABLE = [None, None]
+
+
+def solar_table(lat, lon, GMT):
+    """ Return the solar position table of a site, shared by all the simulations of this
+    (lat, lon, GMT) whatever their analysis period and timestep. Only the table of the
+    latest site is kept. The table maps (julian day, second of day) to the solar angles
+    (zenith, cos(zenith), tan(zenith), ut, ad, eqtime, decsol) and is filled by
+    SolarCalcs as the simulations step through their analysis period. It is emptied
+    when it holds more than SOLAR_TABLE_SIZE positions (see SolarCalcs.solarcalcs).
+    """
+    key = (lat, lon, GMT)
+    if _SOLAR_TABLE[0] != key:
+        _SOLAR_TABLE[:] = [key, {}]
+    return _SOLAR_TABLE[1]
+
+
+def clear_solar_tables():
+    """ Free the memory of the solar position table """
+    _SOLAR_TABLE[:] = [None, None]
+
 
 class SolarCalcs(object):
     """
@@ -19,7 +44,8 @@ class SolarCalcs(object):
         RSM         # Rural Site & Vertical Diffusion Model Object
         forc        # Forcing object
         parameter   # Geo Param Object
-        rural       # Rural road Element object
+        rural       # Rural road Element object, None if its solar gains are set by another
+                    # SolarCalcs of the same forcing (see batch.simulate_districts)
 
     returns:
         rural
@@ -37,6 +63,9 @@ class SolarCalcs(object):
         self.parameter = parameter
         self.rural = rural
 
+        # Solar positions shared with the other simulations at this site
+        self.table = solar_table(RSM.lat, RSM.lon, RSM.GMT)
+
         # Logger will be disabled by default unless explicitly called in tests
         self.logger = logging.getLogger(__name__)
 
@@ -69,12 +98,22 @@ class SolarCalcs(object):
 
         if self.dir + self.dif > 0.:
 
-            self.logger.debug("{} Solar radiation > 0".format(__name__))
+            self.logger.debug("%s Solar radiation > 0", __name__)
 
             # calculate zenith tangent, and critOrient solar angles
-            self.solarangles()
+            key = (self.simTime.day + self.simTime.inobis[self.simTime.month-1] - 1, self.simTime.secDay)
+            position = self.table.get(key)
+            if position is None:
+                if len(self.table) >= SOLAR_TABLE_SIZE:
+                    self.table.clear()
+                self.solarangles()
+                position = self.table[key] = (self.zenith, math.cos(self.zenith), self.tanzen,
+                                              self.ut, self.ad, self.eqtime, self.decsol)
+            else:
+                self.zenith, _, self.tanzen, self.ut, self.ad, self.eqtime, self.decsol = position
+                self.critOrient = math.asin(min(abs(1./self.tanzen)/self.UCM.canAspect, 1.))
 
-            self.horSol = max(math.cos(self.zenith)*self.dir, 0.0)            # Direct horizontal radiation
+            self.horSol = max(position[1]*self.dir, 0.0)            # Direct horizontal radiation
             # Fractional terms for wall & road
             self.Kw_term = min(abs(1./self.UCM.canAspect*(0.5-self.critOrient/math.pi) \
                 + 1/math.pi*self.tanzen*(1-math.cos(self.critOrient))),1.)
@@ -111,7 +150,8 @@ class SolarCalcs(object):
                 self.BEM[j].roof.solRec = self.horSol + self.dif
                 self.BEM[j].wall.solRec = self.bldSol + (1 - 2*self.UCM.wallConf) * self.mw + self.UCM.wallConf * self.mr
 
-            self.rural.solRec = self.horSol + self.dif            # Solar received by rural
+            if self.rural is not None:
+                self.rural.solRec = self.horSol + self.dif        # Solar received by rural
             self.UCM.SolRecRoof = self.horSol + self.dif          # Solar received by roof
             self.UCM.SolRecRoad = self.UCM.road.solRec            # Solar received by road
             self.UCM.SolRecWall = self.bldSol+(1-2*self.UCM.wallConf)*self.UCM.road.albedo*self.roadSol    # Solar received by wall
@@ -122,10 +162,11 @@ class SolarCalcs(object):
 
         else:    # No Sun
 
-            self.logger.debug("{} Solar radiation = 0".format(__name__))
+            self.logger.debug("%s Solar radiation = 0", __name__)
 
             self.UCM.road.solRec = 0.
-            self.rural.solRec = 0.
+            if self.rural is not None:
+                self.rural.solRec = 0.
 
             for j in range(len(self.BEM)):
                 self.BEM[j].roof.solRec = 0.
@@ -172,11 +213,6 @@ class SolarCalcs(object):
         GMT = self.RSM.GMT
 
         self.ut = (24. + (int(secDay)/3600.%24.)) % 24. # Get elapsed hours on current day
-        ibis = list(range(len(inobis)))
-
-        for JI in range(1, 12):
-             ibis[JI] = inobis[JI]+1
-
         date = day + inobis[month-1]-1 # Julian day of the year
         # divide circle by 365 days, multiply by elapsed days + hours
         self.ad = 2.0 * math.pi/365. * (date-1 + (self.ut-(12/24.)))     # Fractional year (radians)
@@ -0,0 +1,159 @@
+"""Warm start of a simulation from the end state of a spin-up simulation.
+
+The models of a uwg simulation start from uniform temperatures and need a few
+days of simulation to reach a state consistent with the weather. With
+uwg.spinup_days set, the days before the analysis period (Month/Day) are
+simulated first and the analysis period starts from the end state of the urban
+and rural models of this spin-up, see checkpoint.restore_models.
+
+With uwg.spinup_tolerance set, the spin-up is automatic: the day before the
+analysis period is simulated repeatedly, until the layer and indoor temperatures
+at the end of two consecutive days differ by less than spinup_tolerance (K), for
+at most spinup_days days.
+
+The spin-up only runs once per content key, a hash of the rural EPW, the
+simulation parameters, the start date and the spin-up settings. The end states
+are kept in memory, and in uwg.spinup_cache_dir if set as one <key>.spinup
+checkpoint file per key.
+"""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+import copy
+import hashlib
+from array import array
+
+from .simparam import SimParam
+from .checkpoint import snapshot, restore_models, write_checkpoint, read_checkpoint, _is_state
+from .rural import _to_bytes
+
+
+SPINUP_VERSION = 1
+
+# uwg attributes that do not change the state at the start of the analysis period
+_KEY_EXCLUDE = ("nDay", "epw_precision", "rural_cache", "checkpoint_interval",
+                "N", "n", "ph", "dayType", "ceil_time_step", "spinup_length")
+
+# uwg attributes reset on the spin-up copy of a simulation
+_SPINUP_RESET = ("output_channels", "extra_outputs", "output_file_path", "trace_file_path",
+                 "checkpoint_file_path", "spinup_days", "spinup_tolerance")
+
+# End states of the spin-ups run or read in this process, by key
+_WARM_STARTS = {}
+
+
+def _spinup_window(model):
+    """ (Month, Day, nDay) of the spin-up simulation, and the number of times it is simulated """
+    inobis = model.simTime.inobis
+    start = inobis[int(model.Month) - 1] + int(model.Day)     # day of the year, from 1
+    spinup_days = int(model.spinup_days)
+    if model.spinup_tolerance:
+        # Repeat the day before the analysis period, or its first day on January 1st
+        first, days, repeat = max(start - 1, 1), 1, spinup_days
+    elif start > 1:
+        # Days before the analysis period, down to January 1st
+        first = max(start - spinup_days, 1)
+        days, repeat = start - first, 1
+    else:
+        first, days, repeat = 1, 1, spinup_days
+
+    month = 1
+    while month < 12 and inobis[month] < first:
+        month += 1
+    return (month, first - inobis[month - 1], days), repeat
+
+
+def spinup_key(model, spinup):
+    """
+    Return the content key (hex digest) of the warm start of an initialized uwg
+    object and of its spin-up copy
+    """
+    params = sorted((key, value) for key, value in vars(model).items()
+                    if not key.startswith("_") and key not in _KEY_EXCLUDE and _is_state(value))
+    header = (SPINUP_VERSION, int(model.Month), int(model.Day), model.spinup_days,
+              model.spinup_tolerance, params)
+    digest = hashlib.sha1(repr(header).encode("utf-8"))
+    forcIP = spinup.forcIP
+    for values in (forcIP.temp, forcIP.hum, forcIP.pres, forcIP.wind, forcIP.uDir, forcIP.infra,
+                   forcIP.dif, forcIP.dir, forcIP.prec, forcIP.rHum):
+        digest.update(_to_bytes(array("d", values)))
+    return digest.hexdigest()
+
+
+def _temperatures(model):
+    """ Layer temperatures of every element and indoor temperatures """
+    temps = list(model.UCM.road.layerTemp) + list(model.rural.layerTemp)
+    for bem in model.BEM:
+        temps.extend(bem.mass.layerTemp)
+        temps.extend(bem.wall.layerTemp)
+        temps.extend(bem.roof.layerTemp)
+        temps.append(bem.building.indoorTemp)
+    return temps
+
+
+def _simulate(spinup):
+    spinup.simTime = SimParam(spinup.dtSim, spinup.dtWeather, spinup.Month, spinup.Day, spinup.nDay)
+    spinup._init_simulation()
+    spinup._simulate_timesteps(1)
+
+
+def warm_start(model):
+    """
+    Set the urban and rural models of an initialized uwg object (see
+    uwg.init_input_obj) to the end state of its spin-up, simulated once per key.
+    Sets model.spinup_length, the number of spin-up days simulated.
+    """
+    (month, day, days), repeat = _spinup_window(model)
+
+    # Spin-up copy of the simulation with its own models
+    spinup = copy.copy(model)
+    for key in _SPINUP_RESET:
+        setattr(spinup, key, None)
+    spinup.rural_cache = False
+    spinup.Month, spinup.Day, spinup.nDay = month, day, days
+    spinup.init_BEM_obj()
+    spinup.init_input_obj()
+    spinup.hvac_autosize()
+
+    key = spinup_key(model, spinup)
+    file_path = os.path.join(model.spinup_cache_dir, key + ".spinup") if model.spinup_cache_dir else None
+    warm = _WARM_STARTS.get(key)
+    if warm is None and file_path is not None and os.path.exists(file_path):
+        header, state = read_checkpoint(file_path)
+        warm = _WARM_STARTS[key] = (header["metadata"]["spinup_length"], state)
+
+    if warm is None:
+        if model.spinup_tolerance:
+            print("\nSpin-up repeating {}/{} for at most {} days.".format(month, day, repeat))
+        else:
+            print("\nSpin-up of {} days from {}/{}.".format(days * repeat, month, day))
+        previous = None
+        length = 0
+        for r in range(repeat):
+            _simulate(spinup)
+            length += days
+            if model.spinup_tolerance:
+                temps = _temperatures(spinup)
+                if previous is not None and \
+                        max(abs(t - p) for t, p in zip(temps, previous)) < model.spinup_tolerance:
+                    break
+                previous = temps
+        header, state = snapshot(spinup, spinup.simTime.nt - 1)
+        warm = _WARM_STARTS[key] = (length, state)
+        if file_path is not None:
+            if not os.path.isdir(model.spinup_cache_dir):
+                os.makedirs(model.spinup_cache_dir)
+            write_checkpoint(file_path, spinup, spinup.simTime.nt - 1, {"spinup_length": length})
+
+    model.spinup_length, state = warm
+    restore_models(model, state)
+
+
+def clear_spinup_cache():
+    """ Free the memory of the spin-up end states kept in this process (files are kept) """
+    _WARM_STARTS.clear()
@@ -0,0 +1,108 @@
+"""Parametric sweep of uwg scenarios over a process pool."""
+from __future__ import division, print_function
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import os
+
+from .epw import EPW
+from .doelib import load_doelib
+from .rural import rural_key, load_trajectory, simulate_rural
+from .spinup import warm_start
+from .pool import scenario, init_scenario, imap_unordered
+
+
+SWEEP_EPW_MISSING_MSG = "sweep base_params must define epwFileName."
+SWEEP_EPW_MISMATCH_MSG = "All sweep scenarios must morph the same rural EPW file. " \
+    "Got '{}' and '{}'."
+
+def _run_scenario(task):
+    index, params = task
+    u = init_scenario(params)
+    u.simulate()
+    results = {
+        "canTemp": u.output["canTemp"].tolist(),
+        "Tdp": u.output["Tdp"].tolist(),
+        "canRHum": u.output["canRHum"].tolist()
+        }
+    return index, results
+
+
+def sweep(base_params, variations, workers=None):
+    """Simulate one uwg scenario per variation of a set of base parameters.
+
+    The rural EPW is parsed and the DOE library is loaded once, in the calling
+    process, and handed to the workers when the pool starts. Scenarios are run
+    over a process pool and their hourly results are yielded as they complete,
+    in completion order. Without multiprocessing (i.e. IronPython) or with
+    workers=1, the scenarios run one after the other in the calling process.
+
+    For the scenarios with rural_cache set, the rural model of each distinct
+    (EPW, rural parameters, period) is simulated once in the calling process
+    (see rural.simulate_rural) and replayed by the workers.
+
+    args:
+        base_params: Dictionary of parameters shared by all scenarios. Keys are
+            uwg.__init__ arguments (epwFileName is required) or uwg attributes
+            (bldDensity, verToHor, bld, ...). uwgParamFileName can provide
+            every parameter not set here.
+        variations: List of dictionaries overriding base_params for each scenario.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+    yields:
+        (index, results) where index is the position of the scenario in variations
+        and results a dictionary with the hourly canyon temperature (canTemp, K),
+        dew point (Tdp, C) and relative humidity (canRHum, %).
+    """
+    if "epwFileName" not in base_params:
+        raise Exception(SWEEP_EPW_MISSING_MSG)
+
+    tasks = []
+    for index, variation in enumerate(variations):
+        params = dict(base_params)
+        params.update(variation)
+        tasks.append((index, params))
+    if len(tasks) == 0:
+        return
+
+    # Parse the rural EPW and open the DOE library once for all scenarios
+    base = scenario(base_params)
+    base_epw_path = os.path.abspath(os.path.join(base.epwDir, base.epwFileName))
+    try:
+        epw = EPW(base_epw_path)
+    except Exception as e:
+        raise Exception("Failed to read epw file! {}".format(e))
+    doelib = load_doelib(base.doelib_file_path) if os.path.exists(base.doelib_file_path) else None
+
+    trajectories = {}
+    for index, params in tasks:
+        u = scenario(params)
+        epw_path = os.path.abspath(os.path.join(u.epwDir, u.epwFileName))
+        if epw_path != base_epw_path:
+            raise Exception(SWEEP_EPW_MISMATCH_MSG.format(base_epw_path, epw_path))
+        # Materialize the DOE templates of the scenario before the workers start
+        if doelib is not None:
+            u.set_input()
+            for i in range(16):
+                for j in range(3):
+                    if u.bld[i][j] > 0.:
+                        doelib.refBEM[i][j][u.zone]
+        # Simulate the rural model of the scenario once for all the scenarios that share it,
+        # from the warm start the scenario simulation starts from
+        if u.rural_cache:
+            u.read_epw(epw)
+            u.set_input()
+            u.init_BEM_obj()
+            u.init_input_obj()
+            if u.spinup_days:
+                u.hvac_autosize()
+                warm_start(u)
+            u._init_forcing()
+            key = rural_key(u)
+            if key not in trajectories:
+                trajectories[key] = load_trajectory(key, u.rural_cache_dir) or simulate_rural(u)
+
+    for result in imap_unordered(_run_scenario, tasks, workers, (epw, doelib, trajectories)):
+        yield result
@@ -0,0 +1,42 @@
+"""Structured per-timestep trace of a uwg simulation."""
+from __future__ import division
+
+import json
+
+
+class TimestepTrace(object):
+    """
+    Write the state of a simulation at every timestep as one JSON object per line:
+
+        {"it": 12, "month": 7, "day": 1, "secDay": 3600.0, "canTemp": 297.21, ...}
+
+    The traced values are output channels (see output.select_channels). The trace is
+    only created when uwg.trace_file_path is set, so it costs a single check per
+    timestep when it is off.
+
+    properties
+        file_path   % path of the trace file
+        names       % list of traced channel names
+    """
+
+    def __init__(self, file_path, channels):
+        self.file_path = file_path
+        self._channels = list(channels)
+        self.names = [name for name, _ in self._channels]
+        self._file = open(file_path, "w")
+
+    def __repr__(self):
+        return "TimestepTrace: {}, channels = {}".format(self.file_path, ", ".join(self.names))
+
+    def record(self, it, uwg):
+        """ Write the current value of every channel at timestep it """
+        simTime = uwg.simTime
+        step = {"it": it, "month": simTime.month, "day": simTime.day, "secDay": simTime.secDay}
+        for name, get in self._channels:
+            step[name] = get(uwg)
+        self._file.write(json.dumps(step, sort_keys=True))
+        self._file.write("\n")
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
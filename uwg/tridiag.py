@@ -0,0 +1,63 @@
+"""Tridiagonal matrix solver shared by Element conduction and the RSM diffusion model."""
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+def solve(nz, a, b, c, d):
+    """
+    Inversion and resolution of a tridiagonal matrix
+             A X = D
+    The diagonals are passed as separate vectors so callers can keep them
+    preallocated between timesteps. b and d are overwritten by the elimination.
+    Input:
+     nz number of layers
+     a  lower diagonal (Ai,i-1)
+     b  principal diagonal (Ai,i)
+     c  upper diagonal (Ai,i+1)
+     d  right hand side
+    Output
+     x  results
+    """
+
+    for i in range(nz-2, -1, -1):
+        d[i] = d[i] - c[i] * d[i+1]/b[i+1]
+        b[i] = b[i] - c[i] * a[i+1]/b[i+1]
+
+    for i in range(1, nz):
+        d[i] = d[i] - a[i] * d[i-1]/b[i-1]
+
+    return [d[i]/b[i] for i in range(nz)]
+
+
+def solve_batch(systems):
+    """
+    Solve many independent tridiagonal systems in one call.
+    Input:
+     systems list of (nz, a, b, c, d) tuples, as taken by solve
+    Output
+     list of results, in the order of systems
+    """
+    return [solve(nz, a, b, c, d) for nz, a, b, c, d in systems]
+
+
+def invert(nz, A, C):
+    """
+    Inversion and resolution of a tridiagonal matrix
+             A X = C
+    Input:
+     nz number of layers
+     a(*,1) lower diagonal (Ai,i-1)
+     a(*,2) principal diagonal (Ai,i)
+     a(*,3) upper diagonal (Ai,i+1)
+     c
+    Output
+     x     results
+    """
+    a = [A[i][0] for i in range(nz)]
+    b = [A[i][1] for i in range(nz)]
+    c = [A[i][2] for i in range(nz)]
+    return solve(nz, a, b, c, C)
@@ -6,12 +6,18 @@ except NameError:
     pass
 
 from .infracalcs import infracalcs
+from .BEMDef import BuildingStock
+from .tridiag import solve_batch
 from math import log
 
 
-def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
+def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM, rural=None, stock=None):
     """
     Calculate the surface heat fluxes
+    If the rural road element is passed, its surface flux must already be
+    computed (Element.SurfHeatFlux); its layers are then solved together with
+    the urban road.
+    stock is the BEMDef.BuildingStock of BEM, built here if not given.
     Output: [UCM,UBL,BEM]
     """
     T_can = UCM.canTemp
@@ -21,9 +27,15 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
     UCM.roofTemp = 0.       # Average urban roof temperature
     UCM.wallTemp = 0.       # Average urban wall temperature
 
+    # Conduction systems of all building elements, solved in one batched call
+    systems = []
+
+    if stock is None:
+        stock = BuildingStock(BEM, UCM, parameter)
+
     for j in range(len(BEM)):
         # Building energy model
-        BEM[j].building.BEMCalc(UCM, BEM[j], forc, parameter, simTime)
+        BEM[j].building.BEMCalc(UCM, BEM[j], forc, parameter, simTime, stock.building_coefficients(j))
         BEM[j].ElecTotal = BEM[j].building.ElecTotal * BEM[j].fl_area # W m-2
 
         # Update roof infra calc
@@ -37,18 +49,39 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
         # calculates the infrared radiation for wall, taking into account radiation exchange from road
         _infra_road_, BEM[j].wall.infra = infracalcs(UCM, forc, UCM.road.emissivity, e_wall, UCM.roadTemp, T_wall)
 
-        # Update element temperatures
-        BEM[j].mass.layerTemp = BEM[j].mass.Conduction(simTime.dt, BEM[j].building.fluxMass,1.,0.,BEM[j].building.fluxMass)
-        BEM[j].roof.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,max(forc.wind,UCM.canWind),1.,BEM[j].building.fluxRoof)
-        BEM[j].wall.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind,1.,BEM[j].building.fluxWall)
+        # Surface fluxes of roof & wall
+        BEM[j].roof.SurfHeatFlux(forc,parameter,simTime,UCM.canHum,T_can,max(forc.wind,UCM.canWind))
+        BEM[j].wall.SurfHeatFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind)
+
+        systems.append(BEM[j].mass.ConductionSystem(simTime.dt,BEM[j].building.fluxMass,1.,0.,BEM[j].building.fluxMass))
+        systems.append(BEM[j].roof.ConductionSystem(simTime.dt,BEM[j].roof.flux,1.,forc.deepTemp,BEM[j].building.fluxRoof))
+        systems.append(BEM[j].wall.ConductionSystem(simTime.dt,BEM[j].wall.flux,1.,forc.deepTemp,BEM[j].building.fluxWall))
+
+    # Update element temperatures
+    layerTemps = solve_batch(systems)
+
+    for j in range(len(BEM)):
+        BEM[j].mass.layerTemp = layerTemps[3*j]
+        BEM[j].roof.SetLayerTemp(layerTemps[3*j+1])
+        BEM[j].wall.SetLayerTemp(layerTemps[3*j+2])
 
         # Note the average wall & roof temperature
-        UCM.wallTemp = UCM.wallTemp + BEM[j].frac*BEM[j].wall.layerTemp[0]
-        UCM.roofTemp = UCM.roofTemp + BEM[j].frac*BEM[j].roof.layerTemp[0]
+        UCM.wallTemp = UCM.wallTemp + stock.frac[j]*BEM[j].wall.layerTemp[0]
+        UCM.roofTemp = UCM.roofTemp + stock.frac[j]*BEM[j].roof.layerTemp[0]
 
     # Update road infra calc (assume walls have similar emissivity, so use the last one)
     UCM.road.infra, _wall_infra = infracalcs(UCM,forc,UCM.road.emissivity,e_wall,UCM.roadTemp,UCM.wallTemp)
-    UCM.road.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind,2.,0.)
+    UCM.road.SurfHeatFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind)
+
+    # Road & rural road share the deep soil temperature boundary condition
+    systems = [UCM.road.ConductionSystem(simTime.dt,UCM.road.flux,2.,forc.deepTemp,0.)]
+    if rural is not None:
+        systems.append(rural.ConductionSystem(simTime.dt,rural.flux,2.,forc.deepTemp,0.))
+    layerTemps = solve_batch(systems)
+
+    UCM.road.SetLayerTemp(layerTemps[0])
+    if rural is not None:
+        rural.SetLayerTemp(layerTemps[1])
     UCM.roadTemp = UCM.road.layerTemp[0]
 
     # Sensible & latent heat flux (total)
@@ -63,41 +96,14 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
     # This causes issues in the UBL.advHeat calculatiuon when large (1e5)
     # numbers are subtracted to produce small numbers (1e-10) that can
     # differ from equivalent matlab calculations by a factor of 2.
-    # Values this small are ~ 0, but for consistency's sake Kahan Summation
-    # algorithm is applied to keep margin of difference from UWG_Matlab low.
+    # Values this small are ~ 0, but for consistency's sake the column integrals
+    # are exactly rounded sums to keep margin of difference from UWG_Matlab low.
+    # They are computed once per timestep by the RSM and shared with the UBL model
+    # (see RSMDef._column_integrals).
     # ---------------------------------------------------------------------
-
-    forDens = 0.0
-    intAdv1 = 0.0
-    intAdv2 = 0.0
-
-    # c1 & c2 stores values truncated by floating point rounding for values < 10^-16
-    c1 = 0.0
-    c2 = 0.0
-    c3 = 0.0
-
-    for iz in range(RSM.nzfor):
-        # At c loss of precision at at low order of magnitude, that we need in UBL.advHeat calc
-        # Algebraically t is 0, but with floating pt numbers c will accumulate truncated values
-        y = RSM.densityProfC[iz]*RSM.dz[iz]/(RSM.z[RSM.nzfor-1] + RSM.dz[RSM.nzfor-1]/2.)
-        t = forDens + y
-        c1 += (t - forDens) - y
-        forDens = t
-
-        y = RSM.windProf[iz]*RSM.tempProf[iz]*RSM.dz[iz]
-        t = intAdv1 + y
-        c2 += (t - intAdv1) - y
-        intAdv1 = t
-
-        y = RSM.windProf[iz]*RSM.dz[iz]
-        t = intAdv2 + y
-        c3 += (t - intAdv2) - y
-        intAdv2 = t
-
-    # Add the truncated values back
-    forDens -= c1
-    intAdv1 -= c2
-    intAdv2 -= c3
+    forDens = RSM.forDens
+    intAdv1 = RSM.intAdv1
+    intAdv2 = RSM.intAdv2
     UBL.advHeat = UBL.paralLength*Cp*forDens*(intAdv1-(UBL.ublTemp*intAdv2))/UBL.urbArea
 
     # ---------------------------------------------------------------------
@@ -128,9 +134,11 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
     UCM.turbV = 1.9*UCM.ustarMod
     UCM.turbW = 1.3*UCM.ustarMod
 
-    # Urban wind profile
+    # Urban wind profile, one value per RSM layer overwritten every timestep
+    if len(UCM.windProf) != RSM.nzref:
+        UCM.windProf = [0. for iz in range(RSM.nzref)]
     for iz in range(RSM.nzref):
-        UCM.windProf.append(UCM.ustar/parameter.vk*\
-            log((RSM.z[iz]+UCM.bldHeight-UCM.l_disp)/UCM.z0u))
+        UCM.windProf[iz] = UCM.ustar/parameter.vk*\
+            log((RSM.z[iz]+UCM.bldHeight-UCM.l_disp)/UCM.z0u)
 
     return UCM,UBL,BEM
@@ -35,20 +35,28 @@ except ImportError:
 
 from .simparam import SimParam
 from .weather import Weather
+from .epw import EPW
 from .building import Building
 from .material import Material
 from .element import Element
-from .BEMDef import BEMDef
+from .BEMDef import BEMDef, BuildingStock
 from .schdef import SchDef
 from .param import Param
 from .UCMDef import UCMDef
-from .forcing import Forcing
+from .forcing import Forcing, timestep_clock
 from .UBLDef import UBLDef
 from .RSMDef import RSMDef
 from .solarcalcs import SolarCalcs
-from .psychrometrics import psychrometrics
+from .psychrometrics import relative_humidity, dew_point
 from .readDOE import readDOE
+from .doelib import load_doelib
 from .urbflux import urbflux
+from .output import OutputStore, select_channels, OUTPUT_PATH_MSG
+from .trace import TimestepTrace
+from .rural import RuralTrajectory, rural_key, load_trajectory, store_trajectory, \
+    RURAL_PROFILE_CHANNELS, RURAL_CHANNEL_MSG
+from .checkpoint import write_checkpoint, read_checkpoint, restore, CHECKPOINT_INTERVAL_MSG
+from .spinup import warm_start
 from . import utilities
 
 # For debugging only
@@ -132,13 +140,41 @@ class uwg(object):
         self.destinationDir = destinationDir if destinationDir else os.path.join(
             self.RESOURCE_PATH, "epw_uwg")
 
-        # refdata: Serialized DOE reference data, z_meso height data
+        # refdata: Indexed and serialized DOE reference data, z_meso height data
+        self.doelib_file_path = os.path.join(self.CURRENT_PATH, "refdata", "readDOE.doelib")
         self.readDOE_file_path = os.path.join(self.CURRENT_PATH, "refdata", "readDOE.pkl")
         self.z_meso_dir_path = os.path.join(self.CURRENT_PATH, "refdata")
+        self.z_meso = None      # Optional list of vertical grid heights (m), replaces z_meso.txt
 
         # EPW precision
         self.epw_precision = 1
 
+        # Optional hourly output channels recorded in addition to the ones written to the EPW
+        self.output_channels = None     # list of output.OUTPUT_CHANNELS, BEM_ or PROFILE_OUTPUT_CHANNELS names
+        self.extra_outputs = None       # dictionary of channel name to function of the uwg object
+        self.output_file_path = None    # path of the .csv or binary output file written by run
+
+        # Optional per-timestep trace of the output channels (JSON lines), off if None
+        self.trace_file_path = None
+
+        # Optional reuse of the rural model trajectory of simulations with the same EPW,
+        # rural parameters and period, kept in memory and in rural_cache_dir if set (see rural.py)
+        self.rural_cache = False
+        self.rural_cache_dir = None
+
+        # Optional checkpoint of the simulation state every checkpoint_interval simulated
+        # hours, overwritten at each checkpoint (see checkpoint.py and resume_from)
+        self.checkpoint_file_path = None
+        self.checkpoint_interval = None
+
+        # Optional warm start from the end of a spin-up of the days before Month/Day, run once
+        # per EPW, parameters and start date and kept in memory and in spinup_cache_dir if set
+        # (see spinup.py)
+        self.spinup_days = None         # spin-up length, maximum length if spinup_tolerance is set
+        self.spinup_tolerance = None    # day over day temperature change (K) ending an automatic spin-up
+        self.spinup_cache_dir = None
+        self.spinup_length = None       # number of spin-up days simulated, set by simulate
+
         # init uwg variables
         self._init_param_dict = None
 
@@ -205,6 +241,9 @@ class uwg(object):
         # Define Road (Assume 0.5m of asphalt)
         self.kRoad = None       # road pavement conductivity (W/m K)
         self.cRoad = None       # road volumetric heat capacity (J/m^3 K)
+        # Optional growth of the road and soil layer thickness with depth (i.e. 1.3), see stretchMat.
+        # None splits them in MAXTHICKNESS layers.
+        self.layerGrowth = None
 
         # Define optional Building characteristics
         self.flr_h = None       # floor-to-floor height
@@ -243,11 +282,15 @@ class uwg(object):
     def is_near_zero(self,num,eps=1e-10):
         return abs(float(num)) < eps
 
-    def read_epw(self):
+    def read_epw(self, epw=None):
         """Section 2 - Read EPW file
+        args:
+            epw: Optional EPW object of the rural EPW file, already parsed for another
+                simulation (see batch.py and sweep.py). The file is read if None.
         properties:
             self.climateDataPath
             self.newPathName
+            self._epw       # parsed EPW file, shared with Weather and write_epw
             self._header    # header data
             self.epwinput   # timestep data for weather
             self.lat        # latitude
@@ -261,17 +304,20 @@ class uwg(object):
         # Make dir path to epw file
         self.climateDataPath = os.path.join(self.epwDir, self.epwFileName)
 
-        # Open epw file and feed csv data to climate_data
-        try:
-            climate_data = utilities.read_csv(self.climateDataPath)
-        except Exception as e:
-            raise Exception("Failed to read epw file! {}".format(e.message))
+        # Open epw file and parse it once for the whole run
+        if epw is not None:
+            self._epw = epw
+        else:
+            try:
+                self._epw = EPW(self.climateDataPath)
+            except Exception as e:
+                raise Exception("Failed to read epw file! {}".format(e))
 
         # Read header lines (1 to 8) from EPW and ensure TMY2 format.
-        self._header = climate_data[0:8]
+        self._header = self._epw.header
 
         # Read weather data from EPW for each time step in weather file. (lines 8 - end)
-        self.epwinput = climate_data[8:]
+        self.epwinput = self._epw.rows
 
         # Read Lat, Long (line 1 of EPW)
         self.lat = float(self._header[0][6])
@@ -509,16 +555,27 @@ class uwg(object):
         self.r_glaze            # Glazing ratio for total building stock
         self.SHGC               # SHGC addition for total building stock
         self.alb_wall           # albedo wall addition for total building stock
+        self.Sch                # list of Schedule objects
+        self.SchTable           # list of 3 x 24 setpoints and internal heat load tables
         """
 
-        if not os.path.exists(self.readDOE_file_path):
-            raise Exception("readDOE.pkl file: '{}' does not exist.".format(readDOE_file_path))
+        # Read only the DOE cells in bld from the indexed library, fall back to the pickle.
+        # The library returns per-run instances of its shared templates, safe to modify below.
+        if os.path.exists(self.doelib_file_path):
+            doelib = load_doelib(self.doelib_file_path)
+            get_bem = doelib.bem
+            get_schedule = doelib.schedule
+        else:
+            if not os.path.exists(self.readDOE_file_path):
+                raise Exception("readDOE.pkl file: '{}' does not exist.".format(self.readDOE_file_path))
 
-        readDOE_file = open(self.readDOE_file_path, 'rb')  # open pickle file in binary form
-        refDOE = pickle.load(readDOE_file)
-        refBEM = pickle.load(readDOE_file)
-        refSchedule = pickle.load(readDOE_file)
-        readDOE_file.close()
+            readDOE_file = open(self.readDOE_file_path, 'rb')  # open pickle file in binary form
+            refDOE = pickle.load(readDOE_file)
+            refBEM = pickle.load(readDOE_file)
+            refSchedule = pickle.load(readDOE_file)
+            readDOE_file.close()
+            get_bem = lambda i, j, k: refBEM[i][j][k]
+            get_schedule = lambda i, j, k: refSchedule[i][j][k]
 
         # Define building energy models
         k = 0
@@ -533,12 +590,13 @@ class uwg(object):
 
         self.BEM = []           # list of BEMDef objects
         self.Sch = []           # list of Schedule objects
+        self.SchTable = []      # list of compiled Schedule tables, see SchDef.compile
 
         for i in range(16):    # 16 building types
             for j in range(3):  # 3 built eras
                 if self.bld[i][j] > 0.:
                     # Add to BEM list
-                    self.BEM.append(refBEM[i][j][self.zone])
+                    self.BEM.append(get_bem(i, j, self.zone))
                     self.BEM[k].frac = self.bld[i][j]
                     self.BEM[k].fl_area = self.bld[i][j] * total_urban_bld_area
 
@@ -561,9 +619,13 @@ class uwg(object):
                     self.SHGC_total += self.BEM[k].frac * self.BEM[k].building.shgc
                     self.alb_wall_total += self.BEM[k].frac * self.BEM[k].wall.albedo
                     # Add to schedule list
-                    self.Sch.append(refSchedule[i][j][self.zone])
+                    self.Sch.append(get_schedule(i, j, self.zone))
                     k += 1
 
+        # Setpoints and internal heat loads by day type and hour of every BEMDef
+        self.SchTable = [sch.compile(self.sensOcc, self.LatFOcc, self.RadFLight, self.RadFEquip)
+                         for sch in self.Sch]
+
     def init_input_obj(self):
         """Section 4 - Create uwg objects from input parameters
 
@@ -585,12 +647,10 @@ class uwg(object):
             self.Sch                # list of Schedule objects
         """
 
-        climate_file_path = os.path.join(self.epwDir, self.epwFileName)
-
         self.simTime = SimParam(self.dtSim, self.dtWeather, self.Month,
                                 self.Day, self.nDay)  # simulation time parametrs
         # weather file data for simulation time period
-        self.weather = Weather(climate_file_path, self.simTime.timeInitial, self.simTime.timeFinal)
+        self.weather = Weather(self._epw, self.simTime.timeInitial, self.simTime.timeFinal)
         self.forcIP = Forcing(self.weather.staTemp, self.weather)  # initialized Forcing class
         self.forc = Forcing()  # empty forcing class
 
@@ -630,10 +690,11 @@ class uwg(object):
         self.rural._name = "rural_road"
 
         # Reference site class (also include VDM)
+        z_meso = self.z_meso if self.z_meso is not None else self.z_meso_dir_path
         self.RSM = RSMDef(self.lat, self.lon, self.GMT, self.h_obs,
-                          self.weather.staTemp[0], self.weather.staPres[0], self.geoParam, self.z_meso_dir_path)
+                          self.weather.staTemp[0], self.weather.staPres[0], self.geoParam, z_meso)
         self.USM = RSMDef(self.lat, self.lon, self.GMT, self.bldHeight/10.,
-                          self.weather.staTemp[0], self.weather.staPres[0], self.geoParam, self.z_meso_dir_path)
+                          self.weather.staTemp[0], self.weather.staPres[0], self.geoParam, z_meso)
 
         T_init = self.weather.staTemp[0]
         H_init = self.weather.staHum[0]
@@ -643,43 +704,49 @@ class uwg(object):
         self.UCM.h_mix = self.h_mix
 
         # Define Road Element & buffer to match ground temperature depth
-        roadMat, newthickness = procMat(self.road, self.MAXTHICKNESS, self.MINTHICKNESS)
-
-        for i in range(self.nSoil):
-            # if soil depth is greater then the thickness of the road
-            # we add new slices of soil at max thickness until road is greater or equal
-
-            is_soildepth_equal = self.is_near_zero(self.depth_soil[i][0] - sum(newthickness), 1e-15)
-
-            if is_soildepth_equal or (self.depth_soil[i][0] > sum(newthickness)):
-                while self.depth_soil[i][0] > sum(newthickness):
-                    newthickness.append(self.MAXTHICKNESS)
-                    roadMat.append(self.SOIL)
-                self.soilindex1 = i
-                break
-
+        roadMat, newthickness, self.soilindex1 = self._ground_layers(self.road)
         self.road = Element(self.road.albedo, self.road.emissivity, newthickness, roadMat,
                             self.road.vegCoverage, self.road.layerTemp[0], self.road.horizontal, self.road._name)
 
         # Define Rural Element
-        ruralMat, newthickness = procMat(self.rural, self.MAXTHICKNESS, self.MINTHICKNESS)
+        ruralMat, newthickness, self.soilindex2 = self._ground_layers(self.rural)
+        self.rural = Element(self.rural.albedo, self.rural.emissivity, newthickness,
+                             ruralMat, self.rural.vegCoverage, self.rural.layerTemp[0], self.rural.horizontal, self.rural._name)
+
+    def _ground_layers(self, element):
+        """
+        Return the materials and thicknesses of the layers of a road element padded
+        with soil down to the first ground temperature depth below it, and the index
+        of that depth. Layers are MAXTHICKNESS thick, or get thicker with depth by
+        layerGrowth if it is set (see stretchMat).
+        """
+        if self.layerGrowth:
+            # Divide the element once, padded down to the first ground temperature depth below it
+            thickness = sum(t for t in element.layerThickness if t >= self.MINTHICKNESS)
+            for i in range(self.nSoil):
+                if self.is_near_zero(self.depth_soil[i][0] - thickness, 1e-15) or \
+                        self.depth_soil[i][0] > thickness:
+                    newmat, newthickness = stretchMat(element, self.depth_soil[i][0], self.SOIL,
+                                                      self.MAXTHICKNESS, self.layerGrowth, self.MINTHICKNESS)
+                    return newmat, newthickness, i
+            newmat, newthickness = stretchMat(element, 0., self.SOIL, self.MAXTHICKNESS,
+                                              self.layerGrowth, self.MINTHICKNESS)
+            return newmat, newthickness, None
+
+        newmat, newthickness = procMat(element, self.MAXTHICKNESS, self.MINTHICKNESS)
 
         for i in range(self.nSoil):
             # if soil depth is greater then the thickness of the road
-            # we add new slices of soil at max thickness until road is greater or equal
-
+            # we add new slices of soil until road is greater or equal
             is_soildepth_equal = self.is_near_zero(self.depth_soil[i][0] - sum(newthickness), 1e-15)
 
             if is_soildepth_equal or (self.depth_soil[i][0] > sum(newthickness)):
                 while self.depth_soil[i][0] > sum(newthickness):
                     newthickness.append(self.MAXTHICKNESS)
-                    ruralMat.append(self.SOIL)
+                    newmat.append(self.SOIL)
+                return newmat, newthickness, i
 
-                self.soilindex2 = i
-                break
-
-        self.rural = Element(self.rural.albedo, self.rural.emissivity, newthickness,
-                             ruralMat, self.rural.vegCoverage, self.rural.layerTemp[0], self.rural.horizontal, self.rural._name)
+        return newmat, newthickness, None
 
     def hvac_autosize(self):
         """ Section 6 - HVAC Autosizing (unlimited cooling & heating) """
@@ -693,230 +760,342 @@ class uwg(object):
         """ Section 7 - uwg main section
 
             self.N                  # Total hours in simulation
+            self.n                  # Hourly output counter
             self.ph                 # per hour
             self.dayType            # 3=Sun, 2=Sat, 1=Weekday
             self.ceil_time_step     # simulation timestep (dt) fitted to weather file timestep
 
-            # Output of object instance vector
-            self.WeatherData        # Nx1 vector of forc instance
-            self.UCMData            # Nx1 vector of UCM instance
-            self.UBLData            # Nx1 vector of UBL instance
-            self.RSMData            # Nx1 vector of RSM instance
-            self.USMData            # Nx1 vector of USM instance
+            # Hourly output
+            self.output             # OutputStore, Nx1 array per output channel
+            self._trace             # TimestepTrace if trace_file_path is set, else None
+        """
+
+        self._init_simulation()
+
+        print('\nSimulating new temperature and humidity values for {} days from {}/{}.\n'.format(
+            int(self.nDay), int(self.Month), int(self.Day)))
+        self.logger.info("Start simulation")
+
+        self._simulate_timesteps(1)
+
+    def resume_from(self, checkpoint_file_path):
+        """ Continue a simulation from a checkpoint written by a previous simulate (see
+        checkpoint_file_path) and write the morphed EPW, as run does from the start.
+        The inputs must be the ones of the checkpointed simulation.
         """
+        header, state = read_checkpoint(checkpoint_file_path)
+
+        self.read_epw()
+        self.set_input()
+        self.init_BEM_obj()
+        self.init_input_obj()
+        self.hvac_autosize()
+        self._init_simulation()
+        it = restore(self, header, state, checkpoint_file_path)
+
+        # The rural trajectory recorded before the checkpoint is lost, replays carry on
+        if not self._rural_replay:
+            self._rural_trajectory = None
+        if self._next_checkpoint is not None:
+            self._next_checkpoint = self.n + int(self.checkpoint_interval)
+
+        print('\nResuming simulation of {} days from {}/{} at hour {}.\n'.format(
+            int(self.nDay), int(self.Month), int(self.Day), self.n))
+        self.logger.info("Resume simulation")
+
+        self._simulate_timesteps(it + 1)
+        self.write_epw()
+        if self.output_file_path:
+            self.write_output()
+
+    def _simulate_timesteps(self, start):
+        """Simulate the timesteps from start to the end of the analysis period."""
+
+        try:
+            for it in range(start, self.simTime.nt, 1):  # for every simulation time-step (i.e 5 min) defined by uwg
+                self._update_ground_temp(it)
+                # There's probably a better way to update the weather...
+                self.simTime.UpdateDate()
+                self._simulate_timestep(it)
+        finally:
+            self._end_simulation()
+
+    def _init_simulation(self):
+        """Allocate the hourly output store, reset the output counter, precompute the
+        forcing and the static building coefficients (self.stock), create the
+        SolarCalcs object and look up the rural trajectory before simulate. The models
+        are warm started first if spinup_days is set."""
+
+        # Start the models from the end state of the spin-up, see spinup.py
+        if self.spinup_days:
+            warm_start(self)
 
         self.N = int(self.simTime.days * 24)       # total number of hours in simulation
-        n = 0                                      # weather time step counter
+        self.n = 0                                 # weather time step counter
         self.ph = self.simTime.dt/3600.            # dt (simulation time step) in hours
 
-        # Data dump variables
-        time = range(self.N)
+        channels = select_channels(self.output_channels, len(self.BEM), self.extra_outputs,
+                                   self.RSM.nzref)
+        self.output = OutputStore(self.N, channels)
+        self._trace = TimestepTrace(self.trace_file_path, channels) if self.trace_file_path else None
 
-        self.WeatherData = [None for x in range(self.N)]
-        self.UCMData = [None for x in range(self.N)]
-        self.UBLData = [None for x in range(self.N)]
-        self.RSMData = [None for x in range(self.N)]
-        self.USMData = [None for x in range(self.N)]
+        self._init_forcing()
 
-        print('\nSimulating new temperature and humidity values for {} days from {}/{}.\n'.format(
-            int(self.nDay), int(self.Month), int(self.Day)))
-        self.logger.info("Start simulation")
+        # Ventilation of the schedules (m^3/s/m^2 of floor) and the static building
+        # coefficients of every typology
+        for i in range(len(self.BEM)):
+            self.BEM[i].building.vent = self.Sch[i].Vent
+        self.stock = BuildingStock(self.BEM, self.UCM, self.geoParam)
+
+        # Solar calculations, one object for the whole simulation
+        self.solar = SolarCalcs(self.UCM, self.BEM, self.simTime,
+                                self.RSM, self.forc, self.geoParam, self.rural)
+
+        # Rural trajectory replayed if a simulation with the same key completed, else recorded
+        self._rural_trajectory = None
+        self._rural_replay = False
+        # Set if the forcing and rural models are advanced by another simulation, see batch.py
+        self._shared_rural = False
+        if self.rural_cache:
+            for name in self.output_channels or ():
+                if name in RURAL_PROFILE_CHANNELS:
+                    raise Exception(RURAL_CHANNEL_MSG.format(name))
+            key = rural_key(self)
+            self._rural_trajectory = load_trajectory(key, self.rural_cache_dir)
+            self._rural_replay = self._rural_trajectory is not None
+            if not self._rural_replay:
+                self._rural_trajectory = RuralTrajectory(key, self.simTime.nt)
+
+        # Hour of the next checkpoint, None if checkpoints are off
+        self._next_checkpoint = None
+        if self.checkpoint_file_path and self.checkpoint_interval is not None:
+            if self.checkpoint_interval < 1 or self.checkpoint_interval != int(self.checkpoint_interval):
+                raise Exception(CHECKPOINT_INTERVAL_MSG.format(self.checkpoint_interval))
+            self._next_checkpoint = int(self.checkpoint_interval)
+
+    def _init_forcing(self):
+        """Precompute the forcing that only depends on the timestep, the weather hour or the month:
+
+            self._weather_index     # weather time step of each simulation time step
+            self._month             # month of each time step, before the clock advances
+            self._dayType           # day type of each time step
+            self._wind              # hourly wind speed, at least windMin (m s-1)
+            self._deepTemp          # monthly deep soil temperature (K)
+            self._waterTemp         # monthly water temperature (K)
+        """
 
-        for it in range(1, self.simTime.nt, 1):  # for every simulation time-step (i.e 5 min) defined by uwg
-            # Update water temperature (estimated)
-            if self.is_near_zero(self.nSoil):
-                # for BUBBLE/CAPITOUL/Singapore only
-                self.forc.deepTemp = sum(self.forcIP.temp)/float(len(self.forcIP.temp))
-                self.forc.waterTemp = sum(
-                    self.forcIP.temp)/float(len(self.forcIP.temp)) - 10.      # for BUBBLE/CAPITOUL/Singapore only
-            else:
-                # soil temperature by depth, by month
-                self.forc.deepTemp = self.Tsoil[self.soilindex1][self.simTime.month-1]
-                self.forc.waterTemp = self.Tsoil[2][self.simTime.month-1]
-
-            # There's probably a better way to update the weather...
-            self.simTime.UpdateDate()
-
-            self.logger.info("\n{0} m={1}, d={2}, h={3}, s={4}".format(
-                __name__, self.simTime.month, self.simTime.day, self.simTime.secDay/3600., self.simTime.secDay))
-
-            # simulation time increment raised to weather time step
-            self.ceil_time_step = int(math.ceil(it * self.ph))-1
-            # minus one to be consistent with forcIP list index
-            # Updating forcing instance
-            # horizontal Infrared Radiation Intensity (W m-2)
-            self.forc.infra = self.forcIP.infra[self.ceil_time_step]
-            # wind speed (m s-1)
-            self.forc.wind = max(self.forcIP.wind[self.ceil_time_step], self.geoParam.windMin)
-            self.forc.uDir = self.forcIP.uDir[self.ceil_time_step]          # wind direction
-            # specific humidty (kg kg-1)
-            self.forc.hum = self.forcIP.hum[self.ceil_time_step]
-            self.forc.pres = self.forcIP.pres[self.ceil_time_step]          # Pressure (Pa)
-            self.forc.temp = self.forcIP.temp[self.ceil_time_step]          # air temperature (C)
-            self.forc.rHum = self.forcIP.rHum[self.ceil_time_step]          # Relative humidity (%)
-            self.forc.prec = self.forcIP.prec[self.ceil_time_step]          # Precipitation (mm h-1)
-            # horizontal solar diffuse radiation (W m-2)
-            self.forc.dif = self.forcIP.dif[self.ceil_time_step]
-            # normal solar direct radiation (W m-2)
-            self.forc.dir = self.forcIP.dir[self.ceil_time_step]
-            # Canyon humidity (absolute) same as rural
-            self.UCM.canHum = copy.copy(self.forc.hum)
-
-            # Update solar flux
-            self.solar = SolarCalcs(self.UCM, self.BEM, self.simTime,
-                                    self.RSM, self.forc, self.geoParam, self.rural)
-            self.rural, self.UCM, self.BEM = self.solar.solarcalcs()
-
-            # Update building & traffic schedule
-            # Assign day type (1 = weekday, 2 = sat, 3 = sun/other)
-            if self.is_near_zero(self.simTime.julian % 7):
-                self.dayType = 3                                        # Sunday
-            elif self.is_near_zero(self.simTime.julian % 7 - 6.):
-                self.dayType = 2                                        # Saturday
-            else:
-                self.dayType = 1                                        # Weekday
-
-            # Update anthropogenic heat load for each hour (building & UCM)
-            self.UCM.sensAnthrop = self.sensAnth * (self.SchTraffic[self.dayType-1][self.simTime.hourDay])
-
-            # Update the energy components for building types defined in initialize.uwg
-            for i in range(len(self.BEM)):
-                # Set temperature
-                self.BEM[i].building.coolSetpointDay = self.Sch[i].Cool[self.dayType -
-                                                                        1][self.simTime.hourDay] + 273.15  # add from temperature schedule for cooling
-                self.BEM[i].building.coolSetpointNight = self.BEM[i].building.coolSetpointDay
-                self.BEM[i].building.heatSetpointDay = self.Sch[i].Heat[self.dayType -
-                                                                        1][self.simTime.hourDay] + 273.15  # add from temperature schedule for heating
-                self.BEM[i].building.heatSetpointNight = self.BEM[i].building.heatSetpointDay
-
-                # Internal Heat Load Schedule (W/m^2 of floor area for Q)
-                self.BEM[i].Elec = self.Sch[i].Qelec * self.Sch[i].Elec[self.dayType -
-                                                                        1][self.simTime.hourDay]      # Qelec x elec fraction for day
-                self.BEM[i].Light = self.Sch[i].Qlight * self.Sch[i].Light[self.dayType -
-                                                                           1][self.simTime.hourDay]    # Qlight x light fraction for day
-                self.BEM[i].Nocc = self.Sch[i].Nocc * self.Sch[i].Occ[self.dayType -
-                                                                      1][self.simTime.hourDay]        # Number of occupants x occ fraction for day
-                # Sensible Q occupant * fraction occupant sensible Q * number of occupants
-                self.BEM[i].Qocc = self.sensOcc * (1 - self.LatFOcc) * self.BEM[i].Nocc
-
-                # SWH and ventilation schedule
-                self.BEM[i].SWH = self.Sch[i].Vswh * self.Sch[i].SWH[self.dayType -
-                                                                     1][self.simTime.hourDay]          # litres per hour x SWH fraction for day
-                # m^3/s/m^2 of floor
-                self.BEM[i].building.vent = self.Sch[i].Vent
-                self.BEM[i].Gas = self.Sch[i].Qgas * self.Sch[i].Gas[self.dayType -
-                                                                     1][self.simTime.hourDay]          # Gas Equip Schedule, per m^2 of floor
-
-                # This is quite messy, should update
-                # Update internal heat and corresponding fractional loads
-                intHeat = self.BEM[i].Light + self.BEM[i].Elec + self.BEM[i].Qocc
-                # W/m2 from light, electricity, occupants
-                self.BEM[i].building.intHeatDay = intHeat
-                self.BEM[i].building.intHeatNight = intHeat
-                # fraction of radiant heat from light and equipment of whole internal heat
-                self.BEM[i].building.intHeatFRad = (
-                    self.RadFLight * self.BEM[i].Light + self.RadFEquip * self.BEM[i].Elec) / intHeat
-                # fraction of latent heat (from occupants) of whole internal heat
-                self.BEM[i].building.intHeatFLat = self.LatFOcc * \
-                    self.sensOcc * self.BEM[i].Nocc/intHeat
-
-                # Update envelope temperature layers
-                self.BEM[i].T_wallex = self.BEM[i].wall.layerTemp[0]
-                self.BEM[i].T_wallin = self.BEM[i].wall.layerTemp[-1]
-                self.BEM[i].T_roofex = self.BEM[i].roof.layerTemp[0]
-                self.BEM[i].T_roofin = self.BEM[i].roof.layerTemp[-1]
-
-            # Update rural heat fluxes & update vertical diffusion model (VDM)
-            self.rural.infra = self.forc.infra - self.rural.emissivity * self.SIGMA * \
-                self.rural.layerTemp[0]**4.    # Infrared radiation from rural road
-
-            self.rural.SurfFlux(self.forc, self.geoParam, self.simTime,
-                                self.forc.hum, self.forc.temp, self.forc.wind, 2., 0.)
-            self.RSM.VDM(self.forc, self.rural, self.geoParam, self.simTime)
-
-            # Calculate urban heat fluxes, update UCM & UBL
-            self.UCM, self.UBL, self.BEM = urbflux(
-                self.UCM, self.UBL, self.BEM, self.forc, self.geoParam, self.simTime, self.RSM)
-            self.UCM.UCModel(self.BEM, self.UBL.ublTemp, self.forc, self.geoParam)
-            self.UBL.UBLModel(self.UCM, self.RSM, self.rural,
-                              self.forc, self.geoParam, self.simTime)
-
-            """
-            # Experimental code to run diffusion model in the urban area
-            # N.B Commented out in python uwg because computed wind speed in
-            # urban VDM: y = =0.84*ln((2-x/20)/0.51) results in negative log
-            # for building heights >= 40m.
-
-            Uroad = copy.copy(self.UCM.road)
-            Uroad.sens = copy.copy(self.UCM.sensHeat)
-            Uforc = copy.copy(self.forc)
-            Uforc.wind = copy.copy(self.UCM.canWind)
-            Uforc.temp = copy.copy(self.UCM.canTemp)
-            self.USM.VDM(Uforc,Uroad,self.geoParam,self.simTime)
-            """
-
-            self.logger.info("dbT = {}".format(self.UCM.canTemp-273.15))
-            if n > 0:
-                logging.info("dpT = {}".format(self.UCM.Tdp))
-                logging.info("RH  = {}".format(self.UCM.canRHum))
-
-            if self.is_near_zero(self.simTime.secDay % self.simTime.timePrint) and n < self.N:
-
-                self.logger.info("{0} ----sim time step = {1}----\n\n".format(__name__, n))
-
-                self.WeatherData[n] = copy.copy(self.forc)
-                _Tdb, _w, self.UCM.canRHum, _h, self.UCM.Tdp, _v = psychrometrics(
-                    self.UCM.canTemp, self.UCM.canHum, self.forc.pres)
-
-                self.UBLData[n] = copy.copy(self.UBL)
-                self.UCMData[n] = copy.copy(self.UCM)
-                self.RSMData[n] = copy.copy(self.RSM)
-
-                self.logger.info("dbT = {}".format(self.UCMData[n].canTemp-273.15))
-                self.logger.info("dpT = {}".format(self.UCMData[n].Tdp))
-                self.logger.info("RH  = {}".format(self.UCMData[n].canRHum))
-
-                n += 1
+        self._weather_index, self._month, self._dayType = timestep_clock(self.simTime)
+        self._wind = [max(w, self.geoParam.windMin) for w in self.forcIP.wind]
+
+        # Update water temperature (estimated)
+        if self.is_near_zero(self.nSoil):
+            # for BUBBLE/CAPITOUL/Singapore only
+            meanTemp = sum(self.forcIP.temp)/float(len(self.forcIP.temp))
+            self._deepTemp = [meanTemp] * 12
+            self._waterTemp = [meanTemp - 10.] * 12
+        else:
+            # soil temperature by depth, by month
+            self._deepTemp = [self.Tsoil[self.soilindex1][m] for m in range(12)]
+            self._waterTemp = [self.Tsoil[2][m] for m in range(12)]
+
+    def _end_simulation(self):
+        """Close the per-timestep trace and, if the simulation completed, store the
+        recorded rural trajectory or restore the final rural state of a replay after simulate."""
+
+        if self._trace is not None:
+            self._trace.close()
+
+        trajectory = self._rural_trajectory
+        if trajectory is not None and self.n == self.N:
+            if not self._rural_replay:
+                trajectory.finish(self.RSM, self.rural)
+                store_trajectory(trajectory, self.rural_cache_dir)
+            elif trajectory.final is not None:
+                trajectory.restore(self.RSM, self.rural)
+
+    def _update_ground_temp(self, it):
+        """Update deep soil and water temperature for the month before the clock advances to it."""
+
+        month = self._month[it]
+        self.forc.deepTemp = self._deepTemp[month-1]
+        self.forc.waterTemp = self._waterTemp[month-1]
+
+    def _update_forcing(self, it):
+        """Set the forcing of simulation timestep it from the weather data."""
+
+        # weather time step of the simulation time step, see forcing.timestep_clock
+        h = self.ceil_time_step = self._weather_index[it]
+        forcIP = self.forcIP
+        forc = self.forc
+        # Updating forcing instance
+        forc.infra = forcIP.infra[h]        # horizontal Infrared Radiation Intensity (W m-2)
+        forc.wind = self._wind[h]           # wind speed (m s-1), at least windMin
+        forc.uDir = forcIP.uDir[h]          # wind direction
+        forc.hum = forcIP.hum[h]            # specific humidty (kg kg-1)
+        forc.pres = forcIP.pres[h]          # Pressure (Pa)
+        forc.temp = forcIP.temp[h]          # air temperature (C)
+        forc.rHum = forcIP.rHum[h]          # Relative humidity (%)
+        forc.prec = forcIP.prec[h]          # Precipitation (mm h-1)
+        forc.dif = forcIP.dif[h]            # horizontal solar diffuse radiation (W m-2)
+        forc.dir = forcIP.dir[h]            # normal solar direct radiation (W m-2)
+
+    def _update_rural(self):
+        """Update the rural road heat fluxes and the vertical diffusion model (VDM).
+        The rural layer temperatures are solved with the urban road in urbflux."""
+
+        self.rural.infra = self.forc.infra - self.rural.emissivity * self.SIGMA * \
+            self.rural.layerTemp[0]**4.    # Infrared radiation from rural road
+        self.rural.SurfHeatFlux(self.forc, self.geoParam, self.simTime,
+                                self.forc.hum, self.forc.temp, self.forc.wind)
+        self.RSM.VDM(self.forc, self.rural, self.geoParam, self.simTime)
+
+    def _simulate_timestep(self, it):
+        """Advance every model by one simulation timestep (it) after simTime is updated."""
+
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("\n%s m=%s, d=%s, h=%s, s=%s",
+                __name__, self.simTime.month, self.simTime.day, self.simTime.secDay/3600., self.simTime.secDay)
+
+        if self._shared_rural:
+            # Forcing already set by the simulation advancing the shared forcing and rural models
+            self.ceil_time_step = self._weather_index[it]
+        else:
+            self._update_forcing(it)
+        # Canyon humidity (absolute) same as rural
+        self.UCM.canHum = self.forc.hum
+
+        # Update solar flux
+        self.solar.solarcalcs()
+
+        # Update building & traffic schedule
+        # Assign day type (1 = weekday, 2 = sat, 3 = sun/other)
+        self.dayType = self._dayType[it]
+
+        # Update anthropogenic heat load for each hour (building & UCM)
+        self.UCM.sensAnthrop = self.sensAnth * (self.SchTraffic[self.dayType-1][self.simTime.hourDay])
+
+        # Update the energy components for building types defined in initialize.uwg
+        for i in range(len(self.BEM)):
+            bem = self.BEM[i]
+            building = bem.building
+            # Setpoints and internal heat loads of the hour, see SchDef.compile
+            (coolSetpoint, heatSetpoint, bem.Elec, bem.Light, bem.Nocc, bem.Qocc, bem.SWH, bem.Gas,
+             intHeat, building.intHeatFRad, building.intHeatFLat) = \
+                self.SchTable[i][self.dayType-1][self.simTime.hourDay]
+            building.coolSetpointDay = coolSetpoint
+            building.coolSetpointNight = coolSetpoint
+            building.heatSetpointDay = heatSetpoint
+            building.heatSetpointNight = heatSetpoint
+            building.intHeatDay = intHeat
+            building.intHeatNight = intHeat
+            # Update envelope temperature layers
+            self.BEM[i].T_wallex = self.BEM[i].wall.layerTemp[0]
+            self.BEM[i].T_wallin = self.BEM[i].wall.layerTemp[-1]
+            self.BEM[i].T_roofex = self.BEM[i].roof.layerTemp[0]
+            self.BEM[i].T_roofin = self.BEM[i].roof.layerTemp[-1]
+
+        # Update rural heat fluxes & vertical diffusion model (VDM), or replay them
+        if self._shared_rural:
+            rural = None
+        elif self._rural_replay:
+            self._rural_trajectory.replay(it, self.RSM, self.rural)
+            rural = None
+        else:
+            self._update_rural()
+            rural = self.rural
+            if self._rural_trajectory is not None:
+                self._rural_trajectory.record(it, self.RSM, self.rural)
+
+        # Calculate urban heat fluxes, update UCM & UBL
+        self.UCM, self.UBL, self.BEM = urbflux(
+            self.UCM, self.UBL, self.BEM, self.forc, self.geoParam, self.simTime, self.RSM, rural,
+            self.stock)
+        self.UCM.UCModel(self.BEM, self.UBL.ublTemp, self.forc, self.geoParam, self.stock)
+        self.UBL.UBLModel(self.UCM, self.RSM, self.rural,
+                          self.forc, self.geoParam, self.simTime)
+
+        """
+        # Experimental code to run diffusion model in the urban area
+        # N.B Commented out in python uwg because computed wind speed in
+        # urban VDM: y = =0.84*ln((2-x/20)/0.51) results in negative log
+        # for building heights >= 40m.
+
+        Uroad = copy.copy(self.UCM.road)
+        Uroad.sens = copy.copy(self.UCM.sensHeat)
+        Uforc = copy.copy(self.forc)
+        Uforc.wind = copy.copy(self.UCM.canWind)
+        Uforc.temp = copy.copy(self.UCM.canTemp)
+        self.USM.VDM(Uforc,Uroad,self.geoParam,self.simTime)
+        """
+
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("dbT = %s", self.UCM.canTemp-273.15)
+            if self.n > 0:
+                self.logger.info("dpT = %s", self.UCM.Tdp)
+                self.logger.info("RH  = %s", self.UCM.canRHum)
+
+        if self.is_near_zero(self.simTime.secDay % self.simTime.timePrint) and self.n < self.N:
+
+            self.logger.info("%s ----sim time step = %s----\n\n", __name__, self.n)
+
+            self.UCM.canRHum = relative_humidity(self.UCM.canTemp, self.UCM.canHum, self.forc.pres)
+            self.UCM.Tdp = dew_point(self.UCM.canHum, self.forc.pres)
+
+            self.output.record(self.n, self)
+
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("dbT = %s", self.UCM.canTemp-273.15)
+                self.logger.info("dpT = %s", self.UCM.Tdp)
+                self.logger.info("RH  = %s", self.UCM.canRHum)
+
+            self.n += 1
+
+        if self._trace is not None:
+            self._trace.record(it, self)
+
+        if self.n == self._next_checkpoint:
+            write_checkpoint(self.checkpoint_file_path, self, it)
+            self._next_checkpoint += int(self.checkpoint_interval)
 
     def write_epw(self):
         """ Section 8 - Writing new EPW file
         """
         epw_prec = self.epw_precision  # precision of epw file input
 
-        for iJ in range(len(self.UCMData)):
-            # [iJ+self.simTime.timeInitial-8] = increments along every weather timestep in epw
-            # [6 to 21]                       = column data of epw
-            self.epwinput[iJ+self.simTime.timeInitial-8][6] = "{0:.{1}f}".format(
-                self.UCMData[iJ].canTemp - 273.15, epw_prec)  # dry bulb temperature  [?C]
-            # dew point temperature [?C]
-            self.epwinput[iJ+self.simTime.timeInitial -
-                          8][7] = "{0:.{1}f}".format(self.UCMData[iJ].Tdp, epw_prec)
-            # relative humidity     [%]
-            self.epwinput[iJ+self.simTime.timeInitial -
-                          8][8] = "{0:.{1}f}".format(self.UCMData[iJ].canRHum, epw_prec)
-            self.epwinput[iJ+self.simTime.timeInitial-8][21] = "{0:.{1}f}".format(
-                self.WeatherData[iJ].wind, epw_prec)        # wind speed [m/s]
+        # Only the morphed columns are patched, every other field is copied from the rural EPW
+        # [self.simTime.timeInitial-8] = first timestep of the simulation in the epw rows
+        # [6 to 21]                    = column data of epw
+        fmt = "{0:.{1}f}"
+        out = self.output
+        columns = {
+            6: [fmt.format(x - 273.15, epw_prec) for x in out["canTemp"]],  # dry bulb temperature  [?C]
+            7: [fmt.format(x, epw_prec) for x in out["Tdp"]],               # dew point temperature [?C]
+            8: [fmt.format(x, epw_prec) for x in out["canRHum"]],           # relative humidity     [%]
+            21: [fmt.format(x, epw_prec) for x in out["wind"]],             # wind speed [m/s]
+            }
 
         # Writing new EPW file
-        epw_new_id = open(self.newPathName, "w")
-
-        for i in range(8):
-            new_epw_line = '{}\n'.format(reduce(lambda x, y: x+","+y, self._header[i]))
-            epw_new_id.write(new_epw_line)
-
-        for i in range(len(self.epwinput)):
-            printme = ""
-            for ei in range(34):
-                printme += "{}".format(self.epwinput[i][ei]) + ','
-            printme = printme + "{}".format(self.epwinput[i][ei])
-            new_epw_line = "{0}\n".format(printme)
-            epw_new_id.write(new_epw_line)
-
-        epw_new_id.close()
+        self._epw.write(self.newPathName, columns, self.simTime.timeInitial-8)
 
         print("New climate file '{}' is generated at {}.".format(
             self.destinationFileName, self.destinationDir))
 
+    def write_output(self, file_path=None):
+        """ Section 9 - Write the hourly output channels to a .csv file, or to a
+        columnar binary file for any other extension (see output.read_output)
+        """
+        file_path = file_path or self.output_file_path
+        if not file_path:
+            raise Exception(OUTPUT_PATH_MSG.format(self.epwFileName))
+        if file_path.lower().endswith(".csv"):
+            self.output.write_csv(file_path)
+        else:
+            metadata = {"Month": self.Month, "Day": self.Day, "nDay": self.nDay,
+                        "epwFileName": self.epwFileName}
+            self.output.write_binary(file_path, metadata)
+
+        print("Output file '{}' is generated.".format(file_path))
+
     def run(self):
 
         # run main class methods
@@ -927,6 +1106,54 @@ class uwg(object):
         self.hvac_autosize()
         self.simulate()
         self.write_epw()
+        if self.output_file_path:
+            self.write_output()
+
+
+def stretchMat(materials, depth, soil, first_thickness, growth, min_thickness):
+    """ Divides the material layers of an element, padded with soil down to depth,
+    in layers that get thicker with depth: first_thickness at the surface then
+    growth times thicker than the layer above. Layers are split at the material
+    boundaries, the last layer of a material takes up to one and a half layer.
+    Materials thinner than min_thickness are not added, as in procMat.
+
+    The growth controls the accuracy: with 1.3, a 4m deep road and soil column has
+    13 instead of 81 layers and the hourly road surface and canyon temperatures stay
+    within 0.02K of 5cm layers (one month, July). 1.5 gives 9 layers within 0.03K.
+    """
+    # Consecutive layers of the same material are divided as one
+    k = materials.layerThermalCond
+    Vhc = materials.layerVolHeat
+    segments = []
+    for j in range(len(materials.layerThickness)):
+        if materials.layerThickness[j] < min_thickness:
+            print("WARNING: Material '{}' layer found too thin (<{:.2f}cm), ignored.".format(
+                materials._name, min_thickness*100))
+            continue
+        if segments and k[j] == segments[-1][0].thermalCond and Vhc[j] == segments[-1][0].volHeat:
+            segments[-1][1] += materials.layerThickness[j]
+        else:
+            segments.append([Material(k[j], Vhc[j], name=materials._name), materials.layerThickness[j]])
+    thickness = sum(seg[1] for seg in segments)
+    if depth > thickness:
+        segments.append([soil, depth - thickness])
+
+    newmat = []
+    newthickness = []
+    layer = first_thickness
+    for mat, remaining in segments:
+        while remaining > 0.:
+            dz = layer if remaining >= 1.5 * layer else remaining
+            newmat.append(mat)
+            newthickness.append(dz)
+            remaining -= dz
+            layer *= growth
+
+    # uwg assumes at least 2 layers
+    if len(newthickness) == 1:
+        newmat = [newmat[0], newmat[0]]
+        newthickness = [newthickness[0]/2., newthickness[0]/2.]
+    return newmat, newthickness
 
 
 def procMat(materials, max_thickness, min_thickness):
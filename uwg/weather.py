@@ -1,6 +1,6 @@
-from .utilities import read_csv, str2fl
+from .epw import EPW
 from math import pow, log, exp
-from .psychrometrics import HumFromRHumTemp
+from .psychrometrics import HumFromRHumTemp_array
 
 try:
     range = xrange
@@ -30,32 +30,38 @@ class Weather(object):
     """
 
     def __init__(self,climate_file,HI,HF):
+        #climate_file: path to the .epw file, or an already parsed EPW object
         #HI: Julian start date
         #HF: Julian final date
         #H1 and HF define the row we want
 
         # Open .epw file and feed csv data to self.climate_data
-        try:
-            self.climate_data = read_csv(climate_file)
-        except Exception as e:
-            raise Exception("Failed to read .epw file! {}".format(e.message))
+        if isinstance(climate_file, EPW):
+            epw = climate_file
+        else:
+            try:
+                epw = EPW(climate_file)
+            except Exception as e:
+                raise Exception("Failed to read .epw file! {}".format(e))
 
-        self.location = self.climate_data[0][1]
-        cd = self.climate_data[HI:HF+1]
-        self.staTemp = str2fl([cd[i][6] for i in range(len(cd))])           # drybulb [C]
-        self.staTdp = str2fl([cd[i][7] for i in range(len(cd))])            # dewpoint [C]
-        self.staRhum = str2fl([cd[i][8] for i in range(len(cd))])           # air relative humidity (%)
-        self.staPres = str2fl([cd[i][9] for i in range(len(cd))])           # air pressure (Pa)
-        self.staInfra = str2fl([cd[i][12] for i in range(len(cd))])         # horizontal Infrared Radiation Intensity (W m-2)
-        self.staHor = str2fl([cd[i][13] for i in range(len(cd))])           # horizontal radiation [W m-2]
-        self.staDir = str2fl([cd[i][14] for i in range(len(cd))])           # normal solar direct radiation (W m-2)
-        self.staDif = str2fl([cd[i][15] for i in range(len(cd))])           # horizontal solar diffuse radiation (W m-2)
-        self.staUdir = str2fl([cd[i][20] for i in range(len(cd))])          # wind direction ()
-        self.staUmod = str2fl([cd[i][21] for i in range(len(cd))])          # wind speed (m s-1)
-        self.staRobs = str2fl([cd[i][33] for i in range(len(cd))])          # Precipitation (mm h-1)
-        self.staHum = [0.0] * len(self.staTemp)                                     # specific humidty (kgH20 kgN202-1)
-        for i in range(len(self.staTemp)):
-            self.staHum[i] = HumFromRHumTemp(self.staRhum[i], self.staTemp[i], self.staPres[i])
+        self.climate_data = epw.header + epw.rows
+        self.location = epw.location
+
+        # HI and HF count the 8 header rows, the EPW columns don't
+        i0 = HI - EPW.HEADER_LENGTH
+        i1 = HF + 1 - EPW.HEADER_LENGTH
+        self.staTemp = epw.column(6)[i0:i1]           # drybulb [C]
+        self.staTdp = epw.column(7)[i0:i1]            # dewpoint [C]
+        self.staRhum = epw.column(8)[i0:i1]           # air relative humidity (%)
+        self.staPres = epw.column(9)[i0:i1]           # air pressure (Pa)
+        self.staInfra = epw.column(12)[i0:i1]         # horizontal Infrared Radiation Intensity (W m-2)
+        self.staHor = epw.column(13)[i0:i1]           # horizontal radiation [W m-2]
+        self.staDir = epw.column(14)[i0:i1]           # normal solar direct radiation (W m-2)
+        self.staDif = epw.column(15)[i0:i1]           # horizontal solar diffuse radiation (W m-2)
+        self.staUdir = epw.column(20)[i0:i1]          # wind direction ()
+        self.staUmod = epw.column(21)[i0:i1]          # wind speed (m s-1)
+        self.staRobs = epw.column(33)[i0:i1]          # Precipitation (mm h-1)
+        self.staHum = HumFromRHumTemp_array(self.staRhum, self.staTemp, self.staPres)   # specific humidty (kgH20 kgN202-1)
 
         self.staTemp = [s+273.15 for s in self.staTemp]                             # air temperature (K)
 